@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional, Tuple
 
 
 class Settings(BaseSettings):
@@ -7,6 +7,63 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     physio_passcode: str = "physio123"
     cors_origins: str = "http://localhost:3000,http://localhost:5173"
+    # LLM calls in flight at once per provider (further requests wait on the event loop)
+    llm_openai_concurrency: int = 64
+    llm_deepseek_concurrency: int = 64
+    # Per-request limit on waiting for a slot plus the LLM call(s) (0 = none)
+    llm_request_deadline_seconds: float = 600
+    # Opt-in fallback: run the blocking LLM clients on a thread pool instead of ainvoke
+    llm_thread_pool: bool = False
+    llm_thread_pool_workers: int = 3
+    # Idle keep-alive connections to the LLM APIs are closed after this many seconds
+    llm_keepalive_seconds: float = 120
+    # Cache of DeepSeek (temperature 0) outputs: "" = the app database, or e.g.
+    # "sqlite:///cache/llm_responses.db"; "off" disables
+    llm_cache_url: str = ""
+    llm_cache_ttl_hours: float = 168
+    llm_cache_max_mb: int = 64
+    # Concurrent identical recommendation requests share one computation: "off", "local"
+    # (per worker) or "postgres" (also across workers, via advisory locks)
+    llm_single_flight: str = "local"
+    # Patient data in the DeepSeek prompts: "json" (indented JSON) or "compact" (tables, short
+    # form; opt-in until prompt_regression --live shows the same selections on the fixtures)
+    llm_profile_encoding: str = "json"
+    # Logging: level name and output format ('json' lines or 'text')
+    log_level: str = "INFO"
+    log_format: str = "json"
+    # Video analysis worker processes (0 = one per CPU core)
+    video_analysis_workers: int = 0
+    # Pose extraction sampling: 'full' (every frame) or 'adaptive' (coarse pass + full-rate ascending phases)
+    video_sampling_mode: str = "full"
+    video_sampling_stride: int = 4
+    # Frames are downscaled (letterboxed) to this size before pose inference; "native" disables it
+    video_inference_resolution: str = "1280x720"
+    # Uploads are spooled in this memory-backed directory ("" = always use disk temp)
+    video_spool_dir: str = "/dev/shm/sts-uploads"
+    # Larger uploads move to disk; uploads above video_upload_max_mb are rejected
+    video_spool_max_mb: int = 256
+    video_upload_max_mb: int = 1024
+    # Spooled files older than this that no job is using are swept
+    video_temp_max_age_seconds: int = 3600
+    # Content-addressed cache of keypoints and results ("" = backend/cache, "off" disables)
+    video_cache_dir: str = ""
+    video_cache_max_mb: int = 2048
+    # Keypoints of every analysis are kept here for re-analysis ("" = backend/keypoints, "off" disables)
+    video_keypoint_archive_dir: str = ""
+    # 'float32' (exact) or 'float16' (half the size)
+    video_keypoint_archive_dtype: str = "float32"
+    # Allow per-request sampling profiles (X-Profile: 1 header), written to video_profile_dir ("" = backend/profiles)
+    video_profiling_enabled: bool = False
+    video_profile_dir: str = ""
+
+    @property
+    def video_inference_size(self) -> Optional[Tuple[int, int]]:
+        """'1280x720' -> (1280, 720); '', '0' or 'native' -> None"""
+        value = self.video_inference_resolution.strip().lower()
+        if value in ("", "0", "native"):
+            return None
+        width, height = (int(part) for part in value.split("x"))
+        return max(width, height), min(width, height)
 
     @property
     def cors_origins_list(self) -> List[str]:
@@ -1,7 +1,7 @@
 """Create all tables on startup."""
 
 from app.database import engine, Base
-from app.models import User, PatientDemographics, QuestionnaireResponse, STSAssessment, Exercise
+from app.models import User, PatientDemographics, QuestionnaireResponse, STSAssessment, Exercise, LLMResponseCacheEntry
 
 
 def init_db():
@@ -0,0 +1,269 @@
+"""
+Logging Configuration
+Structured, non-blocking logging for the API and the video analysis workers.
+
+Records are handed to a QueueHandler on the calling thread and written to
+stdout by a QueueListener thread, so a log call on the request or analysis
+path costs the %-formatting of its message, a record copy and a queue put,
+never terminal or pipe I/O. Disabled levels cost one cached level check;
+hot loops pass %-style arguments so the message is only formatted when the
+level is enabled.
+
+Every record carries the id of the request it was logged for (see
+request_context / RequestIdMiddleware), including records logged in the
+video analysis worker processes and the LLM service threads.
+
+Output is one JSON object per line (LOG_FORMAT=json, the default) or plain
+text (LOG_FORMAT=text); LOG_LEVEL sets the level.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+# Request id of the current request (None outside of a request)
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Longest client-supplied request id that is honoured
+_MAX_REQUEST_ID_LENGTH = 128
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str]) -> Iterator[Optional[str]]:
+    """Attribute log records in this block (and tasks it starts) to request_id"""
+    token = request_id_var.set(request_id)
+    try:
+        yield request_id
+    finally:
+        request_id_var.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps the current request id on every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; `extra` fields become top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        return super().format(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that merges the message on the calling thread
+
+    The arguments are %-formatted into the message before the record is
+    queued: formatted later on the listener thread, a mutable argument
+    changed after the log call would be logged with its new values. Unlike
+    the stock handler, the traceback and the JSON / text output are still
+    rendered on the listener thread (the queue never leaves the process, so
+    the record need not be picklable). `extra` fields are serialised there
+    too, so they should be plain values.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A copy: other handlers may still see the original record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level: str = "INFO", log_format: str = "json"):
+    """
+    Route all logging through a queue to a stdout writer thread
+
+    Safe to call more than once (e.g. in every worker process); the last call
+    wins.
+
+    Args:
+        level: Root level name ("DEBUG", "INFO", "WARNING", ...)
+        log_format: "json" or "text"
+    """
+    global _listener
+    shutdown_logging()
+
+    # Source file / line lookup walks the stack on every call and neither
+    # format prints it (see "Optimization" in the logging HOWTO)
+    logging._srcfile = None
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if log_format == "text" else JsonFormatter())
+
+    # Unbounded: a burst of records never blocks the caller
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if isinstance(existing, _QueueHandler):
+            root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving every HTTP request and websocket a request id
+
+    A client-supplied X-Request-ID header is honoured (so ids can be traced
+    across services), otherwise a new id is generated. HTTP responses echo
+    the id in the same header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        header = REQUEST_ID_HEADER.lower().encode()
+        for name, value in scope.get("headers", ()):
+            if name == header:
+                request_id = value.decode("latin-1").strip()[:_MAX_REQUEST_ID_LENGTH] or None
+                break
+        request_id = request_id or new_request_id()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(header, request_id.encode("latin-1"))]
+            await send(message)
+
+        with request_context(request_id):
+            await self.app(scope, receive, send_with_request_id)
+
+
+# Per-call overhead of a hot-loop trace line: print vs. logging
+if __name__ == "__main__":
+    import os
+    import threading
+    from contextlib import redirect_stdout
+
+    calls = 100_000
+    stance, foot_left, foot_right = 1.0123, 0.4321, 0.5678
+
+    def per_call(fn) -> float:
+        start = time.perf_counter()
+        for frame_idx in range(calls):
+            fn(frame_idx)
+        return (time.perf_counter() - start) / calls * 1e9
+
+    def before(frame_idx):
+        print(f"[DEBUG] Frame {frame_idx} (SITTING): Stance={stance:.2f}, FootL={foot_left:.2f}, FootR={foot_right:.2f}")
+
+    logger = logging.getLogger("app.benchmark")
+
+    def after(frame_idx):
+        logger.debug("Frame %d (SITTING): stance=%.2f, foot_left=%.2f, foot_right=%.2f",
+                     frame_idx, stance, foot_left, foot_right)
+
+    print("=== Per-frame Trace Overhead (ns per call) ===")
+    # A pipe with a reader draining it, like stdout under docker / uvicorn
+    read_fd, write_fd = os.pipe()
+    pipe = os.fdopen(write_fd, "w")
+
+    def drain():
+        while os.read(read_fd, 1 << 16):
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    with redirect_stdout(pipe):
+        print_buffered = per_call(before)
+    # Line buffered: a terminal, or PYTHONUNBUFFERED=1 as in most containers
+    pipe.reconfigure(line_buffering=True)
+    with redirect_stdout(pipe):
+        print_unbuffered = per_call(before)
+    pipe.reconfigure(line_buffering=False)
+
+    # Log records go to the pipe as well so the writer thread does real I/O
+    stdout = sys.stdout
+    sys.stdout = pipe
+    configure_logging("INFO")
+    debug_off = per_call(after)
+    configure_logging("DEBUG")
+    with request_context(new_request_id()):
+        debug_on = per_call(after)
+    shutdown_logging()
+    sys.stdout = stdout
+    pipe.close()
+
+    print(f"  print, line buffered (before)  {print_unbuffered:8.0f}")
+    print(f"  print, block buffered (before) {print_buffered:8.0f}")
+    print(f"  logger.debug, DEBUG disabled   {debug_off:8.0f}")
+    print(f"  logger.debug, DEBUG enabled    {debug_on:8.0f}  (includes JSON formatting on the writer thread)")
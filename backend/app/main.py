@@ -1,13 +1,47 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
+from app.database import SessionLocal
+from app.logging_config import REQUEST_ID_HEADER, RequestIdMiddleware, configure_logging
 from app.routers import users, demographics, questionnaire, sts_assessment, exercises, recommendations, video_analysis
+from app.routers.video_analysis import job_manager, start_upload_janitor
+from app.services.exercise_catalogue import load_catalogue
+from app.services.llm_runtime import close_http_client
+
+configure_logging(settings.log_level, settings.log_format)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the exercise catalogue cache so the first request skips the table scan
+    db = SessionLocal()
+    try:
+        catalogue = load_catalogue(db)
+        logger.info("Exercise catalogue loaded: %d exercises (version %s)", len(catalogue), catalogue.version)
+    except Exception as e:
+        logger.warning("Could not preload exercise catalogue, will load on first request: %s", e)
+    finally:
+        db.close()
+
+    job_manager.start()
+    janitor = start_upload_janitor()
+    yield
+    janitor.cancel()
+    job_manager.shutdown()
+    await close_http_client()
+
 
 app = FastAPI(
     title="Physiotherapy Exercise Recommendation API",
     description="Backend API for OA Knee Exercise Recommendation System",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -16,7 +50,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[REQUEST_ID_HEADER],
 )
+# Added last so it wraps everything: every request (and websocket) gets an id
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(demographics.router, prefix="/api/demographics", tags=["Demographics"])
@@ -30,3 +67,9 @@ app.include_router(video_analysis.router, prefix="/api/video-analysis", tags=["V
 @app.get("/api/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics: per-stage video analysis timing histograms"""
+    return job_manager.stage_metrics.render()
@@ -124,6 +124,9 @@ class STSAssessment(Base):
     trunk_sway = Column(String(10), nullable=False)
     hip_sway = Column(String(10), nullable=False)
 
+    # Keypoint archive (<job_id>.stsk) of the video analysis these results came from
+    keypoint_archive = Column(String(64))
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -181,3 +184,17 @@ class Exercise(Base):
         CheckConstraint("muscle_glute_med_min BETWEEN 0 AND 5", name="check_muscle_glute_med_min"),
         CheckConstraint("muscle_adductors BETWEEN 0 AND 5", name="check_muscle_adductors"),
     )
+
+
+class LLMResponseCacheEntry(Base):
+    """One cached LLM pipeline output (see app.services.llm_cache)"""
+    __tablename__ = "llm_response_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    kind = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    response = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,23 +1,33 @@
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import get_db
-from app.models import Exercise
-from app.schemas import ExerciseResponse
+from app.schemas import ExerciseResponse, PasscodeVerify, CatalogueReloadResponse
+from app.services.exercise_catalogue import get_catalogue, invalidate_catalogue, load_catalogue
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[ExerciseResponse])
 def list_exercises(db: Session = Depends(get_db)):
-    return db.query(Exercise).all()
+    return get_catalogue(db).records
+
+
+@router.post("/reload", response_model=CatalogueReloadResponse)
+def reload_exercise_catalogue(body: PasscodeVerify, db: Session = Depends(get_db)):
+    """Admin: bump the catalogue version and reload the exercises table."""
+    if body.passcode != settings.physio_passcode:
+        raise HTTPException(status_code=401, detail="Incorrect passcode")
+    invalidate_catalogue()
+    catalogue = load_catalogue(db)
+    return CatalogueReloadResponse(version=catalogue.version, exercise_count=len(catalogue))
 
 
 @router.get("/{exercise_id}", response_model=ExerciseResponse)
 def get_exercise(exercise_id: int, db: Session = Depends(get_db)):
-    ex = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    ex = get_catalogue(db).by_id.get(exercise_id)
     if not ex:
-        from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Exercise not found")
     return ex
@@ -1,255 +1,223 @@
-from datetime import date, datetime
 import asyncio
+import contextvars
+import logging
 from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import get_db
-from app.models import (
-    User, PatientDemographics, QuestionnaireResponse as QRModel,
-    STSAssessment, Exercise,
-)
 from app.schemas import (
     RecommendationRequest, RecommendationResponse,
     LLMRecommendationRequest, LLMRecommendationResponse,
     DeepSeekRecommendationRequest, DeepSeekRecommendationResponse
 )
 from app.services.algorithm import calculate_recommendations
-from app.services.llm_recommendation import get_llm_recommendations
-from app.services.llm_deepseek import get_deepseek_recommendations
+from app.services.exercise_catalogue import get_catalogue
+from app.services.llm_recommendation import aget_llm_recommendations, get_llm_recommendations
+from app.services.llm_deepseek import aget_deepseek_recommendations, get_deepseek_recommendations
+from app.services.llm_cache import get_response_cache
+from app.services.llm_runtime import DEEPSEEK, OPENAI, registry, run_llm_call
+from app.services.patient_snapshot import PatientSnapshot, load_patient_snapshot
+from app.services.single_flight import make_single_flight
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# Thread pool for running blocking LLM calls asynchronously
-executor = ThreadPoolExecutor(max_workers=3)
+# LLM calls run as coroutines (ainvoke); the blocking clients on a thread pool are an opt-in fallback
+executor = ThreadPoolExecutor(max_workers=settings.llm_thread_pool_workers) if settings.llm_thread_pool else None
 
+# Concurrent identical requests (double clicks, remounts, proxy retries) share one LLM computation
+flights = make_single_flight(settings.llm_single_flight)
 
-def _calculate_age(dob: date) -> int:
-    today = date.today()
-    age = today.year - dob.year
-    if (today.month, today.day) < (dob.month, dob.day):
-        age -= 1
-    return age
 
+async def _call_llm(provider: str, async_func, sync_func, *args):
+    """
+    Run an LLM service under its provider's concurrency limit and the request deadline
 
-def _exercise_to_dict(ex: Exercise) -> dict:
-    return {
-        "id": ex.id,
-        "exercise_name": ex.exercise_name,
-        "exercise_name_ch": ex.exercise_name_ch,
-        "position_sl_stand": ex.position_sl_stand,
-        "position_split_stand": ex.position_split_stand,
-        "position_dl_stand": ex.position_dl_stand,
-        "position_quadruped": ex.position_quadruped,
-        "position_supine_lying": ex.position_supine_lying,
-        "position_side_lying": ex.position_side_lying,
-        "muscle_quad": ex.muscle_quad,
-        "muscle_hamstring": ex.muscle_hamstring,
-        "muscle_glute_max": ex.muscle_glute_max,
-        "muscle_hip_flexors": ex.muscle_hip_flexors,
-        "muscle_glute_med_min": ex.muscle_glute_med_min,
-        "muscle_adductors": ex.muscle_adductors,
-        "core_ipsi": ex.core_ipsi,
-        "core_contra": ex.core_contra,
-        "difficulty_level": ex.difficulty_level,
-    }
+    Raises:
+        HTTPException: 504 when the deadline passes
+    """
+    async def call():
+        if executor is None:
+            return await async_func(*args)
+        # Keep the request id for the log records of the pool thread
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(executor, context.run, sync_func, *args)
 
+    return await _limited(provider, call)
 
-def _questionnaire_to_dict(qr: QRModel) -> dict:
-    fields = [
-        "f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9",
-        "f10", "f11", "f12", "f13", "f14", "f15", "f16", "f17",
-        "p1", "p2", "p3", "p4", "p5", "p6", "p7", "p8", "p9",
-        "sp1", "sp2", "sp3", "sp4", "sp5", "st1", "st2",
-        "s1", "s2", "s3", "s4", "s5",
-        "q1", "q2", "q3", "q4",
-        "toe_touch_test",
-    ]
-    return {f: getattr(qr, f, None) for f in fields}
 
+async def _limited(provider: str, call):
+    """
+    call() under the provider's concurrency limit and the request deadline
 
-@router.post("/algorithm")
-def get_algorithm_recommendations(body: RecommendationRequest, db: Session = Depends(get_db)):
-    """Get rule-based algorithm recommendations."""
-    user = db.query(User).filter(User.username == body.username).first()
-    if not user:
+    Raises:
+        HTTPException: 504 when the deadline passes
+    """
+    try:
+        return await run_llm_call(provider, call)
+    except asyncio.TimeoutError:
+        logger.warning("%s LLM request exceeded the %.0fs deadline", provider, settings.llm_request_deadline_seconds)
+        raise HTTPException(
+            status_code=504,
+            detail=f"LLM request timed out after {settings.llm_request_deadline_seconds:.0f}s",
+        )
+
+
+async def _single_flight(key: tuple, compute):
+    """
+    compute(), shared with concurrent requests for the same key (see single_flight)
+
+    Raises:
+        HTTPException: 504 when another worker's computation for the key
+            outlasts the request deadline
+    """
+    if flights is None:
+        return await compute()
+    try:
+        return await flights.run(key, compute)
+    except asyncio.TimeoutError:
+        # compute() reports its own deadline as an HTTPException; this is the cross-worker lock wait
+        logger.warning("Gave up waiting for another worker computing the same request")
+        raise HTTPException(
+            status_code=504,
+            detail=f"LLM request timed out after {settings.llm_request_deadline_seconds:.0f}s",
+        )
+
+
+def _load_complete_snapshot(db: Session, username: str, guidance: bool = False) -> PatientSnapshot:
+    """Load the patient in one query and reject incomplete assessments."""
+    snapshot = load_patient_snapshot(db, username)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    demo = db.query(PatientDemographics).filter(PatientDemographics.username == body.username).first()
-    if not demo:
-        raise HTTPException(status_code=400, detail="Demographics not found. Complete demographics first.")
+    if not snapshot.has_demographics:
+        detail = "Demographics not found. Complete demographics first." if guidance else "Demographics not found."
+        raise HTTPException(status_code=400, detail=detail)
 
-    qr = db.query(QRModel).filter(QRModel.username == body.username).first()
-    if not qr:
-        raise HTTPException(status_code=400, detail="Questionnaire not found. Complete questionnaire first.")
+    if not snapshot.has_questionnaire:
+        detail = "Questionnaire not found. Complete questionnaire first." if guidance else "Questionnaire not found."
+        raise HTTPException(status_code=400, detail=detail)
 
-    sts = db.query(STSAssessment).filter(STSAssessment.username == body.username).first()
-    if not sts:
-        raise HTTPException(status_code=400, detail="STS assessment not found. Complete STS assessment first.")
+    if not snapshot.has_sts_assessment:
+        detail = "STS assessment not found. Complete STS assessment first." if guidance else "STS assessment not found."
+        raise HTTPException(status_code=400, detail=detail)
 
-    exercises = db.query(Exercise).all()
-    if not exercises:
-        raise HTTPException(status_code=500, detail="No exercises found in database.")
+    return snapshot
 
-    questionnaire_dict = _questionnaire_to_dict(qr)
-    exercise_dicts = [_exercise_to_dict(ex) for ex in exercises]
 
-    age = _calculate_age(demo.date_of_birth)
-    gender = demo.gender.lower() if demo.gender else "male"
+@router.post("/algorithm")
+def get_algorithm_recommendations(body: RecommendationRequest, db: Session = Depends(get_db)):
+    """Get rule-based algorithm recommendations."""
+    snapshot = _load_complete_snapshot(db, body.username, guidance=True)
 
-    sts_dict = {
-        "repetition_count": sts.repetition_count,
-        "age": age,
-        "gender": gender,
-        "knee_alignment": sts.knee_alignment,
-        "trunk_sway": sts.trunk_sway,
-        "hip_sway": sts.hip_sway,
-    }
+    catalogue = get_catalogue(db)
+    if not catalogue.records:
+        raise HTTPException(status_code=500, detail="No exercises found in database.")
+
+    questionnaire_dict = snapshot.questionnaire_dict()
+    sts_dict = snapshot.sts_dict()
 
-    results = calculate_recommendations(questionnaire_dict, sts_dict, exercise_dicts)
+    results = catalogue.engine.calculate_recommendations(questionnaire_dict, sts_dict)
     return results
 
 
 @router.post("/llm")
 async def get_llm_recommendation_endpoint(body: LLMRecommendationRequest, db: Session = Depends(get_db)):
     """Get OpenAI LLM-enhanced recommendations using LangChain (async, non-blocking)."""
-    print("\n" + "="*80)
-    print(f"📥 RECEIVED OpenAI request for username: {body.username}, language: {body.language}")
-    print("="*80)
-
-    user = db.query(User).filter(User.username == body.username).first()
-    if not user:
-        print(f"❌ User not found: {body.username}")
-        raise HTTPException(status_code=404, detail="User not found")
-    print(f"✓ User found: {body.username}")
-
-    demo = db.query(PatientDemographics).filter(PatientDemographics.username == body.username).first()
-    if not demo:
-        raise HTTPException(status_code=400, detail="Demographics not found.")
+    logger.info("OpenAI recommendation request for %s (language: %s)", body.username, body.language)
 
-    qr = db.query(QRModel).filter(QRModel.username == body.username).first()
-    if not qr:
-        raise HTTPException(status_code=400, detail="Questionnaire not found.")
+    snapshot = _load_complete_snapshot(db, body.username)
 
-    sts = db.query(STSAssessment).filter(STSAssessment.username == body.username).first()
-    if not sts:
-        raise HTTPException(status_code=400, detail="STS assessment not found.")
-
-    exercises = db.query(Exercise).all()
-    if not exercises:
+    catalogue = get_catalogue(db)
+    if not catalogue.records:
         raise HTTPException(status_code=500, detail="No exercises found in database.")
 
-    questionnaire_dict = _questionnaire_to_dict(qr)
-    exercise_dicts = [_exercise_to_dict(ex) for ex in exercises]
-
-    age = _calculate_age(demo.date_of_birth)
-    gender = demo.gender.lower() if demo.gender else "male"
-
-    sts_dict = {
-        "repetition_count": sts.repetition_count,
-        "age": age,
-        "gender": gender,
-        "knee_alignment": sts.knee_alignment,
-        "trunk_sway": sts.trunk_sway,
-        "hip_sway": sts.hip_sway,
-    }
+    questionnaire_dict = snapshot.questionnaire_dict()
+    exercise_dicts = list(catalogue.dicts)
+    sts_dict = snapshot.sts_dict()
 
     # First run the algorithm
-    print("✓ Running algorithm recommendations...")
     algorithm_results = calculate_recommendations(questionnaire_dict, sts_dict, exercise_dicts)
 
     # Then enhance with OpenAI LLM asynchronously (non-blocking)
-    print("✓ All data fetched from database, calling OpenAI service asynchronously...")
     try:
-        # Run the blocking OpenAI call in a thread pool to avoid blocking the event loop
-        loop = asyncio.get_event_loop()
-        llm_results = await loop.run_in_executor(
-            executor,
-            get_llm_recommendations,
-            algorithm_results,
-            exercise_dicts,
-            sts_dict,
-            questionnaire_dict,
-            body.language,
+        llm_results = await _single_flight(
+            ("llm", body.username, body.language, snapshot.data_version, catalogue.version),
+            lambda: _call_llm(
+                OPENAI,
+                aget_llm_recommendations,
+                get_llm_recommendations,
+                algorithm_results,
+                exercise_dicts,
+                sts_dict,
+                questionnaire_dict,
+                body.language,
+            ),
         )
-        print("✓ OpenAI service completed successfully")
         return llm_results
+    except HTTPException:
+        raise
     except ValueError as e:
-        print(f"❌ ValueError in OpenAI service: {str(e)}")
+        logger.warning("ValueError in OpenAI service: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"❌ Exception in OpenAI service: {str(e)}")
+        logger.exception("Exception in OpenAI service")
         raise HTTPException(status_code=500, detail=f"OpenAI LLM error: {str(e)}")
 
 
 @router.post("/deepseek", response_model=DeepSeekRecommendationResponse)
 async def get_deepseek_recommendation_endpoint(body: DeepSeekRecommendationRequest, db: Session = Depends(get_db)):
     """Get DeepSeek LLM-enhanced recommendations using two-LLM architecture (async, non-blocking)."""
-    print("\n" + "="*80)
-    print(f"📥 RECEIVED DeepSeek request for username: {body.username}, language: {body.language}")
-    print("="*80)
-
-    user = db.query(User).filter(User.username == body.username).first()
-    if not user:
-        print(f"❌ User not found: {body.username}")
-        raise HTTPException(status_code=404, detail="User not found")
-    print(f"✓ User found: {body.username}")
-
-    demo = db.query(PatientDemographics).filter(PatientDemographics.username == body.username).first()
-    if not demo:
-        raise HTTPException(status_code=400, detail="Demographics not found.")
-
-    qr = db.query(QRModel).filter(QRModel.username == body.username).first()
-    if not qr:
-        raise HTTPException(status_code=400, detail="Questionnaire not found.")
+    logger.info("DeepSeek recommendation request for %s (language: %s)", body.username, body.language)
 
-    sts = db.query(STSAssessment).filter(STSAssessment.username == body.username).first()
-    if not sts:
-        raise HTTPException(status_code=400, detail="STS assessment not found.")
+    snapshot = _load_complete_snapshot(db, body.username)
 
-    exercises = db.query(Exercise).all()
-    if not exercises:
+    catalogue = get_catalogue(db)
+    if not catalogue.records:
         raise HTTPException(status_code=500, detail="No exercises found in database.")
 
-    questionnaire_dict = _questionnaire_to_dict(qr)
-    exercise_dicts = [_exercise_to_dict(ex) for ex in exercises]
+    questionnaire_dict = snapshot.questionnaire_dict()
+    exercise_dicts = list(catalogue.dicts)
+    sts_dict = snapshot.sts_dict()
 
-    age = _calculate_age(demo.date_of_birth)
-    gender = demo.gender.lower() if demo.gender else "male"
-
-    sts_dict = {
-        "repetition_count": sts.repetition_count,
-        "age": age,
-        "gender": gender,
-        "knee_alignment": sts.knee_alignment,
-        "trunk_sway": sts.trunk_sway,
-        "hip_sway": sts.hip_sway,
-    }
+    demographics_dict = snapshot.demographics_dict()
 
-    demographics_dict = {
-        "height_cm": float(demo.height_cm),
-        "weight_kg": float(demo.weight_kg),
-    }
+    def compute():
+        args = (questionnaire_dict, sts_dict, exercise_dicts, demographics_dict, body.language)
+        if executor is None:
+            # The service checks the response cache before taking a DeepSeek slot
+            return aget_deepseek_recommendations(*args, limit=lambda call: _limited(DEEPSEEK, call))
+        return _call_llm(DEEPSEEK, aget_deepseek_recommendations, get_deepseek_recommendations, *args)
 
     # Call DeepSeek two-LLM service asynchronously (non-blocking)
-    print("✓ All data fetched from database, calling DeepSeek service asynchronously...")
     try:
-        # Run the blocking DeepSeek call in a thread pool to avoid blocking the event loop
-        loop = asyncio.get_event_loop()
-        deepseek_results = await loop.run_in_executor(
-            executor,
-            get_deepseek_recommendations,
-            questionnaire_dict,
-            sts_dict,
-            exercise_dicts,
-            demographics_dict,
-            body.language,
+        deepseek_results = await _single_flight(
+            ("deepseek", body.username, body.language, snapshot.data_version, catalogue.version),
+            compute,
         )
-        print("✓ DeepSeek service completed successfully")
         return deepseek_results
+    except HTTPException:
+        raise
     except ValueError as e:
-        print(f"❌ ValueError in DeepSeek service: {str(e)}")
+        logger.warning("ValueError in DeepSeek service: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"❌ Exception in DeepSeek service: {str(e)}")
+        logger.exception("Exception in DeepSeek service")
         raise HTTPException(status_code=500, detail=f"DeepSeek LLM error: {str(e)}")
+
+
+@router.get("/health")
+async def health_check():
+    """LLM client registry, provider slots, HTTP connection pool and response cache statistics"""
+    cache = get_response_cache()
+    # A COUNT/SUM query (and a table check on first use), kept off the event loop
+    cache_stats = await asyncio.to_thread(cache.stats) if cache is not None else None
+    return {
+        "status": "ok",
+        "thread_pool": executor is not None,
+        "llm": registry.stats(),
+        "cache": cache_stats,
+        "single_flight": flights.stats() if flights is not None else None,
+    }
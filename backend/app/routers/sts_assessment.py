@@ -21,6 +21,7 @@ def upsert_sts_assessment(body: STSAssessmentCreate, db: Session = Depends(get_d
         existing.knee_alignment = body.knee_alignment
         existing.trunk_sway = body.trunk_sway
         existing.hip_sway = body.hip_sway
+        existing.keypoint_archive = body.keypoint_archive
         db.commit()
         db.refresh(existing)
         return existing
@@ -32,6 +33,7 @@ def upsert_sts_assessment(body: STSAssessmentCreate, db: Session = Depends(get_d
         knee_alignment=body.knee_alignment,
         trunk_sway=body.trunk_sway,
         hip_sway=body.hip_sway,
+        keypoint_archive=body.keypoint_archive,
     )
     db.add(sts)
     db.commit()
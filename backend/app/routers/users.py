@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.models import User, PatientDemographics, QuestionnaireResponse as QRModel, STSAssessment
+from app.models import User
 from app.schemas import UserCreate, UserResponse, UserProgressResponse, PasscodeVerify
 from app.config import settings
+from app.services.patient_snapshot import load_patient_snapshot
 
 router = APIRouter()
 
@@ -39,17 +40,13 @@ def get_user(username: str, db: Session = Depends(get_db)):
 
 @router.get("/{username}/progress", response_model=UserProgressResponse)
 def get_user_progress(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
+    snapshot = load_patient_snapshot(db, username)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    has_demo = db.query(PatientDemographics).filter(PatientDemographics.username == username).first() is not None
-    has_quest = db.query(QRModel).filter(QRModel.username == username).first() is not None
-    has_sts = db.query(STSAssessment).filter(STSAssessment.username == username).first() is not None
-
     return UserProgressResponse(
         username=username,
-        has_demographics=has_demo,
-        has_questionnaire=has_quest,
-        has_sts_assessment=has_sts,
+        has_demographics=snapshot.has_demographics,
+        has_questionnaire=snapshot.has_questionnaire,
+        has_sts_assessment=snapshot.has_sts_assessment,
     )
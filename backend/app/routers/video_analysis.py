@@ -3,84 +3,322 @@ Video Analysis Router
 Handles video upload and STS analysis
 """
 
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, File, Header, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from pathlib import Path
-import shutil
-import uuid
-from typing import Dict
+from typing import AsyncIterator, Dict, Optional
 
-from app.video_analysis import analyze_video
+from app.config import settings
+from app.video_analysis.cache import AnalysisCache
+from app.video_analysis.jobs import VideoAnalysisJobManager, VideoAnalysisUnavailable, JobStatus
+from app.video_analysis.ingest import UploadSpool, UploadTooLarge, iter_upload, run_janitor
+from app.video_analysis.sampling import SamplingConfig
+from app.video_analysis.video_processor import MODEL_NAME
+from app.video_analysis.live_validation import LiveValidationSession, validate_landmarks
+from app.video_analysis.validators import PostureValidator
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Directories
 TEMP_DIR = Path(__file__).parent.parent.parent / "temp"
 MODEL_DIR = Path(__file__).parent.parent / "video_analysis" / "models"
 
+CACHE_DIR = Path(settings.video_cache_dir or Path(__file__).parent.parent.parent / "cache")
+ARCHIVE_DIR = Path(settings.video_keypoint_archive_dir or Path(__file__).parent.parent.parent / "keypoints")
+PROFILE_DIR = Path(settings.video_profile_dir or Path(__file__).parent.parent.parent / "profiles")
+
 # Ensure directories exist
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
+ALLOWED_EXTENSIONS = {'.mp4', '.webm', '.avi', '.mov', '.mkv'}
 
-@router.post("/analyze-sts-video")
-async def analyze_sts_video(file: UploadFile = File(...)) -> Dict:
+# How often the job websocket checks for new progress
+JOB_UPDATE_INTERVAL_SECONDS = 0.25
+
+# Live validation reports waiting to be sent; older ones are dropped when a client falls behind
+LIVE_REPORT_BACKLOG = 8
+
+# Bounded worker-process pool shared by all uploads (started in app lifespan);
+# the keypoint/results cache and keypoint archives are written by its workers
+# ("off" disables either)
+job_manager = VideoAnalysisJobManager(
+    MODEL_DIR,
+    max_workers=settings.video_analysis_workers,
+    sampling=SamplingConfig(mode=settings.video_sampling_mode, stride=settings.video_sampling_stride),
+    inference_size=settings.video_inference_size,
+    cache=(
+        AnalysisCache(CACHE_DIR, max_bytes=settings.video_cache_max_mb * 1024 * 1024)
+        if settings.video_cache_dir.lower() != "off" else None
+    ),
+    archive_dir=ARCHIVE_DIR if settings.video_keypoint_archive_dir.lower() != "off" else None,
+    archive_dtype=settings.video_keypoint_archive_dtype,
+    profile_dir=PROFILE_DIR if settings.video_profiling_enabled else None,
+    log_level=settings.log_level,
+    log_format=settings.log_format,
+)
+
+# Memory-backed upload spool (disk temp overflow), swept by a janitor task started in app lifespan
+upload_spool = UploadSpool(
+    TEMP_DIR,
+    spool_dir=Path(settings.video_spool_dir) if settings.video_spool_dir else None,
+    spool_max_bytes=settings.video_spool_max_mb * 1024 * 1024,
+    max_upload_bytes=settings.video_upload_max_mb * 1024 * 1024,
+)
+
+
+def start_upload_janitor() -> asyncio.Task:
+    """Background task deleting spooled uploads no job is using"""
+    max_age = settings.video_temp_max_age_seconds
+    return asyncio.create_task(
+        run_janitor(upload_spool, max_age, interval_seconds=max_age / 4, in_use=job_manager.active_paths)
+    )
+
+
+def _wants_profile(x_profile: Optional[str]) -> bool:
+    """X-Profile: 1 requests a sampling profile of the analysis"""
+    return (x_profile or "").strip().lower() in ("1", "true", "yes")
+
+
+async def _submit_stream(filename: str, chunks: AsyncIterator[bytes], profile: bool = False):
+    """Validate, spool an upload as it arrives, then queue it for analysis"""
+    # Validate file type
+    file_ext = Path(filename or "").suffix.lower()
+
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+    try:
+        upload = await upload_spool.write(chunks, file_ext)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    video_path = upload.path
+    logger.info("Video saved to: %s (%d bytes)", video_path, upload.size)
+
+    try:
+        return job_manager.submit(video_path, content_hash=upload.sha256, profile=profile)
+    except VideoAnalysisUnavailable as e:
+        video_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        video_path.unlink(missing_ok=True)
+        logger.exception("Error queuing video analysis")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Analysis error: {str(e)}"
+        )
+
+
+async def _submit_upload(file: UploadFile, profile: bool = False):
+    """Validate and store a multipart upload, then queue it for analysis"""
+    return await _submit_stream(file.filename, iter_upload(file), profile)
+
+
+@router.post("/jobs", status_code=202)
+async def create_analysis_job(file: UploadFile = File(...), x_profile: Optional[str] = Header(None)) -> Dict:
     """
-    Analyze uploaded video for sit-to-stand assessment
+    Queue an uploaded video for sit-to-stand analysis
 
     Args:
         file: Video file (mp4, webm, avi, mov, mkv)
+        x_profile: "1" records a sampling profile (when profiling is enabled);
+            fetch it from GET /jobs/{job_id}/profile
 
     Returns:
-        JSON containing analysis results
+        JSON with the job id; poll GET /jobs/{job_id} for status and results
     """
-    # Validate file type
-    allowed_extensions = {'.mp4', '.webm', '.avi', '.mov', '.mkv'}
-    file_ext = Path(file.filename).suffix.lower()
+    job = await _submit_upload(file, _wants_profile(x_profile))
+    return {"job_id": job.job_id, "status": job.status.value}
 
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
-        )
 
-    # Generate unique filename
-    analysis_id = str(uuid.uuid4())
-    temp_video_path = TEMP_DIR / f"{analysis_id}{file_ext}"
+@router.post("/jobs/stream", status_code=202)
+async def create_analysis_job_from_stream(
+    request: Request, filename: str, x_profile: Optional[str] = Header(None)
+) -> Dict:
+    """
+    Queue a video sent as the raw request body (no multipart)
+
+    The body is written to the spool chunk by chunk as it arrives, skipping the
+    temporary copy multipart parsing makes before the handler runs.
+
+    Args:
+        filename: Original file name (its extension selects the container type)
+        x_profile: "1" records a sampling profile (see POST /jobs)
+
+    Returns:
+        JSON with the job id; poll GET /jobs/{job_id} for status and results
+    """
+    job = await _submit_stream(filename, request.stream(), _wants_profile(x_profile))
+    return {"job_id": job.job_id, "status": job.status.value}
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str) -> Dict:
+    """Status, progress and (once completed) results of an analysis job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 
+@router.get("/jobs/{job_id}/profile")
+async def get_analysis_job_profile(job_id: str):
+    """
+    Sampling profile of a job run with X-Profile: 1
+
+    Folded-stack text (one "stack count" line per distinct stack), ready for
+    flamegraph.pl, speedscope or inferno.
+    """
+    profile_path = job_manager.profile_path(job_id)
+    if profile_path is None or not profile_path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(profile_path, media_type="text/plain", filename=profile_path.name)
+
+
+@router.websocket("/jobs/{job_id}/ws")
+async def stream_analysis_job(websocket: WebSocket, job_id: str):
+    """
+    Push job updates (progress and each repetition as it completes) until the job finishes
+
+    Sends the same JSON as GET /jobs/{job_id} whenever it changes, then closes.
+    Repetitions arrive in provisional_reps from the streaming analyzer; the
+    final ones are in results once the job completes and can differ.
+    """
+    await websocket.accept()
+    job = job_manager.get(job_id)
+    if job is None:
+        await websocket.send_json({"error": "Job not found"})
+        await websocket.close(code=1008)
+        return
+
+    last_sent = None
     try:
-        # Save uploaded file
-        with temp_video_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        while True:
+            state = (job.status, job.frames_processed, len(job.provisional_reps))
+            if state != last_sent:
+                await websocket.send_json(job.to_dict())
+                last_sent = state
+            if job.is_finished:
+                break
+            await asyncio.sleep(JOB_UPDATE_INTERVAL_SECONDS)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
 
-        print(f"Video saved to: {temp_video_path}")
 
-        # Run analysis
-        results = analyze_video(temp_video_path, MODEL_DIR)
+def _open_live_session(on_report) -> LiveValidationSession:
+    # The model is only fetched at startup (see VideoAnalysisJobManager.start)
+    if job_manager.model_path is None:
+        raise VideoAnalysisUnavailable(job_manager.model_error or "pose model not loaded")
+    return LiveValidationSession(job_manager.model_path, on_report, inference_size=settings.video_inference_size)
 
-        if results is None:
-            raise HTTPException(
-                status_code=500,
-                detail="Video analysis failed. Could not process video."
-            )
 
-        # Add analysis ID to results
-        results["analysis_id"] = analysis_id
+def _offer_report(reports: asyncio.Queue, report: Dict):
+    """Queue a report, dropping the oldest one if the client is not keeping up"""
+    if reports.full():
+        reports.get_nowait()
+    reports.put_nowait(report)
 
-        return results
 
-    except Exception as e:
-        print(f"Error during video analysis: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Analysis error: {str(e)}"
-        )
+@router.websocket("/live-validation")
+async def live_posture_validation(websocket: WebSocket):
+    """
+    Real-time pre-recording posture validation
+
+    Each message is one camera frame, either:
+    - text: JSON {"landmarks": [[x, y, visibility] x 33] | null, "width": int,
+      "height": int, "frame_id": any}, with MediaPipe landmarks normalised to [0, 1]
+    - binary: a (low-resolution) JPEG frame, run through a LIVE_STREAM landmarker
+      opened for this connection on the first JPEG
+
+    Replies with one JSON report per processed frame: {"frame_id", "detected",
+    "report": {"all_valid", "stance_width", "foot_rotation_left",
+    "foot_rotation_right", "body_placement"}}. JPEG frames that arrive while a
+    detection is running are skipped, so replies keep up with the camera.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    reports: asyncio.Queue = asyncio.Queue(maxsize=LIVE_REPORT_BACKLOG)
+    validator = PostureValidator()
+    session = None
 
+    def on_report(report: Dict):
+        # Called on a MediaPipe thread
+        loop.call_soon_threadsafe(_offer_report, reports, report)
+
+    async def send_reports():
+        while True:
+            await websocket.send_json(await reports.get())
+
+    sender = asyncio.create_task(send_reports())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                if session is None:
+                    try:
+                        session = await run_in_threadpool(_open_live_session, on_report)
+                    except Exception as e:
+                        await websocket.send_json({"error": f"Pose model unavailable: {e}"})
+                        await websocket.close(code=1011)
+                        break
+                frame_id = await run_in_threadpool(session.submit_jpeg, message["bytes"])
+                if frame_id is None:
+                    _offer_report(reports, {"error": "Could not decode JPEG frame"})
+                continue
+
+            try:
+                payload = json.loads(message.get("text") or "")
+                frame_shape = (int(payload["height"]), int(payload["width"]))
+                report = validate_landmarks(payload.get("landmarks"), frame_shape, validator)
+            except (ValueError, KeyError, TypeError) as e:
+                _offer_report(reports, {"error": f"Invalid frame: {e}"})
+                continue
+            report["frame_id"] = payload.get("frame_id")
+            _offer_report(reports, report)
+    except WebSocketDisconnect:
+        pass
     finally:
-        # Clean up temp file
-        if temp_video_path.exists():
-            temp_video_path.unlink()
-            print(f"Cleaned up temp file: {temp_video_path}")
+        sender.cancel()
+        if session is not None:
+            await run_in_threadpool(session.close)
+
+
+@router.post("/analyze-sts-video")
+async def analyze_sts_video(file: UploadFile = File(...), x_profile: Optional[str] = Header(None)) -> Dict:
+    """
+    Analyze uploaded video for sit-to-stand assessment (waits for the job)
+
+    Args:
+        file: Video file (mp4, webm, avi, mov, mkv)
+
+    Returns:
+        JSON containing analysis results
+    """
+    job = await _submit_upload(file, _wants_profile(x_profile))
+
+    # Await the worker process without blocking the event loop. The job's own
+    # done-callback was registered first, so its state is final once this resolves.
+    try:
+        await asyncio.wrap_future(job.future)
+    except Exception:
+        pass
+
+    if job.status == JobStatus.FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+
+    return job.results
 
 
 @router.get("/health")
@@ -89,5 +327,7 @@ async def health_check():
     return {
         "status": "ok",
         "model_dir": str(MODEL_DIR),
-        "model_exists": (MODEL_DIR / "pose_landmarker_heavy.task").exists()
+        "model_exists": (MODEL_DIR / MODEL_NAME).exists(),
+        "pool": job_manager.pool_status(),
+        "jobs": job_manager.stats(),
     }
@@ -177,6 +177,8 @@ class STSAssessmentCreate(BaseModel):
     knee_alignment: str = Field(..., pattern=r"^(normal|valgus|varus)$")
     trunk_sway: str = Field(..., pattern=r"^(present|absent)$")
     hip_sway: str = Field(..., pattern=r"^(present|absent)$")
+    # keypoint_archive of the video analysis results (None for manual entry)
+    keypoint_archive: Optional[str] = Field(None, max_length=64, pattern=r"^[\w-]+\.stsk$")
 
 
 class STSAssessmentResponse(BaseModel):
@@ -186,6 +188,7 @@ class STSAssessmentResponse(BaseModel):
     knee_alignment: str
     trunk_sway: str
     hip_sway: str
+    keypoint_archive: Optional[str] = None
     created_at: Optional[datetime] = None
 
     class Config:
@@ -218,6 +221,11 @@ class ExerciseResponse(BaseModel):
         from_attributes = True
 
 
+class CatalogueReloadResponse(BaseModel):
+    version: int
+    exercise_count: int
+
+
 # ── Recommendation Schemas ────────────────────────────────────────────────────
 
 class RecommendationRequest(BaseModel):
@@ -0,0 +1,143 @@
+"""
+Process-wide exercise catalogue cache.
+
+The exercises table is static once seed.py has run, so the catalogue is loaded
+once (at startup, or lazily on first use) and shared by every endpoint:
+  - an immutable tuple of frozen ExerciseRecord rows
+  - the matching exercise dicts consumed by the algorithm and LLM services
+  - precomputed per-position index lists
+  - a RankingEngine built over the same rows
+
+The cache is invalidated by bumping its version (invalidate_catalogue) or
+through the admin reload endpoint in routers/exercises.py.
+"""
+
+import threading
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Exercise
+from app.services.ranking_engine import RankingEngine
+
+
+@dataclass(frozen=True)
+class ExerciseRecord:
+    """Immutable snapshot of one exercises row"""
+    id: int
+    exercise_name: str
+    exercise_name_ch: Optional[str]
+    position_sl_stand: bool
+    position_split_stand: bool
+    position_dl_stand: bool
+    position_quadruped: bool
+    position_supine_lying: bool
+    position_side_lying: bool
+    muscle_quad: int
+    muscle_hamstring: int
+    muscle_glute_max: int
+    muscle_hip_flexors: int
+    muscle_glute_med_min: int
+    muscle_adductors: int
+    core_ipsi: bool
+    core_contra: bool
+    difficulty_level: int
+
+    @classmethod
+    def from_model(cls, ex: Exercise) -> "ExerciseRecord":
+        return cls(
+            id=ex.id,
+            exercise_name=ex.exercise_name,
+            exercise_name_ch=ex.exercise_name_ch,
+            position_sl_stand=ex.position_sl_stand,
+            position_split_stand=ex.position_split_stand,
+            position_dl_stand=ex.position_dl_stand,
+            position_quadruped=ex.position_quadruped,
+            position_supine_lying=ex.position_supine_lying,
+            position_side_lying=ex.position_side_lying,
+            muscle_quad=ex.muscle_quad,
+            muscle_hamstring=ex.muscle_hamstring,
+            muscle_glute_max=ex.muscle_glute_max,
+            muscle_hip_flexors=ex.muscle_hip_flexors,
+            muscle_glute_med_min=ex.muscle_glute_med_min,
+            muscle_adductors=ex.muscle_adductors,
+            core_ipsi=ex.core_ipsi,
+            core_contra=ex.core_contra,
+            difficulty_level=ex.difficulty_level,
+        )
+
+
+@dataclass(frozen=True)
+class ExerciseCatalogue:
+    """One loaded version of the exercise catalogue"""
+    version: int
+    records: Tuple[ExerciseRecord, ...]
+    # Exercise dicts shared by all requests - treat as read-only
+    dicts: Tuple[dict, ...]
+    # Algorithm position -> indices into records (e.g. "lying" -> supine or side lying)
+    position_index: Dict[str, Tuple[int, ...]]
+    engine: RankingEngine
+    by_id: Dict[int, ExerciseRecord] = field(repr=False)
+
+    @classmethod
+    def build(cls, version: int, records: Tuple[ExerciseRecord, ...]) -> "ExerciseCatalogue":
+        dicts = tuple(asdict(r) for r in records)
+        engine = RankingEngine(dicts)
+        position_index = {
+            position: tuple(np.nonzero(members)[0].tolist())
+            for position, members in engine.position_members.items()
+        }
+        return cls(
+            version=version,
+            records=records,
+            dicts=dicts,
+            position_index=position_index,
+            engine=engine,
+            by_id={r.id: r for r in records},
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def exercises_for_position(self, position: str) -> Tuple[dict, ...]:
+        """Exercise dicts available in an algorithm position (DL_stand, lying, ...)"""
+        return tuple(self.dicts[i] for i in self.position_index.get(position, ()))
+
+
+_lock = threading.Lock()
+_version = 1
+_catalogue: Optional[ExerciseCatalogue] = None
+
+
+def load_catalogue(db: Session) -> ExerciseCatalogue:
+    """Load the exercises table into a new cached catalogue at the current version."""
+    global _catalogue
+    with _lock:
+        version = _version
+        rows = db.query(Exercise).order_by(Exercise.id).all()
+        records = tuple(ExerciseRecord.from_model(ex) for ex in rows)
+        _catalogue = ExerciseCatalogue.build(version, records)
+        return _catalogue
+
+
+def get_catalogue(db: Session) -> ExerciseCatalogue:
+    """Return the cached catalogue, reloading it if the version has been bumped."""
+    catalogue = _catalogue
+    # An empty catalogue (table not seeded yet) is never treated as cached
+    if catalogue is not None and catalogue.version == _version and catalogue.records:
+        return catalogue
+    return load_catalogue(db)
+
+
+def invalidate_catalogue() -> int:
+    """Bump the catalogue version; the next get_catalogue call reloads from the database."""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def catalogue_version() -> int:
+    return _version
@@ -0,0 +1,217 @@
+"""
+LLM Response Cache
+Stores DeepSeek recommendation outputs in a database table, keyed by a hash
+of everything that determines them.
+
+The DeepSeek pipeline runs at temperature 0 and its inputs are fully
+determined by the structured patient profile and the language, so a
+repeated request (a physio reopening a patient's page) is answered from the
+table in milliseconds instead of two LLM calls.
+
+Two kinds of entry:
+- final: profile + language + both system prompts + model -> the complete
+  response (a hit skips both calls)
+- llm1: profile + language + LLM #1 system prompt + model -> the LLM #1
+  output (a hit skips LLM #1, e.g. after LLM #2 failed)
+
+Entries expire after the TTL; the least recently used entries are evicted
+once the table exceeds its size bound. The table lives in the app database
+by default, so every worker shares it; LLM_CACHE_URL can point it at a
+local SQLite file instead.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, delete, func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import engine as app_engine
+from app.models import LLMResponseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+# Bump when the cached response layout changes so stale entries are never served
+CACHE_FORMAT_VERSION = 1
+
+FINAL = "final"
+LLM1 = "llm1"
+
+
+def _digest(parts: Dict) -> str:
+    # Canonical JSON: key order and whitespace never change the key
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def prompt_hash(*prompts: str) -> str:
+    """SHA-256 of the system prompt contents (a prompt edit invalidates the entries)"""
+    digest = hashlib.sha256()
+    for prompt in prompts:
+        digest.update(prompt.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cache_key(kind: str, patient_profile: Dict[str, Any], language: str, prompts: str, model: str) -> str:
+    """
+    Key of one cache entry
+
+    Args:
+        kind: FINAL or LLM1
+        patient_profile: structure_patient_profile() output
+        language: Response language code
+        prompts: prompt_hash() of the system prompts the entry depends on
+        model: Model id and sampling settings
+    """
+    return _digest({
+        "kind": kind,
+        "profile": patient_profile,
+        "language": language,
+        "prompts": prompts,
+        "model": model,
+        "format": CACHE_FORMAT_VERSION,
+    })
+
+
+class LLMResponseCache:
+    """TTL'd, size-bounded LRU cache of LLM outputs in a database table"""
+
+    def __init__(self, engine, ttl: timedelta, max_bytes: int):
+        """
+        Args:
+            engine: SQLAlchemy engine of the database holding llm_response_cache
+            ttl: Age after which entries are no longer served
+            max_bytes: Total response size the table is trimmed back to after each write
+        """
+        self.engine = engine
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sessions = sessionmaker(bind=engine, autoflush=False)
+        self._table_ready = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _ensure_table(self):
+        # init_db creates it in the app database; a separate SQLite file starts empty
+        if not self._table_ready:
+            LLMResponseCacheEntry.__table__.create(self.engine, checkfirst=True)
+            self._table_ready = True
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response, or None (also on database errors)"""
+        now = datetime.now(timezone.utc)
+        try:
+            self._ensure_table()
+            with self._sessions() as session:
+                response = session.scalar(
+                    select(LLMResponseCacheEntry.response)
+                    .where(LLMResponseCacheEntry.cache_key == key, LLMResponseCacheEntry.expires_at > now)
+                )
+                if response is not None:
+                    session.execute(
+                        update(LLMResponseCacheEntry)
+                        .where(LLMResponseCacheEntry.cache_key == key)
+                        .values(last_used_at=now)
+                    )
+                    session.commit()
+        except Exception as e:
+            # A cache failure must never fail the request
+            logger.warning("LLM response cache read failed: %s", e)
+            return None
+
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(response) if response is not None else None
+
+    def put(self, key: str, kind: str, model: str, response: Dict[str, Any]):
+        """Store a response (replacing any entry under key), then evict"""
+        now = datetime.now(timezone.utc)
+        content = json.dumps(response, ensure_ascii=False, default=str)
+        try:
+            self._ensure_table()
+            with self._sessions() as session:
+                session.merge(LLMResponseCacheEntry(
+                    cache_key=key,
+                    kind=kind,
+                    model=model,
+                    response=content,
+                    size_bytes=len(content.encode()),
+                    created_at=now,
+                    expires_at=now + self.ttl,
+                    last_used_at=now,
+                ))
+                session.commit()
+                self._evict(session, now)
+        except Exception as e:
+            logger.warning("LLM response cache write failed: %s", e)
+
+    def _evict(self, session, now: datetime):
+        """Delete expired entries, then least recently used ones until the table fits max_bytes"""
+        session.execute(delete(LLMResponseCacheEntry).where(LLMResponseCacheEntry.expires_at <= now))
+        session.commit()
+
+        total = session.scalar(select(func.coalesce(func.sum(LLMResponseCacheEntry.size_bytes), 0)))
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in session.execute(
+            select(LLMResponseCacheEntry.cache_key, LLMResponseCacheEntry.size_bytes)
+            .order_by(LLMResponseCacheEntry.last_used_at)
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+        session.execute(delete(LLMResponseCacheEntry).where(LLMResponseCacheEntry.cache_key.in_(evicted)))
+        session.commit()
+        logger.info("LLM response cache evicted %d entries", len(evicted))
+
+    def stats(self) -> Dict:
+        try:
+            self._ensure_table()
+            with self._sessions() as session:
+                entries, total = session.execute(
+                    select(func.count(), func.coalesce(func.sum(LLMResponseCacheEntry.size_bytes), 0))
+                    .select_from(LLMResponseCacheEntry)
+                ).one()
+        except Exception as e:
+            return {"error": str(e), "hits": self.hits, "misses": self.misses}
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_hours": self.ttl.total_seconds() / 3600,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """The process-wide response cache per the llm_cache_* settings (None when "off")"""
+    global _cache
+    if settings.llm_cache_url.strip().lower() == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            engine = create_engine(settings.llm_cache_url) if settings.llm_cache_url else app_engine
+            _cache = LLMResponseCache(
+                engine,
+                ttl=timedelta(hours=settings.llm_cache_ttl_hours),
+                max_bytes=settings.llm_cache_max_mb * 1024 * 1024,
+            )
+        return _cache
@@ -3,6 +3,6 @@ DeepSeek LLM Integration Package
 Two-LLM sequential architecture for exercise recommendations
 """
 
-from .deepseek_recommendation_service import get_deepseek_recommendations
+from .deepseek_recommendation_service import aget_deepseek_recommendations, get_deepseek_recommendations
 
-__all__ = ['get_deepseek_recommendations']
+__all__ = ['aget_deepseek_recommendations', 'get_deepseek_recommendations']
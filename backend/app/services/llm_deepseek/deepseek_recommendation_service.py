@@ -1,16 +1,95 @@
 """
 DeepSeek Recommendation Service
 Main orchestrator for two-LLM sequential architecture
+
+Outputs are cached (see app.services.llm_cache): a repeated profile is
+answered without LLM calls, and a cached LLM #1 output skips LLM #1.
 """
 
+import asyncio
+import logging
 import os
 import time
-from typing import Dict, Any, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from langchain_deepseek import ChatDeepSeek
 
+from app.services.llm_cache import FINAL, LLM1, LLMResponseCache, cache_key, get_response_cache, prompt_hash
+from app.services.llm_runtime import DEEPSEEK, registry
 from .data_transformer import structure_patient_profile
-from .llm1_recommendation import generate_exercise_recommendations
-from .llm2_safety_verification import verify_safety_and_finalize
+from .llm1_recommendation import SYSTEM_PROMPT as LLM1_SYSTEM_PROMPT
+from .llm1_recommendation import agenerate_exercise_recommendations, generate_exercise_recommendations
+from .llm2_safety_verification import SYSTEM_PROMPT as LLM2_SYSTEM_PROMPT
+from .llm2_safety_verification import averify_safety_and_finalize, verify_safety_and_finalize
+
+logger = logging.getLogger(__name__)
+
+# Cache entries depend on the prompts they were generated with
+_LLM1_PROMPTS = prompt_hash(LLM1_SYSTEM_PROMPT)
+_FINAL_PROMPTS = prompt_hash(LLM1_SYSTEM_PROMPT, LLM2_SYSTEM_PROMPT)
+
+
+def _build_llm() -> ChatDeepSeek:
+    """DeepSeek chat model, shared by all requests (see llm_runtime.registry)"""
+    # Check if DeepSeek API key is available
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not api_key:
+        raise ValueError(
+            "DEEPSEEK_API_KEY not found in environment variables. "
+            "Please set it in .env file or docker-compose.yml"
+        )
+
+    # Initialize DeepSeek LLM with timeout settings
+    return registry.chat_model(
+        DEEPSEEK, "deepseek-chat",
+        temperature=0,
+        timeout=180,  # 3 minutes timeout for each API call
+        max_retries=2,  # Retry failed requests
+        api_key=api_key,
+    )
+
+
+def _model_id(llm: ChatDeepSeek) -> str:
+    return f"{llm.model_name}@t={llm.temperature}"
+
+
+def _cached(
+    patient_profile: Dict[str, Any], language: str, model: str
+) -> Tuple[Optional[LLMResponseCache], Tuple[str, str], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Cache lookup for one request
+
+    Returns:
+        (cache or None when disabled, (final key, LLM #1 key), cached final
+        response or None, cached LLM #1 output or None)
+    """
+    cache = get_response_cache()
+    keys = (
+        cache_key(FINAL, patient_profile, language, _FINAL_PROMPTS, model),
+        cache_key(LLM1, patient_profile, language, _LLM1_PROMPTS, model),
+    )
+    if cache is None:
+        return None, keys, None, None
+    final = cache.get(keys[0])
+    if final is not None:
+        return cache, keys, final, None
+    return cache, keys, None, cache.get(keys[1])
+
+
+def _combine(llm1_output: Dict[str, Any], llm2_output: Dict[str, Any], timings: Dict[str, float]) -> Dict[str, Any]:
+    """Merge the two LLM outputs into the response and log the step timings"""
+    result = {
+        "biomechanical_targets": llm1_output.get("biomechanical_targets", []),
+        "patient_assessment": llm1_output.get("patient_assessment", {}),
+        "llm1_recommendations": llm1_output.get("selected_exercises", []),
+        "safety_review": llm2_output.get("safety_review", {}),
+        "exercise_decisions": llm2_output.get("exercise_decisions", []),
+        "final_prescription": llm2_output.get("final_prescription", [])
+    }
+    logger.info(
+        "DeepSeek recommendation service complete in %.2fs", sum(timings.values()),
+        extra={name: round(seconds, 3) for name, seconds in timings.items()},
+    )
+    return result
 
 
 def get_deepseek_recommendations(
@@ -21,7 +100,8 @@ def get_deepseek_recommendations(
     language: str = "en"
 ) -> Dict[str, Any]:
     """
-    Get exercise recommendations using DeepSeek two-LLM architecture
+    Get exercise recommendations using DeepSeek two-LLM architecture (blocking;
+    thread pool fallback for aget_deepseek_recommendations)
 
     Args:
         questionnaire_dict: Questionnaire responses
@@ -40,29 +120,7 @@ def get_deepseek_recommendations(
             "final_prescription": [...]
         }
     """
-    start_time = time.time()
-    print("=" * 80)
-    print("🚀 DEEPSEEK RECOMMENDATION SERVICE - START")
-    print("=" * 80)
-
-    # Check if DeepSeek API key is available
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    if not api_key:
-        raise ValueError(
-            "DEEPSEEK_API_KEY not found in environment variables. "
-            "Please set it in .env file or docker-compose.yml"
-        )
-    print("✓ DeepSeek API key found")
-
-    # Initialize DeepSeek LLM with timeout settings
-    llm = ChatDeepSeek(
-        model="deepseek-chat",
-        api_key=api_key,
-        temperature=0,
-        request_timeout=180,  # 3 minutes timeout for each API call
-        max_retries=2,  # Retry failed requests
-    )
-    print("✓ DeepSeek LLM initialized (timeout: 180s, max_retries: 2)")
+    llm = _build_llm()
 
     # Step 1: Transform data to LLM-ready format
     step1_start = time.time()
@@ -72,33 +130,92 @@ def get_deepseek_recommendations(
         exercise_dicts=exercise_dicts,
         demographics=demographics
     )
-    print(f"✓ Step 1: Data transformation complete ({time.time() - step1_start:.2f}s)")
+    transform_seconds = time.time() - step1_start
+
+    cache, (final_key, llm1_key), cached_final, llm1_output = _cached(patient_profile, language, _model_id(llm))
+    if cached_final is not None:
+        logger.info("DeepSeek recommendations served from cache", extra={"transform_seconds": round(transform_seconds, 3)})
+        return cached_final
 
     # Step 2: Run LLM #1 (Exercise Recommendation Agent)
     step2_start = time.time()
-    print("\n🤖 LLM #1: Exercise Recommendation Agent - STARTING...")
-    llm1_output = generate_exercise_recommendations(llm, patient_profile)
-    print(f"✓ LLM #1: COMPLETE ({time.time() - step2_start:.2f}s)")
+    if llm1_output is None:
+        llm1_output = generate_exercise_recommendations(llm, patient_profile)
+        if cache is not None:
+            cache.put(llm1_key, LLM1, _model_id(llm), llm1_output)
+    llm1_seconds = time.time() - step2_start
+    logger.debug("LLM #1 (exercise recommendation) complete in %.2fs", llm1_seconds)
 
     # Step 3: Run LLM #2 (Safety Verification Agent)
     step3_start = time.time()
-    print("\n🛡️ LLM #2: Safety Verification Agent - STARTING...")
     llm2_output = verify_safety_and_finalize(llm, patient_profile, llm1_output)
-    print(f"✓ LLM #2: COMPLETE ({time.time() - step3_start:.2f}s)")
+    llm2_seconds = time.time() - step3_start
+    logger.debug("LLM #2 (safety verification) complete in %.2fs", llm2_seconds)
 
     # Step 4: Combine outputs
-    result = {
-        "biomechanical_targets": llm1_output.get("biomechanical_targets", []),
-        "patient_assessment": llm1_output.get("patient_assessment", {}),
-        "llm1_recommendations": llm1_output.get("selected_exercises", []),
-        "safety_review": llm2_output.get("safety_review", {}),
-        "exercise_decisions": llm2_output.get("exercise_decisions", []),
-        "final_prescription": llm2_output.get("final_prescription", [])
-    }
+    result = _combine(llm1_output, llm2_output, {
+        "transform_seconds": transform_seconds, "llm1_seconds": llm1_seconds, "llm2_seconds": llm2_seconds,
+    })
+    if cache is not None:
+        cache.put(final_key, FINAL, _model_id(llm), result)
+    return result
+
+
+async def aget_deepseek_recommendations(
+    questionnaire_dict: Dict,
+    sts_dict: Dict,
+    exercise_dicts: List[Dict],
+    demographics: Dict,
+    language: str = "en",
+    limit: Optional[Callable[[Callable[[], Awaitable]], Awaitable]] = None,
+) -> Dict[str, Any]:
+    """
+    get_deepseek_recommendations on the event loop: both LLM calls use
+    LangChain `ainvoke` through the shared async HTTP client, so a waiting
+    request holds no thread, and the cache database I/O runs in threads
+
+    Args:
+        limit: Runs the LLM calls, e.g. under the provider's concurrency limit
+            (see llm_runtime.run_llm_call); the cache lookup happens before
+            it, so a cache hit never waits for an LLM slot
+    """
+    llm = _build_llm()
+
+    step1_start = time.time()
+    patient_profile = structure_patient_profile(
+        questionnaire_dict=questionnaire_dict,
+        sts_dict=sts_dict,
+        exercise_dicts=exercise_dicts,
+        demographics=demographics
+    )
+    transform_seconds = time.time() - step1_start
+
+    cache, (final_key, llm1_key), cached_final, cached_llm1 = await asyncio.to_thread(
+        _cached, patient_profile, language, _model_id(llm)
+    )
+    if cached_final is not None:
+        logger.info("DeepSeek recommendations served from cache", extra={"transform_seconds": round(transform_seconds, 3)})
+        return cached_final
+
+    async def call_llms() -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, float]]:
+        step2_start = time.time()
+        llm1_output = cached_llm1
+        if llm1_output is None:
+            llm1_output = await agenerate_exercise_recommendations(llm, patient_profile)
+            if cache is not None:
+                await asyncio.to_thread(cache.put, llm1_key, LLM1, _model_id(llm), llm1_output)
+        llm1_seconds = time.time() - step2_start
+        logger.debug("LLM #1 (exercise recommendation) complete in %.2fs", llm1_seconds)
+
+        step3_start = time.time()
+        llm2_output = await averify_safety_and_finalize(llm, patient_profile, llm1_output)
+        llm2_seconds = time.time() - step3_start
+        logger.debug("LLM #2 (safety verification) complete in %.2fs", llm2_seconds)
+        return llm1_output, llm2_output, {"llm1_seconds": llm1_seconds, "llm2_seconds": llm2_seconds}
 
-    total_time = time.time() - start_time
-    print("=" * 80)
-    print(f"✅ DEEPSEEK RECOMMENDATION SERVICE - COMPLETE (Total: {total_time:.2f}s)")
-    print("=" * 80)
+    llm1_output, llm2_output, llm_timings = await (limit(call_llms) if limit is not None else call_llms())
 
+    result = _combine(llm1_output, llm2_output, {"transform_seconds": transform_seconds, **llm_timings})
+    if cache is not None:
+        await asyncio.to_thread(cache.put, final_key, FINAL, _model_id(llm), result)
     return result
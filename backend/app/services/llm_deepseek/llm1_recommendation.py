@@ -4,15 +4,21 @@ Analyzes patient data and recommends 4 exercises based on clinical reasoning
 Uses Pydantic for structured output
 """
 
-import json
-from typing import Dict, Any, List
+import logging
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 from pydantic import BaseModel, Field
+
+from app.config import settings
+from app.services.llm_runtime import registry, structured_result
+from .profile_encoding import encode_profile, system_prompt
 from .biomechanical_analyzer import (
     identify_biomechanical_targets,
     format_targets_for_prompt,
 )
 
+logger = logging.getLogger(__name__)
+
 
 # Pydantic schemas for structured output
 class PatientAssessment(BaseModel):
@@ -61,36 +67,26 @@ def load_system_prompt() -> str:
         return f.read()
 
 
-# Load system prompt from external file
-SYSTEM_PROMPT = load_system_prompt()
+# Load system prompt from external file (plus the legend of the patient data encoding)
+BASE_SYSTEM_PROMPT = load_system_prompt()
+SYSTEM_PROMPT = system_prompt(BASE_SYSTEM_PROMPT, settings.llm_profile_encoding)
 
 
-def generate_exercise_recommendations(
-    llm, patient_profile: Dict[str, Any]
-) -> Dict[str, Any]:
+def build_messages(
+    patient_profile: Dict[str, Any], targets_text: str, encoding: Optional[str] = None
+) -> List[Dict[str, str]]:
     """
-    Use LLM #1 to generate exercise recommendations with structured output
+    System and user messages of one LLM #1 call
 
     Args:
-        llm: LangChain LLM instance (ChatDeepSeek)
         patient_profile: Structured patient data from data_transformer
-
-    Returns:
-        {
-            "biomechanical_targets": [...],  # Added from rule-based analysis
-            "patient_assessment": {...},
-            "selected_exercises": [...]
-        }
+        targets_text: format_targets_for_prompt() output
+        encoding: Patient data encoding (default: the llm_profile_encoding setting)
     """
-    # Step 1: Rule-based biomechanical target identification
-    print("  → Identifying biomechanical targets...")
-    biomechanical_targets = identify_biomechanical_targets(patient_profile)
-    targets_text = format_targets_for_prompt(biomechanical_targets)
-    print(f"  → Identified {len(biomechanical_targets)} biomechanical targets")
+    encoding = encoding or settings.llm_profile_encoding
 
-    # Step 2: Inject biomechanical targets into system prompt
-    print("  → Customizing system prompt with targets...")
-    customized_system_prompt = SYSTEM_PROMPT.replace(
+    # Inject biomechanical targets into system prompt
+    customized_system_prompt = system_prompt(BASE_SYSTEM_PROMPT, encoding).replace(
         "### 2. **Address Biomechanical Targets**\n"
         "The biomechanical targets specific to this patient have been identified and are provided in the patient data section below. "
         "Your task is to select exercises that address these identified targets using the strategies provided.",
@@ -98,29 +94,43 @@ def generate_exercise_recommendations(
         "Your task is to select exercises that address these identified targets using the strategies provided.",
     )
 
-    # Step 3: Create structured LLM with Pydantic schema
-    print("  → Creating structured LLM...")
-    structured_llm = llm.with_structured_output(ExerciseRecommendation)
-
-    # Step 4: Create user message with patient data only
-    print("  → Preparing user message...")
+    # User message with patient data only
     user_message = f"""PATIENT DATA:
 
-{json.dumps(patient_profile, indent=2)}
+{encode_profile(patient_profile, encoding)}
 
 Analyze this patient and recommend 4 exercises based on their capability and the biomechanical targets identified above."""
 
-    # Step 5: Invoke structured LLM with customized system prompt
-    print("  → Calling DeepSeek API for LLM #1...")
-    try:
-        result = structured_llm.invoke(
-            [
-                {"role": "system", "content": customized_system_prompt},
-                {"role": "user", "content": user_message},
-            ]
-        )
-        print("  → DeepSeek API response received")
+    return [
+        {"role": "system", "content": customized_system_prompt},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def _prepare_request(llm, patient_profile: Dict[str, Any]) -> Tuple[Any, List[Dict[str, str]], list]:
+    """
+    Structured LLM, messages and rule-based biomechanical targets for one LLM #1 call
+
+    Returns:
+        (structured_llm, messages, biomechanical_targets)
+    """
+    # Step 1: Rule-based biomechanical target identification
+    biomechanical_targets = identify_biomechanical_targets(patient_profile)
+    targets_text = format_targets_for_prompt(biomechanical_targets)
+    logger.debug("LLM #1: identified %d biomechanical targets", len(biomechanical_targets))
 
+    # Step 2: Structured LLM with Pydantic schema (raw response kept for the token usage)
+    structured_llm = registry.structured_output(llm, ExerciseRecommendation, include_raw=True)
+
+    # Step 3: Messages with the targets and the encoded patient data
+    messages = build_messages(patient_profile, targets_text)
+    return structured_llm, messages, biomechanical_targets
+
+
+def _finish(result: Optional[ExerciseRecommendation], biomechanical_targets: list) -> Dict[str, Any]:
+    """Validate the structured response and attach the biomechanical targets"""
+    logger.debug("LLM #1: DeepSeek API response received")
+    try:
         # Debug: Check if result is None
         if result is None:
             raise ValueError(
@@ -144,10 +154,52 @@ Analyze this patient and recommend 4 exercises based on their capability and the
         return result_dict
 
     except AttributeError as e:
-        print(f"ERROR in LLM #1: {e}")
-        print(f"Result type: {type(result)}")
-        print(f"Result value: {result}")
+        logger.error("LLM #1 failed: %s (result type %s, value %r)", e, type(result).__name__, result)
         raise
     except Exception as e:
-        print(f"ERROR in LLM #1: {e}")
+        logger.error("LLM #1 failed: %s", e)
+        raise
+
+
+def generate_exercise_recommendations(
+    llm, patient_profile: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Use LLM #1 to generate exercise recommendations with structured output
+
+    Args:
+        llm: LangChain LLM instance (ChatDeepSeek)
+        patient_profile: Structured patient data from data_transformer
+
+    Returns:
+        {
+            "biomechanical_targets": [...],  # Added from rule-based analysis
+            "patient_assessment": {...},
+            "selected_exercises": [...]
+        }
+    """
+    structured_llm, messages, biomechanical_targets = _prepare_request(llm, patient_profile)
+
+    # Step 4: Invoke structured LLM with customized system prompt
+    logger.debug("LLM #1: calling DeepSeek API")
+    try:
+        result = structured_result(structured_llm.invoke(messages), "LLM #1")
+    except Exception as e:
+        logger.error("LLM #1 failed: %s", e)
+        raise
+    return _finish(result, biomechanical_targets)
+
+
+async def agenerate_exercise_recommendations(
+    llm, patient_profile: Dict[str, Any]
+) -> Dict[str, Any]:
+    """generate_exercise_recommendations on the event loop (LangChain `ainvoke`)"""
+    structured_llm, messages, biomechanical_targets = _prepare_request(llm, patient_profile)
+
+    logger.debug("LLM #1: calling DeepSeek API")
+    try:
+        result = structured_result(await structured_llm.ainvoke(messages), "LLM #1")
+    except Exception as e:
+        logger.error("LLM #1 failed: %s", e)
         raise
+    return _finish(result, biomechanical_targets)
@@ -4,11 +4,18 @@ Reviews exercise recommendations and verifies safety constraints
 Uses Pydantic for structured output
 """
 
-import json
-from typing import Dict, Any, List
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from pydantic import BaseModel, Field
 
+from app.config import settings
+from app.services.llm_runtime import registry, structured_result
+from .profile_encoding import encode_json, encode_profile, system_prompt
+
+logger = logging.getLogger(__name__)
 
 # Pydantic schemas for structured output
 class WeightBearingObjectiveData(BaseModel):
@@ -117,8 +124,88 @@ def load_system_prompt() -> str:
         return f.read()
 
 
-# Load system prompt from external file
-SYSTEM_PROMPT = load_system_prompt()
+# Load system prompt from external file (plus the legend of the patient data encoding)
+BASE_SYSTEM_PROMPT = load_system_prompt()
+SYSTEM_PROMPT = system_prompt(BASE_SYSTEM_PROMPT, settings.llm_profile_encoding)
+
+
+# Retry policy for LLM #2 (exponential backoff)
+MAX_RETRIES = 3
+RETRY_DELAY_SECONDS = 2
+
+
+def build_messages(
+    patient_profile: Dict[str, Any], llm1_output: Dict[str, Any], encoding: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """
+    System and user messages of one LLM #2 call
+
+    Args:
+        patient_profile: Structured patient data from data_transformer
+        llm1_output: Exercise recommendations from LLM #1
+        encoding: Patient data encoding (default: the llm_profile_encoding setting)
+    """
+    encoding = encoding or settings.llm_profile_encoding
+
+    # User message with patient data AND LLM #1 recommendations
+    user_message = f"""PATIENT DATA:
+
+{encode_profile(patient_profile, encoding)}
+
+PROPOSED EXERCISES FROM LLM #1:
+
+{encode_json(llm1_output['selected_exercises'], encoding)}
+
+Review each proposed exercise for safety using the constraint checks. Remember to use the flexible "soft start" approach for core stability assessment."""
+
+    return [
+        {"role": "system", "content": system_prompt(BASE_SYSTEM_PROMPT, encoding)},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def _prepare_request(llm, patient_profile: Dict[str, Any], llm1_output: Dict[str, Any]):
+    """
+    Structured LLM and messages for one LLM #2 call
+
+    Returns:
+        (structured_llm, messages)
+    """
+    # Structured LLM with Pydantic schema (raw response kept for the token usage)
+    structured_llm = registry.structured_output(llm, SafetyVerificationOutput, include_raw=True)
+    return structured_llm, build_messages(patient_profile, llm1_output)
+
+
+def _to_dict(result: SafetyVerificationOutput) -> Dict[str, Any]:
+    """Validate one structured response (raises ValueError to trigger a retry)"""
+    # Convert Pydantic model to dict
+    result_dict = result.model_dump()
+
+    # Validate output
+    if len(result_dict["final_prescription"]) != 4:
+        raise ValueError(
+            f"LLM returned {len(result_dict['final_prescription'])} exercises in final prescription, expected 4"
+        )
+
+    logger.debug("LLM #2 (Safety Verification) - success")
+    return result_dict
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """
+    Backoff before the next attempt
+
+    Raises:
+        Exception: All attempts failed
+    """
+    error_msg = str(error)
+    logger.warning("LLM #2 failed (attempt %d/%d): %s", attempt + 1, MAX_RETRIES, error_msg)
+    if attempt >= MAX_RETRIES - 1:
+        logger.error("LLM #2 - all retry attempts failed")
+        raise Exception(f"DeepSeek Safety Verification failed after {MAX_RETRIES} attempts: {error_msg}")
+    delay = RETRY_DELAY_SECONDS * 2 ** attempt
+    logger.info("LLM #2 retrying in %d seconds", delay)
+    return delay
 
 
 def verify_safety_and_finalize(
@@ -139,55 +226,26 @@ def verify_safety_and_finalize(
             "final_prescription": [...]
         }
     """
-    # Create structured LLM with Pydantic schema
-    structured_llm = llm.with_structured_output(SafetyVerificationOutput)
-
-    # Create user message with patient data AND LLM #1 recommendations
-    user_message = f"""PATIENT DATA:
-
-{json.dumps(patient_profile, indent=2)}
-
-PROPOSED EXERCISES FROM LLM #1:
+    structured_llm, messages = _prepare_request(llm, patient_profile, llm1_output)
 
-{json.dumps(llm1_output['selected_exercises'], indent=2)}
+    # Invoke structured LLM with retry logic
+    for attempt in range(MAX_RETRIES):
+        try:
+            logger.debug("LLM #2 (Safety Verification) - attempt %d/%d", attempt + 1, MAX_RETRIES)
+            return _to_dict(structured_result(structured_llm.invoke(messages), "LLM #2"))
+        except Exception as e:
+            time.sleep(_retry_delay(attempt, e))
 
-Review each proposed exercise for safety using the constraint checks. Remember to use the flexible "soft start" approach for core stability assessment."""
 
-    # Invoke structured LLM with retry logic
-    max_retries = 3
-    retry_delay = 2  # seconds
+async def averify_safety_and_finalize(
+    llm, patient_profile: Dict[str, Any], llm1_output: Dict[str, Any]
+) -> Dict[str, Any]:
+    """verify_safety_and_finalize on the event loop (LangChain `ainvoke`; backoff without blocking)"""
+    structured_llm, messages = _prepare_request(llm, patient_profile, llm1_output)
 
-    for attempt in range(max_retries):
+    for attempt in range(MAX_RETRIES):
         try:
-            print(f"LLM #2 (Safety Verification) - Attempt {attempt + 1}/{max_retries}")
-            result = structured_llm.invoke(
-                [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_message},
-                ]
-            )
-
-            # Convert Pydantic model to dict
-            result_dict = result.model_dump()
-
-            # Validate output
-            if len(result_dict["final_prescription"]) != 4:
-                raise ValueError(
-                    f"LLM returned {len(result_dict['final_prescription'])} exercises in final prescription, expected 4"
-                )
-
-            print("LLM #2 (Safety Verification) - Success")
-            return result_dict
-
+            logger.debug("LLM #2 (Safety Verification) - attempt %d/%d", attempt + 1, MAX_RETRIES)
+            return _to_dict(structured_result(await structured_llm.ainvoke(messages), "LLM #2"))
         except Exception as e:
-            error_msg = str(e)
-            print(f"ERROR in LLM #2 (Attempt {attempt + 1}/{max_retries}): {error_msg}")
-
-            if attempt < max_retries - 1:
-                import time
-                print(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                print("LLM #2 - All retry attempts failed")
-                raise Exception(f"DeepSeek Safety Verification failed after {max_retries} attempts: {error_msg}")
+            await asyncio.sleep(_retry_delay(attempt, e))
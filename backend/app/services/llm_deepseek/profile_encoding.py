@@ -0,0 +1,185 @@
+"""
+Patient Profile Encoding for LLM Prompts
+Renders structure_patient_profile() output as prompt text.
+
+"compact" (the default) sends the same information as the indented JSON
+in far fewer input tokens:
+- scalar sections as one `section: key=value; ...` line
+- questionnaire sections and the exercise catalogue as pipe-separated
+  tables with a single header line
+- no indentation, no \\u escapes for the Chinese exercise names
+- fields derivable from others (question codes, totals, difficulty
+  category) and empty lists are left out
+- the constant descriptions of the position question groups move to
+  PROFILE_LEGEND, which is appended to both system prompts once
+
+"json" is the previous indented JSON, kept for comparisons (see
+prompt_regression.py).
+"""
+
+import json
+from typing import Any, Dict, List
+
+from .data_transformer import get_position_relevant_questions
+
+
+COMPACT = "compact"
+JSON = "json"
+
+# Item order of each questionnaire section (see calculate_section_scores)
+SECTION_ITEMS = {
+    "symptoms": "s1-s5",
+    "stiffness": "st1-st2",
+    "pain": "p1-p9",
+    "function_ADL": "f1-f17",
+    "function_sports": "sp1-sp5",
+    "quality_of_life": "q1-q4",
+}
+
+MUSCLE_GROUPS = ("primary_movers", "secondary_movers", "stabiliser")
+
+# Exercise list fields that get a table column only when some exercise has entries
+OPTIONAL_EXERCISE_LISTS = ("safety_constraints", "progression_from", "progression_to")
+
+
+def _value(value: Any) -> str:
+    """Scalar as prompt text (165.0 -> 165)"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _cell(value: str) -> str:
+    # Keep table cells on one line and free of the column separator
+    return value.replace("|", "/").replace("\n", " ")
+
+
+def _scalars(name: str, section: Dict[str, Any]) -> str:
+    return f"{name}: " + "; ".join(f"{key}={_value(value)}" for key, value in section.items())
+
+
+def _questionnaire(sections: Dict[str, Dict[str, Any]]) -> List[str]:
+    lines = ["questionnaire_sections [section|avg|normalized_0_100|item scores]:"]
+    for name, section in sections.items():
+        scores = ",".join(_value(score) for score in section["scores"])
+        lines.append(f"{name}|{_value(section['avg'])}|{_value(section['normalized_0_100'])}|{scores}")
+    return lines
+
+
+def _position_questions(groups: Dict[str, Dict[str, Any]]) -> List[str]:
+    lines = ["position_relevant_questions [code question=score (positions)]:"]
+    for name, group in groups.items():
+        if not group["questions"]:
+            continue
+        questions = []
+        for question in group["questions"]:
+            text = f"{question['code'].upper()} {question['question']}={_value(question['score'])}"
+            if question.get("positions"):
+                text += f" ({','.join(question['positions'])})"
+            questions.append(text)
+        lines.append(f"{name}: " + "; ".join(questions))
+    return lines
+
+
+def _muscles(muscles: Dict[str, List[Dict[str, Any]]]) -> str:
+    groups = []
+    for group in MUSCLE_GROUPS:
+        entries = ",".join(f"{m['muscle']}:{_value(m['value'])}" for m in muscles.get(group, []))
+        if group == "primary_movers":
+            groups.append(entries or "-")
+        elif entries:
+            groups.append(f"{group}={entries}")
+    return ";".join(groups)
+
+
+def _exercises(exercises: List[Dict[str, Any]]) -> List[str]:
+    optional = [field for field in OPTIONAL_EXERCISE_LISTS if any(ex.get(field) for ex in exercises)]
+    columns = ["id", "exercise_name", "exercise_name_ch", "positions", "muscles", "difficulty.level", "core"] + optional
+    lines = [f"exercises [{'|'.join(columns)}]:"]
+    for ex in exercises:
+        core = ",".join(side for side in ("ipsi", "contra") if ex.get(f"core_{side}")) or "-"
+        cells = [
+            _value(ex["id"]),
+            ex["exercise_name"],
+            ex.get("exercise_name_ch") or "-",
+            ",".join(ex["positions"]) or "-",
+            _muscles(ex["muscles"]),
+            _value(ex["difficulty"]["level"]),
+            core,
+        ] + [",".join(str(item) for item in ex.get(field) or []) or "-" for field in optional]
+        lines.append("|".join(_cell(cell) for cell in cells))
+    return lines
+
+
+def encode_profile(patient_profile: Dict[str, Any], encoding: str = COMPACT) -> str:
+    """
+    Patient profile as prompt text
+
+    Args:
+        patient_profile: structure_patient_profile() output
+        encoding: COMPACT or JSON (the indented JSON sent before)
+
+    Returns:
+        The text placed under "PATIENT DATA:" in the user messages
+    """
+    if encoding == JSON:
+        return json.dumps(patient_profile, indent=2)
+
+    lines = []
+    for name, section in patient_profile.items():
+        if name == "questionnaire_sections":
+            lines.extend(_questionnaire(section))
+        elif name == "position_relevant_questions":
+            lines.extend(_position_questions(section))
+        elif name == "exercises":
+            lines.extend(_exercises(section))
+        elif isinstance(section, dict) and all(not isinstance(v, (dict, list)) for v in section.values()):
+            lines.append(_scalars(name, section))
+        else:
+            # Sections added to the profile later are sent as compact JSON rather than dropped
+            lines.append(f"{name}: {encode_json(section, COMPACT)}")
+    return "\n".join(lines)
+
+
+def encode_json(value: Any, encoding: str = COMPACT) -> str:
+    """Other prompt JSON (e.g. the LLM #1 selections sent to LLM #2)"""
+    if encoding == JSON:
+        return json.dumps(value, indent=2)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _legend() -> str:
+    groups = get_position_relevant_questions({})
+    group_notes = "\n".join(
+        f"  * {name}: {group['description']}. {group['interpretation']}"
+        for name, group in groups.items()
+    )
+    items = ", ".join(f"{name} {order}" for name, order in SECTION_ITEMS.items())
+    return f"""
+
+---
+
+## Patient Data Format
+Patient data is sent as compact text rather than JSON; the field names are the ones used above.
+- `section: key=value; ...` lines hold demographics, sts_assessment and flexibility.
+- questionnaire_sections rows are `section|avg|normalized_0_100|item scores`; item scores are in question order ({items}). avg is the 1-4 item mean.
+- position_relevant_questions rows list `CODE question=score (positions)` per group (the questions array of that group):
+{group_notes}
+- exercises rows are `id|exercise_name|exercise_name_ch|positions|muscles|difficulty.level|core`:
+  * positions: the positions array, comma-separated
+  * muscles: primary_movers as muscle:value (0-5), followed by `secondary_movers=` / `stabiliser=` groups when the exercise has them
+  * difficulty.category is low for levels 1-3, moderate for 4-6 and high for 7-10
+  * core: ipsi = core_ipsi true, contra = core_contra true, - = neither
+  * safety_constraints, progression_from and progression_to columns are added only when an exercise has entries; without the column these arrays are empty
+"""
+
+
+# Appended to the LLM system prompts when the compact encoding is used
+PROFILE_LEGEND = _legend()
+
+
+def system_prompt(base: str, encoding: str = COMPACT) -> str:
+    """A system prompt with the legend for the given encoding"""
+    return base + PROFILE_LEGEND if encoding == COMPACT else base
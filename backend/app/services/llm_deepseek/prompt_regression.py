@@ -0,0 +1,352 @@
+"""
+Prompt Encoding Regression Harness
+Checks the compact patient profile encoding (profile_encoding.py) against
+the indented JSON on a fixture set of patients and the seeded exercise
+catalogue:
+
+  round trip   the compact text decodes back to the exact profile, so no
+               field is lost (fails when data_transformer gains a field the
+               encoder does not render)
+  tokens       input tokens of the LLM #1 and LLM #2 messages per encoding
+               (tiktoken cl100k_base as a stand-in for the DeepSeek
+               tokenizer, or a word / symbol estimate without it)
+  --live       runs LLM #1 and LLM #2 on DeepSeek with both encodings and
+               compares the selected exercise ids and final prescriptions;
+               reports the billed token usage (needs DEEPSEEK_API_KEY);
+               --record writes the selections to a JSON file
+
+The compact encoding stays opt-in (LLM_PROFILE_ENCODING=compact) until a
+--live run selects the same exercises on every fixture; its recorded
+selections are the baseline for that change.
+
+Usage:
+    python -m app.services.llm_deepseek.prompt_regression [--exercises exercises.csv]
+        [--live] [--max-mismatches 0] [--record selections.json]
+
+Exits with status 1 if a profile does not round-trip, or (with --live) if
+more fixtures than --max-mismatches select different exercises.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .biomechanical_analyzer import format_targets_for_prompt, identify_biomechanical_targets
+from .data_transformer import get_position_relevant_questions, structure_patient_profile
+from .profile_encoding import COMPACT, JSON, MUSCLE_GROUPS, OPTIONAL_EXERCISE_LISTS, SECTION_ITEMS, encode_profile
+from . import llm1_recommendation as llm1
+from . import llm2_safety_verification as llm2
+
+
+# ── Fixtures ──────────────────────────────────────────────────────────────────
+
+def _codes(order: str) -> List[str]:
+    """'f1-f17' -> ['f1', ..., 'f17']"""
+    first, last = order.split("-")
+    prefix = re.sub(r"\d+$", "", first)
+    return [f"{prefix}{n}" for n in range(int(first[len(prefix):]), int(last[len(prefix):]) + 1)]
+
+
+QUESTION_CODES = [code for order in SECTION_ITEMS.values() for code in _codes(order)]
+
+
+def _questionnaire(default: int, toe_touch: str = "can", **scores: int) -> Dict[str, Any]:
+    answers = {code: scores.get(code, default) for code in QUESTION_CODES}
+    answers["toe_touch_test"] = toe_touch
+    return answers
+
+
+# name -> (questionnaire, STS data, demographics)
+FIXTURES: Dict[str, Tuple[Dict, Dict, Dict]] = {
+    "high_function": (
+        _questionnaire(0, sp2=1),
+        {"age": 62, "gender": "male", "repetition_count": 18, "knee_alignment": "normal",
+         "trunk_sway": "absent", "hip_sway": "absent"},
+        {"height_cm": 175.0, "weight_kg": 78.0},
+    ),
+    "moderate_valgus": (
+        _questionnaire(2, f4=1, sp5=2),
+        {"age": 68, "gender": "female", "repetition_count": 12, "knee_alignment": "valgus",
+         "trunk_sway": "absent", "hip_sway": "present"},
+        {"height_cm": 158.0, "weight_kg": 66.5},
+    ),
+    "severe_both_sways": (
+        _questionnaire(3, "cannot", f1=4, sp4=4, sp5=4),
+        {"age": 78, "gender": "female", "repetition_count": 6, "knee_alignment": "varus",
+         "trunk_sway": "present", "hip_sway": "present"},
+        {"height_cm": 152.0, "weight_kg": 71.0},
+    ),
+    "kneeling_intolerant": (
+        _questionnaire(1, sp5=4, st1=2, st2=2),
+        {"age": 71, "gender": "male", "repetition_count": 13, "knee_alignment": "normal",
+         "trunk_sway": "absent", "hip_sway": "absent"},
+        {"height_cm": 170.0, "weight_kg": 85.0},
+    ),
+    "older_average": (
+        _questionnaire(2, "cannot", f2=3, sp1=3),
+        {"age": 86, "gender": "female", "repetition_count": 8, "knee_alignment": "normal",
+         "trunk_sway": "present", "hip_sway": "absent"},
+        {"height_cm": 150.0, "weight_kg": 55.0},
+    ),
+}
+
+
+def _truthy(value: str) -> bool:
+    return value.strip().lower() in ("true", "1", "yes")
+
+
+def load_exercises(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Exercise dicts (as ExerciseCatalogue.dicts) from the seed CSV"""
+    if path is None:
+        # Docker mount path first, then the repository copy (as seed.py)
+        path = Path("/app/seeds/exercises.csv")
+        if not path.exists():
+            path = Path(__file__).resolve().parents[4] / "database" / "seeds" / "exercises.csv"
+    exercises = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for i, row in enumerate(csv.DictReader(f), start=1):
+            exercise = {"id": i, "exercise_name": row["exercise_name"], "exercise_name_ch": row.get("exercise_name_ch") or None}
+            for key, value in row.items():
+                if key.startswith(("position_", "core_")) or key == "toe_touch":
+                    exercise[key] = _truthy(value)
+                elif key.startswith("muscle_") or key == "difficulty_level":
+                    exercise[key] = int(value or 0)
+            exercises.append(exercise)
+    return exercises
+
+
+def fixture_profiles(exercises: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {
+        name: structure_patient_profile(questionnaire, sts, exercises, demographics)
+        for name, (questionnaire, sts, demographics) in FIXTURES.items()
+    }
+
+
+# ── Round trip ────────────────────────────────────────────────────────────────
+
+def _scalar(text: str) -> Any:
+    if re.fullmatch(r"-?\d+", text):
+        return int(text)
+    if re.fullmatch(r"-?\d+\.\d+", text):
+        return float(text)
+    return {"true": True, "false": False}.get(text, text)
+
+
+def _split_list(cell: str) -> List[str]:
+    return [] if cell == "-" else cell.split(",")
+
+
+def decode_profile(text: str) -> Dict[str, Any]:
+    """Inverse of encode_profile(..., COMPACT) for the fields structure_patient_profile produces"""
+    profile: Dict[str, Any] = {}
+    groups = get_position_relevant_questions({})
+    for group in groups.values():
+        group["questions"] = []
+    table, columns = None, []
+
+    for line in text.splitlines():
+        header = re.fullmatch(r"(\w+) \[(.*)\]:", line)
+        if header:
+            table, columns = header.group(1), header.group(2).split("|")
+            if table == "questionnaire_sections":
+                profile[table] = {}
+            elif table == "position_relevant_questions":
+                profile[table] = groups
+            elif table == "exercises":
+                profile[table] = []
+            continue
+
+        if table == "questionnaire_sections" and "|" in line:
+            name, avg, normalized, scores = line.split("|")
+            scores = [int(score) for score in scores.split(",")]
+            profile[table][name] = {
+                "questions": _codes(SECTION_ITEMS[name]), "scores": scores, "avg": _scalar(avg),
+                "total": sum(scores), "normalized_0_100": _scalar(normalized),
+            }
+            continue
+        if table == "exercises" and "|" in line:
+            cells = dict(zip(columns, line.split("|")))
+            muscles = {group: [] for group in MUSCLE_GROUPS}
+            for i, part in enumerate(cells["muscles"].split(";")):
+                group, entries = ("primary_movers", part) if i == 0 else part.split("=", 1)
+                muscles[group] = [
+                    {"muscle": muscle, "value": int(value)}
+                    for muscle, value in (entry.split(":") for entry in _split_list(entries))
+                ]
+            level = int(cells["difficulty.level"])
+            core = _split_list(cells["core"])
+            exercise = {
+                "id": int(cells["id"]),
+                "exercise_name": cells["exercise_name"],
+                "exercise_name_ch": None if cells["exercise_name_ch"] == "-" else cells["exercise_name_ch"],
+                "positions": _split_list(cells["positions"]),
+                "muscles": muscles,
+                "difficulty": {"level": level, "category": "low" if level <= 3 else "moderate" if level <= 6 else "high"},
+                "core_ipsi": "ipsi" in core,
+                "core_contra": "contra" in core,
+            }
+            for field in OPTIONAL_EXERCISE_LISTS:
+                exercise[field] = _split_list(cells.get(field, "-"))
+            profile[table].append(exercise)
+            continue
+
+        name, rest = line.split(": ", 1)
+        if table == "position_relevant_questions" and name in groups:
+            for item in rest.split("; "):
+                match = re.fullmatch(r"(\w+) (.+)=(\d+)(?: \((.*)\))?", item)
+                question = {"code": match.group(1).lower(), "question": match.group(2), "score": int(match.group(3))}
+                if match.group(4) is not None:
+                    question["positions"] = match.group(4).split(",")
+                groups[name]["questions"].append(question)
+            continue
+        table = None
+        profile[name] = {key: _scalar(value) for key, value in (pair.split("=", 1) for pair in rest.split("; "))}
+    return profile
+
+
+# ── Tokens ────────────────────────────────────────────────────────────────────
+
+def token_counter() -> Tuple[str, Callable[[str], int]]:
+    """(tokenizer name, count function)"""
+    try:
+        import tiktoken
+        # Downloads the vocabulary on first use
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # BPE-like estimate: words, up to 3 digits, symbols and CJK characters one token each,
+        # a whitespace run (e.g. a newline and its indentation) one token
+        pattern = re.compile(r"[A-Za-z]+|\d{1,3}|\s+|[^\sA-Za-z\d]")
+        return "regex estimate (tiktoken unavailable)", lambda text: len(pattern.findall(text))
+    return "cl100k_base", lambda text: len(encoding.encode(text))
+
+
+def _sample_selection(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """A plausible LLM #1 output (4 catalogue exercises) to size the LLM #2 message"""
+    selected = []
+    for ex in profile["exercises"][:4]:
+        selected.append({
+            "exercise_id": ex["id"], "exercise_name": ex["exercise_name"], "exercise_name_ch": ex["exercise_name_ch"] or "",
+            "positions": ex["positions"], "difficulty": ex["difficulty"]["level"],
+            "muscle_targets": {
+                "primary": [f"{m['muscle']}:{m['value']}" for m in ex["muscles"]["primary_movers"]],
+                "secondary": [], "stabiliser": [],
+            },
+            "reasoning": "Addresses the identified quadriceps weakness at a tolerable load.",
+        })
+    return {"selected_exercises": selected}
+
+
+def message_tokens(profile: Dict[str, Any], encoding: str, count: Callable[[str], int]) -> Dict[str, int]:
+    """Input tokens of the LLM #1 and LLM #2 messages for one profile"""
+    targets_text = format_targets_for_prompt(identify_biomechanical_targets(profile))
+    calls = {
+        "llm1": llm1.build_messages(profile, targets_text, encoding),
+        "llm2": llm2.build_messages(profile, _sample_selection(profile), encoding),
+    }
+    return {call: sum(count(m["content"]) for m in messages) for call, messages in calls.items()}
+
+
+# ── Live comparison ───────────────────────────────────────────────────────────
+
+def _invoke(llm, schema, messages) -> Tuple[Any, Dict]:
+    from app.services.llm_runtime import registry
+    output = registry.structured_output(llm, schema, include_raw=True).invoke(messages)
+    if output.get("parsing_error") is not None:
+        raise output["parsing_error"]
+    return output["parsed"], getattr(output["raw"], "usage_metadata", None) or {}
+
+
+def live_compare(profiles: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    LLM #1 and LLM #2 selections per fixture and encoding
+
+    LLM #2 gets the same LLM #1 output (the JSON run's) under both
+    encodings, so its comparison isolates the encoding.
+    """
+    from .deepseek_recommendation_service import _build_llm
+
+    llm = _build_llm()
+    results = {}
+    for name, profile in profiles.items():
+        targets_text = format_targets_for_prompt(identify_biomechanical_targets(profile))
+        row: Dict[str, Any] = {}
+        llm1_output = None
+        for encoding in (JSON, COMPACT):
+            parsed, usage = _invoke(llm, llm1.ExerciseRecommendation, llm1.build_messages(profile, targets_text, encoding))
+            row[f"llm1_{encoding}"] = sorted(ex.exercise_id for ex in parsed.selected_exercises)
+            row[f"llm1_{encoding}_tokens"] = usage.get("input_tokens")
+            llm1_output = llm1_output or {"selected_exercises": [ex.model_dump() for ex in parsed.selected_exercises]}
+        for encoding in (JSON, COMPACT):
+            parsed, usage = _invoke(llm, llm2.SafetyVerificationOutput, llm2.build_messages(profile, llm1_output, encoding))
+            row[f"llm2_{encoding}"] = sorted(ex.exercise_id for ex in parsed.final_prescription)
+            row[f"llm2_{encoding}_tokens"] = usage.get("input_tokens")
+        results[name] = row
+        same = row["llm1_json"] == row["llm1_compact"] and row["llm2_json"] == row["llm2_compact"]
+        print(f"  {name:<22}{'same' if same else 'DIFFERENT':<11}"
+              f"LLM #1 {row['llm1_json']} vs {row['llm1_compact']}  LLM #2 {row['llm2_json']} vs {row['llm2_compact']}")
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.services.llm_deepseek.prompt_regression",
+        description="Compare the compact and JSON patient profile encodings on a fixture set",
+    )
+    parser.add_argument("--exercises", type=Path, help="Exercise seed CSV (default: database/seeds/exercises.csv)")
+    parser.add_argument("--live", action="store_true", help="Also run both encodings on DeepSeek and compare selections")
+    parser.add_argument("--max-mismatches", type=int, default=0, help="Fixtures allowed to select differently (--live)")
+    parser.add_argument("--record", type=Path, help="Write the live selections and token usage to this JSON file")
+    args = parser.parse_args(argv)
+
+    exercises = load_exercises(args.exercises)
+    profiles = fixture_profiles(exercises)
+    tokenizer, count = token_counter()
+    print(f"{len(profiles)} fixtures, {len(exercises)} exercises, tokens counted with {tokenizer}")
+
+    failures = 0
+    print(f"\n{'fixture':<22}{'round trip':>11}{'LLM #1 json':>13}{'compact':>9}{'LLM #2 json':>13}{'compact':>9}{'saved':>8}")
+    totals = {JSON: 0, COMPACT: 0}
+    for name, profile in profiles.items():
+        round_trip = decode_profile(encode_profile(profile, COMPACT)) == profile
+        failures += not round_trip
+        tokens = {encoding: message_tokens(profile, encoding, count) for encoding in (JSON, COMPACT)}
+        for encoding in tokens:
+            totals[encoding] += sum(tokens[encoding].values())
+        saved = 1 - sum(tokens[COMPACT].values()) / sum(tokens[JSON].values())
+        print(f"{name:<22}{'ok' if round_trip else 'FAILED':>11}"
+              f"{tokens[JSON]['llm1']:>13,}{tokens[COMPACT]['llm1']:>9,}"
+              f"{tokens[JSON]['llm2']:>13,}{tokens[COMPACT]['llm2']:>9,}{saved * 100:>7.0f}%")
+    print(f"\nInput tokens per recommendation (both calls, mean): "
+          f"json {totals[JSON] / len(profiles):,.0f} -> compact {totals[COMPACT] / len(profiles):,.0f}")
+
+    if failures:
+        print(f"\nROUND TRIP FAILED for {failures} fixture(s): the compact encoding drops or alters profile fields")
+        return 1
+
+    if args.live:
+        if not os.getenv("DEEPSEEK_API_KEY"):
+            print("\n--live needs DEEPSEEK_API_KEY")
+            return 1
+        print("\nLive selections (exercise ids, json vs compact):")
+        results = live_compare(profiles)
+        if args.record:
+            args.record.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+            print(f"\nSelections written to {args.record}")
+        mismatches = sum(
+            row["llm1_json"] != row["llm1_compact"] or row["llm2_json"] != row["llm2_compact"]
+            for row in results.values()
+        )
+        if mismatches > args.max_mismatches:
+            print(f"\nSELECTIONS DIFFER for {mismatches} fixture(s) (allowed: {args.max_mismatches})")
+            return 1
+        print(f"\n[OK] {len(results) - mismatches}/{len(results)} fixtures select the same exercises")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,17 @@ Uses the algorithm results + clinical guidelines to produce
 natural-language reasoning and enhanced recommendations.
 """
 
+import logging
 import time
 from typing import Dict, List, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 
 from app.config import settings
+from app.services.llm_runtime import OPENAI, registry
+
+logger = logging.getLogger(__name__)
 
 
 class ExerciseRecommendation(BaseModel):
@@ -82,6 +85,144 @@ Respond in {language}.
 """
 
 
+def _api_key_configured() -> bool:
+    return bool(settings.openai_api_key) and settings.openai_api_key != "your-openai-api-key-here"
+
+
+def _no_api_key_results(algorithm_results: Dict[str, Any]) -> Dict[str, Any]:
+    """Algorithm results with a note, when no OpenAI key is configured"""
+    return {
+        "recommendations": [
+            {
+                "exercise_name": ex["exercise"].get("exercise_name", "Unknown"),
+                "position": rec["position"],
+                "difficulty_level": ex["exercise"].get("difficulty_level", 1),
+                "reasoning": f"Algorithm score: {ex['final_score']:.2f} "
+                             f"(difficulty match: {ex['difficulty_score']:.2f}, "
+                             f"alignment: {ex['alignment_modifier']:.2f}, "
+                             f"flexibility: {ex['flexibility_modifier']:.2f})",
+            }
+            for rec in algorithm_results.get("recommendations", [])
+            for ex in rec.get("exercises", [])
+        ],
+        "reasoning": "LLM recommendations unavailable (no API key configured). "
+                     "Showing algorithm-based results.",
+        "clinical_justification": "Based on rule-based algorithm analysis.",
+    }
+
+
+def _fallback_results(algorithm_results: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    """Algorithm results returned when the LLM call fails"""
+    return {
+        "recommendations": [
+            {
+                "exercise_name": ex["exercise"].get("exercise_name", "Unknown"),
+                "position": rec["position"],
+                "difficulty_level": ex["exercise"].get("difficulty_level", 1),
+                "reasoning": f"Algorithm score: {ex['final_score']:.2f}",
+            }
+            for rec in algorithm_results.get("recommendations", [])
+            for ex in rec.get("exercises", [])
+        ],
+        "reasoning": f"LLM unavailable ({str(error)}). Showing algorithm-based results.",
+        "clinical_justification": "Based on rule-based algorithm analysis.",
+    }
+
+
+def _build_chain():
+    """
+    Prompt | ChatOpenAI | parser pipeline, built once per process (see
+    llm_runtime.registry)
+
+    Returns:
+        (chain, format_instructions)
+    """
+    def build():
+        llm = registry.chat_model(
+            OPENAI, "gpt-4o-mini",
+            temperature=0.3,
+            timeout=120,  # 2 minutes timeout
+            max_retries=2,
+            api_key=settings.openai_api_key,
+        )
+        parser = PydanticOutputParser(pydantic_object=LLMRecommendationOutput)
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("human", USER_PROMPT),
+        ])
+        return prompt | llm | parser, parser.get_format_instructions()
+
+    return registry.get(("chain", OPENAI, "gpt-4o-mini", LLMRecommendationOutput), build)
+
+
+def _prompt_inputs(
+    format_instructions: str,
+    algorithm_results: Dict[str, Any],
+    exercises: List[Dict[str, Any]],
+    sts_data: Dict[str, Any],
+    questionnaire: Dict[str, Any],
+    language: str,
+) -> Dict[str, Any]:
+    """Template variables for SYSTEM_PROMPT / USER_PROMPT"""
+    # Format position multipliers
+    pos_mult_str = "\n".join(
+        f"- {k}: {v:.2f}" for k, v in algorithm_results.get("position_multipliers", {}).items()
+    )
+
+    # Format algorithm exercises
+    algo_ex_str = ""
+    for rec in algorithm_results.get("recommendations", []):
+        algo_ex_str += f"\n### Position: {rec['position']} (multiplier: {rec['position_multiplier']:.2f})\n"
+        for ex in rec.get("exercises", []):
+            algo_ex_str += (
+                f"- {ex['exercise'].get('exercise_name', 'Unknown')} "
+                f"(difficulty: {ex['exercise'].get('difficulty_level', '?')}, "
+                f"score: {ex['final_score']:.2f})\n"
+            )
+
+    # Format exercise database (summary)
+    ex_db_str = "\n".join(
+        f"- {ex.get('exercise_name', 'Unknown')} | "
+        f"Difficulty: {ex.get('difficulty_level', '?')} | "
+        f"Quad: {ex.get('muscle_quad', 0)}, Ham: {ex.get('muscle_hamstring', 0)}, "
+        f"GMax: {ex.get('muscle_glute_max', 0)}, GMed: {ex.get('muscle_glute_med_min', 0)}, "
+        f"Add: {ex.get('muscle_adductors', 0)} | "
+        f"Core: {'Yes' if ex.get('core_ipsi') else 'No'}"
+        for ex in exercises[:20]  # Limit to avoid token overflow
+    )
+
+    scores = algorithm_results.get("scores", {})
+    return {
+        "format_instructions": format_instructions,
+        "pain_score": scores.get("pain_score", 0),
+        "symptom_score": scores.get("symptom_score", 0),
+        "sts_score": scores.get("sts_score", 0),
+        "combined_score": scores.get("combined_score", 0),
+        "knee_alignment": sts_data.get("knee_alignment", "normal"),
+        "trunk_sway": sts_data.get("trunk_sway", "absent"),
+        "hip_sway": sts_data.get("hip_sway", "absent"),
+        "toe_touch": questionnaire.get("toe_touch_test", "can"),
+        "position_multipliers": pos_mult_str,
+        "algorithm_exercises": algo_ex_str,
+        "exercise_database": ex_db_str,
+        "language": language,
+    }
+
+
+def _format_result(result: LLMRecommendationOutput, start_time: float, api_seconds: float) -> Dict[str, Any]:
+    logger.info(
+        "OpenAI recommendation service complete in %.2fs", time.time() - start_time,
+        extra={"api_seconds": round(api_seconds, 3)},
+    )
+    return {
+        "recommendations": [r.model_dump() for r in result.recommendations],
+        "reasoning": result.clinical_justification,
+        "clinical_reasoning": result.clinical_justification,  # Match frontend expectation
+        "clinical_justification": result.progression_notes,
+        "llm_enhanced": True,
+    }
+
+
 def get_llm_recommendations(
     algorithm_results: Dict[str, Any],
     exercises: List[Dict[str, Any]],
@@ -89,143 +230,44 @@ def get_llm_recommendations(
     questionnaire: Dict[str, Any],
     language: str = "en",
 ) -> Dict[str, Any]:
-    """Generate LLM-enhanced exercise recommendations using LangChain."""
+    """Generate LLM-enhanced exercise recommendations using LangChain (blocking; thread pool fallback)."""
     start_time = time.time()
-    print("=" * 80)
-    print("🚀 OPENAI RECOMMENDATION SERVICE - START")
-    print("=" * 80)
-
-    if not settings.openai_api_key or settings.openai_api_key == "your-openai-api-key-here":
-        print("❌ OpenAI API key not configured")
-        # Fallback: return algorithm results with a note
-        return {
-            "recommendations": [
-                {
-                    "exercise_name": ex["exercise"].get("exercise_name", "Unknown"),
-                    "position": rec["position"],
-                    "difficulty_level": ex["exercise"].get("difficulty_level", 1),
-                    "reasoning": f"Algorithm score: {ex['final_score']:.2f} "
-                                 f"(difficulty match: {ex['difficulty_score']:.2f}, "
-                                 f"alignment: {ex['alignment_modifier']:.2f}, "
-                                 f"flexibility: {ex['flexibility_modifier']:.2f})",
-                }
-                for rec in algorithm_results.get("recommendations", [])
-                for ex in rec.get("exercises", [])
-            ],
-            "reasoning": "LLM recommendations unavailable (no API key configured). "
-                         "Showing algorithm-based results.",
-            "clinical_justification": "Based on rule-based algorithm analysis.",
-        }
-
-    print("✓ OpenAI API key found")
+    if not _api_key_configured():
+        logger.warning("OpenAI API key not configured, returning algorithm-based results")
+        return _no_api_key_results(algorithm_results)
 
     try:
-        step1_start = time.time()
-        print("\n🤖 Initializing OpenAI LLM (gpt-4o-mini)...")
-        llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            api_key=settings.openai_api_key,
-            request_timeout=120,  # 2 minutes timeout
-            max_retries=2,
-        )
-        print(f"✓ OpenAI LLM initialized ({time.time() - step1_start:.2f}s)")
-
-        step2_start = time.time()
-        print("\n📝 Preparing prompts and parsing data...")
-        parser = PydanticOutputParser(pydantic_object=LLMRecommendationOutput)
-
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", SYSTEM_PROMPT),
-            ("human", USER_PROMPT),
-        ])
-
-        # Format position multipliers
-        pos_mult_str = "\n".join(
-            f"- {k}: {v:.2f}" for k, v in algorithm_results.get("position_multipliers", {}).items()
-        )
+        chain, format_instructions = _build_chain()
+        inputs = _prompt_inputs(format_instructions, algorithm_results, exercises, sts_data, questionnaire, language)
+        api_start = time.time()
+        result = chain.invoke(inputs)
+        return _format_result(result, start_time, time.time() - api_start)
+    except Exception as e:
+        logger.warning("OpenAI LLM failed, returning algorithm-based results: %s", e)
+        # Fallback to algorithm results on any LLM error
+        return _fallback_results(algorithm_results, e)
 
-        # Format algorithm exercises
-        algo_ex_str = ""
-        for rec in algorithm_results.get("recommendations", []):
-            algo_ex_str += f"\n### Position: {rec['position']} (multiplier: {rec['position_multiplier']:.2f})\n"
-            for ex in rec.get("exercises", []):
-                algo_ex_str += (
-                    f"- {ex['exercise'].get('exercise_name', 'Unknown')} "
-                    f"(difficulty: {ex['exercise'].get('difficulty_level', '?')}, "
-                    f"score: {ex['final_score']:.2f})\n"
-                )
-
-        # Format exercise database (summary)
-        ex_db_str = "\n".join(
-            f"- {ex.get('exercise_name', 'Unknown')} | "
-            f"Difficulty: {ex.get('difficulty_level', '?')} | "
-            f"Quad: {ex.get('muscle_quad', 0)}, Ham: {ex.get('muscle_hamstring', 0)}, "
-            f"GMax: {ex.get('muscle_glute_max', 0)}, GMed: {ex.get('muscle_glute_med_min', 0)}, "
-            f"Add: {ex.get('muscle_adductors', 0)} | "
-            f"Core: {'Yes' if ex.get('core_ipsi') else 'No'}"
-            for ex in exercises[:20]  # Limit to avoid token overflow
-        )
 
-        scores = algorithm_results.get("scores", {})
-        print(f"✓ Prompts prepared ({time.time() - step2_start:.2f}s)")
-
-        step3_start = time.time()
-        print("\n🔗 Creating LangChain pipeline...")
-        chain = prompt | llm | parser
-        print(f"✓ Pipeline created ({time.time() - step3_start:.2f}s)")
-
-        step4_start = time.time()
-        print("\n🌐 Calling OpenAI API...")
-        result = chain.invoke({
-            "format_instructions": parser.get_format_instructions(),
-            "pain_score": scores.get("pain_score", 0),
-            "symptom_score": scores.get("symptom_score", 0),
-            "sts_score": scores.get("sts_score", 0),
-            "combined_score": scores.get("combined_score", 0),
-            "knee_alignment": sts_data.get("knee_alignment", "normal"),
-            "trunk_sway": sts_data.get("trunk_sway", "absent"),
-            "hip_sway": sts_data.get("hip_sway", "absent"),
-            "toe_touch": questionnaire.get("toe_touch_test", "can"),
-            "position_multipliers": pos_mult_str,
-            "algorithm_exercises": algo_ex_str,
-            "exercise_database": ex_db_str,
-            "language": language,
-        })
-        print(f"✓ OpenAI API response received ({time.time() - step4_start:.2f}s)")
-
-        final_result = {
-            "recommendations": [r.model_dump() for r in result.recommendations],
-            "reasoning": result.clinical_justification,
-            "clinical_reasoning": result.clinical_justification,  # Match frontend expectation
-            "clinical_justification": result.progression_notes,
-            "llm_enhanced": True,
-        }
-
-        total_time = time.time() - start_time
-        print("=" * 80)
-        print(f"✅ OPENAI RECOMMENDATION SERVICE - COMPLETE (Total: {total_time:.2f}s)")
-        print("=" * 80)
-
-        return final_result
+async def aget_llm_recommendations(
+    algorithm_results: Dict[str, Any],
+    exercises: List[Dict[str, Any]],
+    sts_data: Dict[str, Any],
+    questionnaire: Dict[str, Any],
+    language: str = "en",
+) -> Dict[str, Any]:
+    """Generate LLM-enhanced exercise recommendations on the event loop (LangChain `ainvoke`)."""
+    start_time = time.time()
+    if not _api_key_configured():
+        logger.warning("OpenAI API key not configured, returning algorithm-based results")
+        return _no_api_key_results(algorithm_results)
 
+    try:
+        chain, format_instructions = _build_chain()
+        inputs = _prompt_inputs(format_instructions, algorithm_results, exercises, sts_data, questionnaire, language)
+        api_start = time.time()
+        result = await chain.ainvoke(inputs)
+        return _format_result(result, start_time, time.time() - api_start)
     except Exception as e:
-        print(f"\n❌ ERROR in OpenAI LLM: {str(e)}")
-        print("=" * 80)
-        print("⚠️  FALLBACK: Returning algorithm-based results")
-        print("=" * 80)
+        logger.warning("OpenAI LLM failed, returning algorithm-based results: %s", e)
         # Fallback to algorithm results on any LLM error
-        return {
-            "recommendations": [
-                {
-                    "exercise_name": ex["exercise"].get("exercise_name", "Unknown"),
-                    "position": rec["position"],
-                    "difficulty_level": ex["exercise"].get("difficulty_level", 1),
-                    "reasoning": f"Algorithm score: {ex['final_score']:.2f}",
-                }
-                for rec in algorithm_results.get("recommendations", [])
-                for ex in rec.get("exercises", [])
-            ],
-            "reasoning": f"LLM unavailable ({str(e)}). Showing algorithm-based results.",
-            "clinical_justification": "Based on rule-based algorithm analysis.",
-        }
+        return _fallback_results(algorithm_results, e)
@@ -0,0 +1,273 @@
+"""
+LLM Call Runtime
+Shared HTTP clients, a per-process registry of LLM client objects,
+per-provider concurrency limits and request deadlines for the OpenAI and
+DeepSeek recommendation services.
+
+LLM calls run as coroutines on the event loop (LangChain `ainvoke`), so an
+in-flight call costs a coroutine and a pooled connection rather than an OS
+thread. A semaphore per provider caps how many calls are sent at once; the
+rest wait on the event loop. The deadline covers both the wait for a slot
+and the call itself.
+
+Chat models, structured-output runnables and prompt chains are built once
+per process by the registry (keyed by model, temperature and timeout) and
+reused by every request, so requests skip client construction, JSON schema
+generation and TLS handshakes: all clients send through the same two
+keep-alive connection pools (async for `ainvoke`, sync for the thread pool
+fallback).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+OPENAI = "openai"
+DEEPSEEK = "deepseek"
+
+_http_client: Optional[httpx.AsyncClient] = None
+_sync_http_client: Optional[httpx.Client] = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+# provider -> calls holding a slot / waiting for one
+_active: Dict[str, int] = {}
+_waiting: Dict[str, int] = {}
+
+
+def provider_concurrency(provider: str) -> int:
+    return {
+        OPENAI: settings.llm_openai_concurrency,
+        DEEPSEEK: settings.llm_deepseek_concurrency,
+    }[provider]
+
+
+def _pool_limits() -> httpx.Limits:
+    connections = provider_concurrency(OPENAI) + provider_concurrency(DEEPSEEK)
+    return httpx.Limits(
+        max_connections=connections,
+        max_keepalive_connections=connections,
+        keepalive_expiry=settings.llm_keepalive_seconds,
+    )
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """The process-wide async HTTP client the LLM clients send requests through"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        # The LLM clients pass their own per-request timeouts
+        _http_client = httpx.AsyncClient(limits=_pool_limits(), timeout=httpx.Timeout(None))
+    return _http_client
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide sync HTTP client (thread pool fallback)"""
+    global _sync_http_client
+    if _sync_http_client is None or _sync_http_client.is_closed:
+        _sync_http_client = httpx.Client(limits=_pool_limits(), timeout=httpx.Timeout(None))
+    return _sync_http_client
+
+
+async def close_http_client():
+    """Close the shared clients and drop the registry built on them (app shutdown)"""
+    global _http_client, _sync_http_client
+    registry.clear()
+    client, _http_client = _http_client, None
+    if client is not None:
+        await client.aclose()
+    sync_client, _sync_http_client = _sync_http_client, None
+    if sync_client is not None:
+        sync_client.close()
+
+
+class LLMRegistry:
+    """
+    Process-wide cache of LLM client objects
+
+    Entries are built on first use and kept for the life of the process.
+    Safe to use from the event loop and from thread pool workers.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Any] = {}
+        self._hits: Dict[Hashable, int] = {}
+        self._build_seconds: Dict[Hashable, float] = {}
+        # Re-entrant: a factory may request the entries it is built from
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """The entry for key, built by factory the first time it is requested"""
+        with self._lock:
+            if key in self._entries:
+                self._hits[key] += 1
+                return self._entries[key]
+            # Built under the lock: concurrent first requests build once
+            start = time.perf_counter()
+            entry = factory()
+            self._entries[key] = entry
+            self._hits[key] = 0
+            self._build_seconds[key] = time.perf_counter() - start
+            return entry
+
+    def chat_model(self, provider: str, model: str, temperature: float, timeout: float, max_retries: int = 2, **kwargs):
+        """
+        Shared chat model sending through the pooled HTTP clients
+
+        Args:
+            provider: OPENAI (ChatOpenAI) or DEEPSEEK (ChatDeepSeek)
+            model: Model id
+            temperature: Sampling temperature
+            timeout: Per-request timeout (seconds)
+            max_retries: Client-level retries of failed requests
+            **kwargs: Further client arguments (e.g. api_key); not part of the key
+        """
+        def build():
+            if provider == DEEPSEEK:
+                from langchain_deepseek import ChatDeepSeek as chat_class
+            else:
+                from langchain_openai import ChatOpenAI as chat_class
+            return chat_class(
+                model=model, temperature=temperature, request_timeout=timeout, max_retries=max_retries,
+                http_client=get_http_client(), http_async_client=get_async_http_client(), **kwargs,
+            )
+
+        return self.get(("chat", provider, model, temperature, timeout, max_retries), build)
+
+    def structured_output(self, llm, schema: type, include_raw: bool = False):
+        """llm.with_structured_output(schema), built (and its JSON schema generated) once"""
+        return self.get(
+            ("structured", id(llm), schema, include_raw),
+            lambda: llm.with_structured_output(schema, include_raw=include_raw),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits.clear()
+            self._build_seconds.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = [
+                {
+                    "key": _describe_key(key),
+                    "hits": self._hits[key],
+                    "build_ms": round(self._build_seconds[key] * 1000, 1),
+                }
+                for key in self._entries
+            ]
+        return {
+            "entries": entries,
+            "providers": {
+                provider: {
+                    "limit": provider_concurrency(provider),
+                    "active": _active.get(provider, 0),
+                    "waiting": _waiting.get(provider, 0),
+                }
+                for provider in (OPENAI, DEEPSEEK)
+            },
+            "http": {
+                "async": _pool_stats(_http_client),
+                "sync": _pool_stats(_sync_http_client),
+            },
+        }
+
+
+def _describe_key(key: Tuple) -> str:
+    if key[0] == "structured":
+        # The model is identified by id(); the schema name is enough
+        return f"structured:{key[2].__name__}"
+    return ":".join(part.__name__ if isinstance(part, type) else str(part) for part in key)
+
+
+def structured_result(output: Dict[str, Any], call: str) -> Any:
+    """
+    Parsed response of an include_raw structured-output call; logs the token usage
+
+    Args:
+        output: {"raw": AIMessage, "parsed": ..., "parsing_error": ...}
+        call: Name of the call for the log record (e.g. "LLM #1")
+
+    Raises:
+        Exception: The response could not be parsed into the schema
+    """
+    usage = getattr(output.get("raw"), "usage_metadata", None) or {}
+    logger.info(
+        "%s token usage: %s in, %s out", call, usage.get("input_tokens"), usage.get("output_tokens"),
+        extra={"llm_call": call, "input_tokens": usage.get("input_tokens"), "output_tokens": usage.get("output_tokens")},
+    )
+    if output.get("parsing_error") is not None:
+        raise output["parsing_error"]
+    return output.get("parsed")
+
+
+def _pool_stats(client) -> Optional[Dict]:
+    """Open / idle keep-alive connections of a shared client (None until it is first used)"""
+    if client is None or client.is_closed:
+        return None
+    # httpx does not expose its connection pool; read httpcore's if it is there
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    return {
+        "connections": len(connections),
+        "idle": sum(1 for connection in connections if connection.is_idle()),
+        "max_connections": provider_concurrency(OPENAI) + provider_concurrency(DEEPSEEK),
+    }
+
+
+# Shared by the OpenAI and DeepSeek services
+registry = LLMRegistry()
+
+
+def provider_semaphore(provider: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(provider)
+    if semaphore is None:
+        semaphore = _semaphores[provider] = asyncio.Semaphore(provider_concurrency(provider))
+    return semaphore
+
+
+async def run_llm_call(
+    provider: str,
+    call: Callable[[], Awaitable[T]],
+    deadline_seconds: Optional[float] = None,
+) -> T:
+    """
+    Run one LLM call under the provider's concurrency limit and a deadline
+
+    Args:
+        provider: OPENAI or DEEPSEEK
+        call: Starts the call (invoked once a slot is free)
+        deadline_seconds: Limit on slot wait + call time (default: the
+            llm_request_deadline_seconds setting; 0 = none)
+
+    Returns:
+        The call's result
+
+    Raises:
+        asyncio.TimeoutError: The deadline passed; the call is cancelled
+    """
+    if deadline_seconds is None:
+        deadline_seconds = settings.llm_request_deadline_seconds
+
+    async def limited() -> T:
+        _waiting[provider] = _waiting.get(provider, 0) + 1
+        try:
+            await provider_semaphore(provider).acquire()
+        finally:
+            _waiting[provider] -= 1
+        _active[provider] = _active.get(provider, 0) + 1
+        try:
+            return await call()
+        finally:
+            _active[provider] -= 1
+            provider_semaphore(provider).release()
+
+    return await asyncio.wait_for(limited(), deadline_seconds or None)
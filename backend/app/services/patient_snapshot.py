@@ -0,0 +1,151 @@
+"""
+Single-round-trip patient snapshot loader.
+
+Fetches a user together with demographics, questionnaire and STS assessment
+in one joined query keyed on username, and returns a compact immutable
+PatientSnapshot in the dict shapes the algorithm and LLM services expect.
+"""
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+from app.models import User
+
+
+QUESTION_FIELDS = [
+    "f1", "f2", "f3", "f4", "f5", "f6", "f7", "f8", "f9",
+    "f10", "f11", "f12", "f13", "f14", "f15", "f16", "f17",
+    "p1", "p2", "p3", "p4", "p5", "p6", "p7", "p8", "p9",
+    "sp1", "sp2", "sp3", "sp4", "sp5", "st1", "st2",
+    "s1", "s2", "s3", "s4", "s5",
+    "q1", "q2", "q3", "q4",
+    "toe_touch_test",
+]
+
+
+def calculate_age(dob: date) -> int:
+    today = date.today()
+    age = today.year - dob.year
+    if (today.month, today.day) < (dob.month, dob.day):
+        age -= 1
+    return age
+
+
+@dataclass(frozen=True)
+class DemographicsSnapshot:
+    date_of_birth: date
+    gender: str
+    height_cm: float
+    weight_kg: float
+
+
+@dataclass(frozen=True)
+class STSSnapshot:
+    repetition_count: int
+    knee_alignment: str
+    trunk_sway: str
+    hip_sway: str
+
+
+@dataclass(frozen=True)
+class PatientSnapshot:
+    """Everything the recommendation endpoints need about one patient"""
+    user_id: int
+    username: str
+    demographics: Optional[DemographicsSnapshot]
+    questionnaire: Optional[Dict[str, Any]]
+    sts: Optional[STSSnapshot]
+
+    @property
+    def has_demographics(self) -> bool:
+        return self.demographics is not None
+
+    @property
+    def has_questionnaire(self) -> bool:
+        return self.questionnaire is not None
+
+    @property
+    def has_sts_assessment(self) -> bool:
+        return self.sts is not None
+
+    @property
+    def is_complete(self) -> bool:
+        return self.has_demographics and self.has_questionnaire and self.has_sts_assessment
+
+    @property
+    def data_version(self) -> str:
+        """Short hash of the assessment data; changes whenever any of it is edited"""
+        data = {
+            "demographics": asdict(self.demographics) if self.demographics is not None else None,
+            "questionnaire": self.questionnaire,
+            "sts": asdict(self.sts) if self.sts is not None else None,
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    def questionnaire_dict(self) -> Dict[str, Any]:
+        return dict(self.questionnaire)
+
+    def sts_dict(self) -> Dict[str, Any]:
+        """STS data enriched with age and gender, as used by the algorithm and LLM services"""
+        return {
+            "repetition_count": self.sts.repetition_count,
+            "age": calculate_age(self.demographics.date_of_birth),
+            "gender": self.demographics.gender.lower() if self.demographics.gender else "male",
+            "knee_alignment": self.sts.knee_alignment,
+            "trunk_sway": self.sts.trunk_sway,
+            "hip_sway": self.sts.hip_sway,
+        }
+
+    def demographics_dict(self) -> Dict[str, float]:
+        return {
+            "height_cm": self.demographics.height_cm,
+            "weight_kg": self.demographics.weight_kg,
+        }
+
+
+def load_patient_snapshot(db: Session, username: str) -> Optional[PatientSnapshot]:
+    """
+    Load user + demographics + questionnaire + STS in a single joined query.
+
+    Returns:
+        PatientSnapshot, or None if the user does not exist
+    """
+    user = (
+        db.query(User)
+        .options(
+            joinedload(User.demographics),
+            joinedload(User.questionnaire),
+            joinedload(User.sts_assessment),
+        )
+        .filter(User.username == username)
+        .first()
+    )
+    if user is None:
+        return None
+
+    demo = user.demographics
+    qr = user.questionnaire
+    sts = user.sts_assessment
+
+    return PatientSnapshot(
+        user_id=user.id,
+        username=user.username,
+        demographics=DemographicsSnapshot(
+            date_of_birth=demo.date_of_birth,
+            gender=demo.gender,
+            height_cm=float(demo.height_cm),
+            weight_kg=float(demo.weight_kg),
+        ) if demo is not None else None,
+        questionnaire={f: getattr(qr, f, None) for f in QUESTION_FIELDS} if qr is not None else None,
+        sts=STSSnapshot(
+            repetition_count=sts.repetition_count,
+            knee_alignment=sts.knee_alignment,
+            trunk_sway=sts.trunk_sway,
+            hip_sway=sts.hip_sway,
+        ) if sts is not None else None,
+    )
@@ -0,0 +1,310 @@
+"""
+Vectorised batch ranking engine (NumPy port of services/algorithm.py).
+
+The exercise catalogue is loaded once into column arrays:
+  - position flags as a bitmask per exercise
+  - muscle recruitment scores as an int8 (exercises x muscles) matrix
+  - difficulty level and core stability as vectors
+
+Patients are then scored together as a (patients x exercises) matrix, so
+ranking a clinic-wide batch costs a handful of array operations instead of
+per-exercise Python loops. Output is identical to
+``calculate_recommendations`` (including tie order within a position).
+"""
+
+from typing import Dict, List, Any, Sequence
+
+import numpy as np
+
+from app.services.algorithm import calculate_sts_score, calculate_enhanced_combined_score
+
+
+# ── Catalogue layout ──────────────────────────────────────────────────────────
+
+POSITION_FLAG_COLUMNS = [
+    "position_sl_stand",
+    "position_split_stand",
+    "position_dl_stand",
+    "position_quadruped",
+    "position_supine_lying",
+    "position_side_lying",
+]
+
+# Bit assigned to each position flag column
+POSITION_BITS = {col: 1 << i for i, col in enumerate(POSITION_FLAG_COLUMNS)}
+
+# Algorithm positions -> bitmask of flag columns that qualify an exercise
+POSITION_MASKS = {
+    "DL_stand": POSITION_BITS["position_dl_stand"],
+    "split_stand": POSITION_BITS["position_split_stand"],
+    "SL_stand": POSITION_BITS["position_sl_stand"],
+    "quadruped": POSITION_BITS["position_quadruped"],
+    "lying": POSITION_BITS["position_supine_lying"] | POSITION_BITS["position_side_lying"],
+}
+
+MUSCLE_COLUMNS = [
+    "muscle_quad",
+    "muscle_hamstring",
+    "muscle_glute_max",
+    "muscle_hip_flexors",
+    "muscle_glute_med_min",
+    "muscle_adductors",
+]
+_MUSCLE_IDX = {col: i for i, col in enumerate(MUSCLE_COLUMNS)}
+
+# ── Questionnaire layout ──────────────────────────────────────────────────────
+
+# Same order as calculate_position_multipliers (lying is derived, always last)
+POSITION_ORDER = ["DL_stand", "split_stand", "SL_stand", "quadruped", "lying"]
+
+POSITION_QUESTIONS = {
+    "DL_stand": ["f3", "f4", "f5", "f6", "f8", "sp1"],
+    "split_stand": ["f1", "f2", "f3", "f7", "f13", "f15", "sp1", "sp4"],
+    "SL_stand": ["f1", "f2", "f4", "f9", "f11", "sp1", "sp2", "sp3", "sp4"],
+    "quadruped": ["f5", "sp5", "st2", "p3", "p4"],
+}
+
+PAIN_QUESTIONS = ["p1", "p2", "p3", "p4", "p5", "p6", "p7", "p8", "p9"]
+SYMPTOM_QUESTIONS = ["sp1", "sp2", "sp3", "sp4", "sp5"]
+
+
+def _masked_average(values: np.ndarray) -> np.ndarray:
+    """Row-wise mean of positive entries (0 when none), matching algorithm._average."""
+    valid = values > 0
+    counts = valid.sum(axis=1)
+    totals = np.where(valid, values, 0).sum(axis=1)
+    return np.divide(totals, counts, out=np.zeros(len(values)), where=counts > 0)
+
+
+ANSWER_CODES = sorted(
+    {code for codes in POSITION_QUESTIONS.values() for code in codes}
+    | set(PAIN_QUESTIONS) | set(SYMPTOM_QUESTIONS)
+)
+_ANSWER_IDX = {code: i for i, code in enumerate(ANSWER_CODES)}
+
+
+def _answers_matrix(questionnaires: Sequence[dict]) -> np.ndarray:
+    """(patients x ANSWER_CODES) matrix of answers, missing/None as 0."""
+    return np.array(
+        [[int(q.get(code, 0) or 0) for code in ANSWER_CODES] for q in questionnaires],
+        dtype=np.float64,
+    ).reshape(len(questionnaires), len(ANSWER_CODES))
+
+
+def _columns(answers: np.ndarray, questions: List[str]) -> np.ndarray:
+    return answers[:, [_ANSWER_IDX[code] for code in questions]]
+
+
+class RankingEngine:
+    """Column-oriented exercise catalogue that ranks many patients at once."""
+
+    def __init__(self, exercises: Sequence[dict]):
+        """
+        Args:
+            exercises: Exercise dicts (same shape as used by calculate_recommendations)
+        """
+        self.exercises = tuple(exercises)
+        n = len(self.exercises)
+
+        self.position_bits = np.zeros(n, dtype=np.uint8)
+        for col, bit in POSITION_BITS.items():
+            flags = np.array([bool(ex.get(col)) for ex in self.exercises], dtype=bool)
+            self.position_bits[flags] |= bit
+
+        self.muscles = np.array(
+            [[ex.get(col, 0) or 0 for col in MUSCLE_COLUMNS] for ex in self.exercises],
+            dtype=np.int8,
+        ).reshape(n, len(MUSCLE_COLUMNS))
+        self.difficulty = np.array(
+            [ex.get("difficulty_level", 1) for ex in self.exercises], dtype=np.float64
+        )
+        self.core_ipsi = np.array([bool(ex.get("core_ipsi")) for ex in self.exercises], dtype=bool)
+
+        # Per-exercise modifier vectors for each patient finding
+        glute_med = self.muscles[:, _MUSCLE_IDX["muscle_glute_med_min"]].astype(np.float64)
+        adductors = self.muscles[:, _MUSCLE_IDX["muscle_adductors"]].astype(np.float64)
+        hip_ext = np.maximum(
+            self.muscles[:, _MUSCLE_IDX["muscle_hamstring"]],
+            self.muscles[:, _MUSCLE_IDX["muscle_glute_max"]],
+        ).astype(np.float64)
+        self._alignment_rows = {
+            "valgus": 1.0 + glute_med / 5.0,
+            "varus": 1.0 + adductors / 5.0,
+        }
+        self._flexibility_row = 1.0 + hip_ext / 12.5
+
+        self.position_members = {
+            pos: (self.position_bits & mask) != 0 for pos, mask in POSITION_MASKS.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.exercises)
+
+    # ── Layer 1: positions ────────────────────────────────────────────────────
+
+    @staticmethod
+    def position_multipliers(answers: np.ndarray) -> np.ndarray:
+        """(patients x 5) multiplier matrix in POSITION_ORDER from an _answers_matrix."""
+        multipliers = np.empty((len(answers), len(POSITION_ORDER)))
+        for j, position in enumerate(POSITION_ORDER[:-1]):
+            avg = _masked_average(_columns(answers, POSITION_QUESTIONS[position]))
+            multipliers[:, j] = (4 - avg) / 4
+        best_active = multipliers[:, :-1].max(axis=1)
+        multipliers[:, -1] = np.maximum(0.1, 1.0 - best_active)
+        return multipliers
+
+    # ── Layer 2: exercises ────────────────────────────────────────────────────
+
+    def score_matrix(
+        self,
+        combined_scores: np.ndarray,
+        knee_alignments: Sequence[str],
+        toe_touches: Sequence[str],
+    ) -> Dict[str, np.ndarray]:
+        """
+        Score every exercise for every patient.
+
+        Returns:
+            Dict of (patients x exercises) matrices: difficulty_score,
+            alignment_modifier, flexibility_modifier and final_score
+        """
+        combined = np.asarray(combined_scores, dtype=np.float64)
+        n_patients = len(combined)
+        n_ex = len(self.exercises)
+
+        preferred = 1 + combined * 9
+        distance = np.abs(self.difficulty[None, :] - preferred[:, None])
+        difficulty = 1 / (1 + distance * 0.2)
+
+        alignment = np.ones((n_patients, n_ex))
+        for finding, row in self._alignment_rows.items():
+            rows = np.array([a == finding for a in knee_alignments], dtype=bool)
+            alignment[rows] = row
+
+        flexibility = np.ones((n_patients, n_ex))
+        cannot = np.array([t == "cannot" for t in toe_touches], dtype=bool)
+        flexibility[cannot] = self._flexibility_row
+
+        final = difficulty * alignment * flexibility
+        return {
+            "difficulty_score": difficulty,
+            "alignment_modifier": alignment,
+            "flexibility_modifier": flexibility,
+            "final_score": final,
+        }
+
+    # ── Orchestration ─────────────────────────────────────────────────────────
+
+    def calculate_recommendations_batch(
+        self, questionnaires: Sequence[dict], sts_list: Sequence[dict], top_n: int = 2
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank exercises for many patients at once.
+
+        Args:
+            questionnaires: One questionnaire dict per patient
+            sts_list: One STS dict per patient (repetition_count, age, gender, ...)
+            top_n: Exercises kept per selected position
+
+        Returns:
+            One recommendation payload per patient, identical to calculate_recommendations
+        """
+        if len(questionnaires) != len(sts_list):
+            raise ValueError("questionnaires and sts_list must have the same length")
+        n_patients = len(questionnaires)
+        if n_patients == 0:
+            return []
+
+        answers = _answers_matrix(questionnaires)
+        multipliers = self.position_multipliers(answers)
+        pain_avg = _masked_average(_columns(answers, PAIN_QUESTIONS))
+        symptoms_avg = _masked_average(_columns(answers, SYMPTOM_QUESTIONS))
+
+        knee_alignments = [s.get("knee_alignment", "normal") for s in sts_list]
+        toe_touches = [q.get("toe_touch_test", "can") for q in questionnaires]
+        core_required = np.array(
+            [s.get("trunk_sway") == "present" or s.get("hip_sway") == "present" for s in sts_list],
+            dtype=bool,
+        )
+
+        sts_scores = [
+            calculate_sts_score(s["repetition_count"], s["age"], s["gender"]) for s in sts_list
+        ]
+        combined = np.array([
+            calculate_enhanced_combined_score(p, sy, st)
+            for p, sy, st in zip(pain_avg.tolist(), symptoms_avg.tolist(), sts_scores)
+        ])
+
+        scores = self.score_matrix(combined, knee_alignments, toe_touches)
+        final = scores["final_score"]
+
+        # Top-2 positions per patient (stable, so ties keep POSITION_ORDER)
+        best_positions = np.argsort(-multipliers, axis=1, kind="stable")[:, :2]
+
+        # Eligible exercises per patient and position: position flag AND core filter
+        core_ok = self.core_ipsi[None, :] | ~core_required[:, None]
+
+        score_names = ("difficulty_score", "alignment_modifier", "flexibility_modifier", "final_score")
+        ranked: Dict[tuple, List[dict]] = {}
+        for j, position in enumerate(POSITION_ORDER):
+            patients = np.nonzero((best_positions == j).any(axis=1))[0]
+            if len(patients) == 0:
+                continue
+            eligible = self.position_members[position][None, :] & core_ok[patients]
+            masked = np.where(eligible, final[patients], -np.inf)
+            order = np.argsort(-masked, axis=1, kind="stable")[:, :top_n]
+            counts = np.minimum(eligible.sum(axis=1), top_n).tolist()
+            # Gather the top-n columns for the whole group, then convert once
+            picked = {
+                name: np.take_along_axis(scores[name][patients], order, axis=1).tolist()
+                for name in score_names
+            }
+            order_list = order.tolist()
+            for row, p in enumerate(patients.tolist()):
+                ranked[(p, position)] = [
+                    {
+                        "exercise": self.exercises[order_list[row][k]],
+                        **{name: picked[name][row][k] for name in score_names},
+                    }
+                    for k in range(counts[row])
+                ]
+
+        # Convert once to Python floats; per-element numpy indexing is the slow part
+        multipliers_list = multipliers.tolist()
+        pain_scores = ((4 - pain_avg) / 4).tolist()
+        symptom_scores = ((4 - symptoms_avg) / 4).tolist()
+        combined_list = combined.tolist()
+
+        results = []
+        for p in range(n_patients):
+            recommendations = [
+                {
+                    "position": POSITION_ORDER[j],
+                    "position_multiplier": multipliers_list[p][j],
+                    "exercises": ranked[(p, POSITION_ORDER[j])],
+                }
+                for j in best_positions[p].tolist()
+            ]
+
+            sts = sts_list[p]
+            results.append({
+                "position_multipliers": dict(zip(POSITION_ORDER, multipliers_list[p])),
+                "scores": {
+                    "pain_score": pain_scores[p],
+                    "symptom_score": symptom_scores[p],
+                    "sts_score": sts_scores[p],
+                    "combined_score": combined_list[p],
+                },
+                "recommendations": recommendations,
+                "biomechanical_flags": {
+                    "core_stability_required": bool(core_required[p]),
+                    "flexibility_deficit": toe_touches[p] == "cannot",
+                    "alignment_issue": sts.get("knee_alignment", "normal") != "normal",
+                },
+            })
+
+        return results
+
+    def calculate_recommendations(self, questionnaire: dict, sts_data: dict) -> Dict[str, Any]:
+        """Single-patient convenience wrapper around calculate_recommendations_batch."""
+        return self.calculate_recommendations_batch([questionnaire], [sts_data])[0]
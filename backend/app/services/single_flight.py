@@ -0,0 +1,195 @@
+"""
+Single-Flight Request De-duplication
+Concurrent identical recommendation requests share one computation.
+
+Double clicks, React strict-mode remounts and proxy retries send the same
+request several times; without de-duplication each one pays for its own LLM
+calls. SingleFlight runs the first request for a key as a task and hands
+every request that arrives while it is in flight the same result (or the
+same exception). The key includes the patient's data version, so a request
+made after an edit never receives a result computed from older data.
+
+The shared task is shielded from its callers: a client that disconnects
+does not cancel the computation the other callers are waiting on.
+
+Across worker processes a FlightLock serialises the computations for a
+key. PostgresAdvisoryLock holds a Postgres advisory lock while computing;
+the worker that waited then finds the first worker's response in the LLM
+response cache (see llm_cache) instead of calling the LLMs again.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import engine as app_engine
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class FlightLock:
+    """Cross-worker lock around one computation (the base class locks nothing)"""
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        yield
+
+
+class PostgresAdvisoryLock(FlightLock):
+    """
+    Session-level Postgres advisory lock per key
+
+    The lock is polled with pg_try_advisory_lock so a waiting worker never
+    blocks its event loop (the database calls run in threads); it is
+    released when the computation ends (or with the connection if the
+    worker dies).
+    """
+
+    def __init__(self, engine, poll_seconds: float = 0.25, timeout_seconds: Optional[float] = None):
+        """
+        Args:
+            engine: SQLAlchemy engine of a Postgres database shared by all
+                workers; every held lock keeps one of its connections open
+                for the whole computation, so it should not be the engine
+                serving requests
+            poll_seconds: Interval between lock attempts while another worker holds it
+            timeout_seconds: Longest wait for another worker's computation (None = no limit)
+        """
+        self.engine = engine
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+
+    @staticmethod
+    def lock_id(key: str) -> int:
+        """Signed 64-bit advisory lock id of a key"""
+        return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big", signed=True)
+
+    @staticmethod
+    def _try_lock(connection, lock_id: int) -> bool:
+        locked = connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id}).scalar()
+        # The lock belongs to the session, so no transaction is left open while computing
+        connection.commit()
+        return bool(locked)
+
+    @staticmethod
+    def _unlock(connection, lock_id: int):
+        connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+        connection.commit()
+
+    async def _acquire(self, connection, lock_id: int):
+        """
+        Raises:
+            asyncio.TimeoutError: Another worker held the lock for longer than timeout_seconds
+        """
+        deadline = time.monotonic() + self.timeout_seconds if self.timeout_seconds else None
+        waited = False
+        while not await asyncio.to_thread(self._try_lock, connection, lock_id):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise asyncio.TimeoutError(
+                    f"Advisory lock {lock_id} still held by another worker after {self.timeout_seconds:g}s"
+                )
+            waited = True
+            await asyncio.sleep(self.poll_seconds)
+        if waited:
+            logger.debug("Acquired advisory lock %d after waiting for another worker", lock_id)
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        lock_id = self.lock_id(key)
+        # Advisory locks belong to the connection, so one connection is held throughout
+        connection = await asyncio.to_thread(self.engine.connect)
+        try:
+            await self._acquire(connection, lock_id)
+            try:
+                yield
+            finally:
+                await asyncio.to_thread(self._unlock, connection, lock_id)
+        finally:
+            await asyncio.to_thread(connection.close)
+
+
+class SingleFlight:
+    """Shares one in-flight computation per key between concurrent callers"""
+
+    def __init__(self, lock: Optional[FlightLock] = None):
+        """
+        Args:
+            lock: Cross-worker lock held while computing (default: this worker only)
+        """
+        self.lock = lock or FlightLock()
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Result of compute(), shared with concurrent calls for the same key
+
+        Args:
+            key: Identifies identical requests (must include a data version)
+            compute: Starts the computation (only called when no call for key is in flight)
+
+        Returns:
+            The result of the one computation for key
+
+        Raises:
+            Exception: Whatever the computation raised, to every caller
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._compute(key, compute))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._finished(key, done))
+            self.started += 1
+        else:
+            self.joined += 1
+            logger.info("Joined in-flight request", extra={"flight": str(key)})
+        return await asyncio.shield(flight)
+
+    def _finished(self, key: Hashable, flight: asyncio.Task):
+        self._flights.pop(key, None)
+        # Mark the exception as retrieved even if every caller has gone away
+        if not flight.cancelled():
+            flight.exception()
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        async with self.lock.hold(repr(key)):
+            return await compute()
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "joined": self.joined,
+            "lock": type(self.lock).__name__,
+        }
+
+
+def make_single_flight(backend: str) -> Optional[SingleFlight]:
+    """
+    SingleFlight for a backend name
+
+    Args:
+        backend: "off", "local" (per worker) or "postgres" (also across
+            workers, via advisory locks in the app database)
+    """
+    backend = backend.strip().lower()
+    if backend == "off":
+        return None
+    if backend == "postgres":
+        # Unpooled connections of their own: a lock holds one for the whole
+        # computation, which must not starve the request pool
+        lock_engine = create_engine(app_engine.url, poolclass=NullPool)
+        return SingleFlight(PostgresAdvisoryLock(
+            lock_engine, timeout_seconds=settings.llm_request_deadline_seconds or None,
+        ))
+    return SingleFlight()
@@ -4,19 +4,29 @@ Provides MediaPipe Pose-based biomechanical analysis
 """
 
 from .pose_engine import StandardBody, PoseAdapter, MediaPipeAdapter
+from .pose_sequence import PoseSequence
+from .archive import KeypointArchive, load_archive, write_archive
 from .analyzer import SitToStandAnalyzer, ClinicalMetrics, Repetition
+from .streaming import StreamingSitToStandAnalyzer
 from .validators import PostureValidator, PostureValidationReport
+from .sampling import SamplingConfig
 from .video_processor import process_video, analyze_video
 
 __all__ = [
     'StandardBody',
     'PoseAdapter',
     'MediaPipeAdapter',
+    'PoseSequence',
+    'KeypointArchive',
+    'load_archive',
+    'write_archive',
     'SitToStandAnalyzer',
     'ClinicalMetrics',
     'Repetition',
+    'StreamingSitToStandAnalyzer',
     'PostureValidator',
     'PostureValidationReport',
+    'SamplingConfig',
     'process_video',
     'analyze_video',
 ]
@@ -7,11 +7,18 @@ Implements the complete mathematical pipeline for clinical metrics analysis:
 - Biomechanical Analysis (Knee Valgus, Lateral Trunk Sway)
 """
 
+import logging
+
 import numpy as np
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Union
 from enum import Enum
 from .pose_engine import StandardBody
+from .pose_sequence import PoseSequence
+from .smoothing import OneEuroFilter, MovingAverageFilter, smooth
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
 
 
 class PostureState(Enum):
@@ -79,84 +86,124 @@ class ClinicalMetrics:
     instability_count: int
 
 
-class OneEuroFilter:
+class RepetitionSegmenter:
     """
-    One Euro Filter for smooth keypoint tracking
-    Reference: https://gery.casiez.net/1euro/
+    Sit-to-stand state machine, advanced one frame at a time
+
+    Shared by the batch analyzer (fixed calibration) and the streaming
+    analyzer (running calibration).
     """
 
-    def __init__(self, freq=30, mincutoff=1.0, beta=0.007, dcutoff=1.0):
+    def __init__(self, velocity_threshold: float):
+        """
+        Args:
+            velocity_threshold: Upward hip velocity (pixels/frame, negative) that starts an ascent
+        """
+        self.velocity_threshold = velocity_threshold
+        self.state = PostureState.SITTING
+        self._rep_data = self._new_rep_data(0)  # Sitting from the very first frame
+
+    @staticmethod
+    def _new_rep_data(sitting_start_frame: int) -> dict:
+        return {
+            "start_frame": None, "end_frame": None,
+            "sitting_start_frame": sitting_start_frame,
+            "sitting_end_frame": None,
+            "ascending_start_frame": None, "ascending_end_frame": None,
+            "standing_start_frame": None, "standing_end_frame": None,
+            "descending_start_frame": None, "descending_end_frame": None,
+        }
+
+    @property
+    def sitting_start_frame(self) -> Optional[int]:
+        """Frame the current (unfinished) repetition's sitting phase began"""
+        return self._rep_data["sitting_start_frame"]
+
+    def step(self, frame: int, hip_y: float, velocity: float, stand_y: float, sit_y: float) -> Optional[Repetition]:
         """
+        Advance the state machine by one frame
+
         Args:
-            freq: Sampling frequency (Hz)
-            mincutoff: Minimum cutoff frequency
-            beta: Cutoff slope
-            dcutoff: Cutoff frequency for derivative
+            frame: Frame index
+            hip_y: Smoothed mid-hip y-coordinate
+            velocity: Change in hip_y since the previous frame (negative = moving up)
+            stand_y: Calibrated standing hip y
+            sit_y: Calibrated sitting hip y
+
+        Returns:
+            The Repetition completed on this frame, if any (self.state is the frame's phase)
         """
-        self.freq = freq
-        self.mincutoff = mincutoff
-        self.beta = beta
-        self.dcutoff = dcutoff
-        self.x_prev = None
-        self.dx_prev = 0.0
+        current_rep_data = self._rep_data
 
-    def __call__(self, x):
-        """Apply filter to new value"""
-        if self.x_prev is None:
-            self.x_prev = x
-            return x
+        # Calculate position relative to calibration
+        range_height = sit_y - stand_y
+        # percent_standing: 0 when sitting deep, 1 when standing tall
+        percent_standing = (sit_y - hip_y) / range_height if range_height > 0 else 0
+        percent_standing = np.clip(percent_standing, 0, 1)
 
-        # Estimate derivative
-        dx = (x - self.x_prev) * self.freq
-        edx = self._smoothing_factor(self.dcutoff) * dx + (1 - self._smoothing_factor(self.dcutoff)) * self.dx_prev
+        completed = None
 
-        # Calculate cutoff
-        cutoff = self.mincutoff + self.beta * abs(edx)
+        # --- State Transition Logic ---
+        if self.state == PostureState.SITTING:
+            if velocity < self.velocity_threshold and percent_standing > 0.1:
+                self.state = PostureState.ASCENDING
+                current_rep_data["start_frame"] = frame
+                current_rep_data["ascending_start_frame"] = frame
+                current_rep_data["sitting_end_frame"] = frame - 1 # End of sitting phase for this rep
 
-        # Filter the signal
-        result = self._smoothing_factor(cutoff) * x + (1 - self._smoothing_factor(cutoff)) * self.x_prev
+        elif self.state == PostureState.ASCENDING:
+            if percent_standing > 0.8:
+                self.state = PostureState.STANDING
+                current_rep_data["ascending_end_frame"] = frame - 1
+                current_rep_data["standing_start_frame"] = frame
+            elif velocity > -self.velocity_threshold and percent_standing < 0.3: # Aborted ascent
+                self.state = PostureState.SITTING
+                # Reset data as this was an aborted rep, and a new sitting phase starts here
+                self._rep_data = self._new_rep_data(frame)
 
-        # Update state
-        self.x_prev = result
-        self.dx_prev = edx
+        elif self.state == PostureState.STANDING:
+            if velocity > abs(self.velocity_threshold):
+                self.state = PostureState.DESCENDING
+                current_rep_data["standing_end_frame"] = frame - 1
+                current_rep_data["descending_start_frame"] = frame
 
-        return result
+        elif self.state == PostureState.DESCENDING:
+            if percent_standing < 0.2:
+                self.state = PostureState.SITTING
+                current_rep_data["descending_end_frame"] = frame - 1
+                current_rep_data["end_frame"] = frame # End of repetition
 
-    def _smoothing_factor(self, cutoff):
-        """Calculate smoothing factor"""
-        tau = 1.0 / (2 * np.pi * cutoff)
-        te = 1.0 / self.freq
-        return 1.0 / (1.0 + tau / te)
+                # Record completed repetition
+                if current_rep_data["start_frame"] is not None:
+                    completed = Repetition(**current_rep_data)
 
+                # Reset for next repetition - a new sitting phase starts now
+                self._rep_data = self._new_rep_data(frame)
 
-class MovingAverageFilter:
-    """Simple moving average filter for keypoint smoothing"""
+        return completed
 
-    def __init__(self, window_size=5):
-        self.window_size = window_size
-        self.buffer = []
 
-    def __call__(self, x):
-        """Apply moving average to new value"""
-        self.buffer.append(x)
-        if len(self.buffer) > self.window_size:
-            self.buffer.pop(0)
-        return np.mean(self.buffer)
+def _present(angles: np.ndarray) -> List[float]:
+    """Drop the NaN (masked) entries of a per-frame angle array"""
+    return angles[~np.isnan(angles)].tolist()
 
 
 class SitToStandAnalyzer:
     """Main analyzer for sit-to-stand clinical metrics"""
 
-    def __init__(self, fps=30, filter_type='one_euro', enable_validators=True):
+    def __init__(self, fps=30, filter_type='one_euro', enable_validators=True, validator=None, timer=None):
         """
         Args:
             fps: Frames per second of video
             filter_type: 'one_euro' or 'moving_average'
             enable_validators: Enable per-repetition posture validation
+            validator: PostureValidator to use, e.g. with tuned ratios (default: created on first use)
+            timer: StageTimer receiving the analysis stages (default: a private one)
         """
         self.fps = fps
         self.filter_type = filter_type
         self.enable_validators = enable_validators
+        self.timer = timer if timer is not None else StageTimer()
 
         # Thresholds (based on clinical literature)
         self.VALGUS_THRESHOLD = 168.0  # degrees
@@ -169,57 +216,59 @@ class SitToStandAnalyzer:
         self.max_trunk_height = None
         self.frame_phases: List[PostureState] = [] # Stores PostureState for each frame
 
-        # Validator (lazy initialization)
-        self._validator = None
+        # Validator (lazy initialization unless one is given)
+        self._validator = validator
 
-    def preprocess_sequence(self, bodies: List[StandardBody]) -> np.ndarray:
+    def preprocess_sequence(self, bodies: Union[PoseSequence, List[StandardBody]]) -> np.ndarray:
         """
         Step 1: Preprocess and smooth keypoint sequence
 
         Args:
-            bodies: List of StandardBody objects (one per frame)
+            bodies: PoseSequence or list of StandardBody objects (one per frame)
 
         Returns:
             Array of smoothed mid-hip positions (N, 2) with x, y
         """
         # Extract mid-hip positions
-        mid_hip_positions = []
-        for body in bodies:
-            if body.mid_hip is not None and body.mid_hip[2] > 0.3:  # Confidence check
-                mid_hip_positions.append([body.mid_hip[0], body.mid_hip[1]])
-            else:
-                # Use last valid position if current is invalid
-                if mid_hip_positions:
-                    mid_hip_positions.append(mid_hip_positions[-1])
+        if isinstance(bodies, PoseSequence):
+            mid_hip_array = self._mid_hip_track(bodies)
+        else:
+            mid_hip_positions = []
+            for body in bodies:
+                if body.mid_hip is not None and body.mid_hip[2] > 0.3:  # Confidence check
+                    mid_hip_positions.append([body.mid_hip[0], body.mid_hip[1]])
                 else:
-                    mid_hip_positions.append([0, 0])
-
-        mid_hip_array = np.array(mid_hip_positions)
-
-        # Apply smoothing
-        if self.filter_type == 'one_euro':
-            filter_x = OneEuroFilter(freq=self.fps)
-            filter_y = OneEuroFilter(freq=self.fps)
-            smoothed = np.zeros_like(mid_hip_array)
-            for i in range(len(mid_hip_array)):
-                smoothed[i, 0] = filter_x(mid_hip_array[i, 0])
-                smoothed[i, 1] = filter_y(mid_hip_array[i, 1])
-        else:  # moving_average
-            filter_x = MovingAverageFilter(window_size=5)
-            filter_y = MovingAverageFilter(window_size=5)
-            smoothed = np.zeros_like(mid_hip_array)
-            for i in range(len(mid_hip_array)):
-                smoothed[i, 0] = filter_x(mid_hip_array[i, 0])
-                smoothed[i, 1] = filter_y(mid_hip_array[i, 1])
+                    # Use last valid position if current is invalid
+                    if mid_hip_positions:
+                        mid_hip_positions.append(mid_hip_positions[-1])
+                    else:
+                        mid_hip_positions.append([0, 0])
+
+            mid_hip_array = np.array(mid_hip_positions)
+
+        # Apply smoothing (both axes at once)
+        smoothed = smooth(mid_hip_array, fps=self.fps, filter_type=self.filter_type)
 
         return smoothed
 
-    def global_calibration(self, bodies: List[StandardBody], smoothed_hip: np.ndarray):
+    @staticmethod
+    def _mid_hip_track(sequence: PoseSequence) -> np.ndarray:
+        """Mid-hip (x, y) per frame, holding the last confident position (vectorised)"""
+        mid_hip = sequence.mid_hip
+        valid = mid_hip[:, 2] > 0.3  # Confidence check
+        # Index of the last valid frame at or before each frame (-1 = none yet)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(mid_hip)), -1))
+        track = np.zeros((len(mid_hip), 2), dtype=np.float64)
+        seen = last_valid >= 0
+        track[seen] = mid_hip[last_valid[seen], :2]
+        return track
+
+    def global_calibration(self, bodies: Union[PoseSequence, List[StandardBody]], smoothed_hip: np.ndarray):
         """
         Step 2: Determine global calibration values
 
         Args:
-            bodies: List of StandardBody objects
+            bodies: PoseSequence or list of StandardBody objects
             smoothed_hip: Smoothed mid-hip positions (N, 2)
         """
         # Extract all hip y-coordinates
@@ -230,12 +279,18 @@ class SitToStandAnalyzer:
         self.global_sit_y = np.percentile(hip_y_values, 95)   # Sitting: higher Y-coordinate (lower in image)
 
         # Calculate maximum trunk height
-        trunk_heights = []
-        for body in bodies:
-            if body.mid_hip and body.mid_shoulder:
-                if body.mid_hip[2] > 0.3 and body.mid_shoulder[2] > 0.3:
-                    trunk_height = abs(body.mid_shoulder[1] - body.mid_hip[1])
-                    trunk_heights.append(trunk_height)
+        if isinstance(bodies, PoseSequence):
+            confident = (bodies.mid_hip[:, 2] > 0.3) & (bodies.mid_shoulder[:, 2] > 0.3)
+            trunk_heights = np.abs(
+                bodies.mid_shoulder[confident, 1].astype(np.float64) - bodies.mid_hip[confident, 1]
+            ).tolist()
+        else:
+            trunk_heights = []
+            for body in bodies:
+                if body.mid_hip and body.mid_shoulder:
+                    if body.mid_hip[2] > 0.3 and body.mid_shoulder[2] > 0.3:
+                        trunk_height = abs(body.mid_shoulder[1] - body.mid_hip[1])
+                        trunk_heights.append(trunk_height)
 
         if trunk_heights:
             self.max_trunk_height = max(trunk_heights)
@@ -259,99 +314,18 @@ class SitToStandAnalyzer:
         velocities = np.diff(smoothed_hip[:, 1])
         velocities = np.insert(velocities, 0, 0)  # Pad first frame
 
-        # State machine variables
-        current_state = PostureState.SITTING
+        segmenter = RepetitionSegmenter(self.VELOCITY_THRESHOLD)
         repetitions = []
-        
-        current_rep_data = {
-            "start_frame": None,
-            "end_frame": None,
-            "sitting_start_frame": 0 if current_state == PostureState.SITTING else None, # Initialize for the very first frame
-            "sitting_end_frame": None,
-            "ascending_start_frame": None,
-            "ascending_end_frame": None,
-            "standing_start_frame": None,
-            "standing_end_frame": None,
-            "descending_start_frame": None,
-            "descending_end_frame": None,
-        }
 
         for frame in range(num_frames):
-            hip_y = smoothed_hip[frame, 1]
-            velocity = velocities[frame]
-
-            # Calculate position relative to calibration
-            range_height = self.global_sit_y - self.global_stand_y
-            # percent_standing: 0 when sitting deep, 1 when standing tall
-            percent_standing = (self.global_sit_y - hip_y) / range_height if range_height > 0 else 0
-            percent_standing = np.clip(percent_standing, 0, 1)
+            rep = segmenter.step(
+                frame, smoothed_hip[frame, 1], velocities[frame], self.global_stand_y, self.global_sit_y
+            )
+            if rep is not None:
+                repetitions.append(rep)
 
-            previous_state = current_state
-            
-            # --- State Transition Logic ---
-            if current_state == PostureState.SITTING:
-                if velocity < self.VELOCITY_THRESHOLD and percent_standing > 0.1:
-                    current_state = PostureState.ASCENDING
-                    current_rep_data["start_frame"] = frame
-                    current_rep_data["ascending_start_frame"] = frame
-                    current_rep_data["sitting_end_frame"] = frame - 1 # End of sitting phase for this rep
-
-            elif current_state == PostureState.ASCENDING:
-                if percent_standing > 0.8:
-                    current_state = PostureState.STANDING
-                    current_rep_data["ascending_end_frame"] = frame - 1
-                    current_rep_data["standing_start_frame"] = frame
-                elif velocity > -self.VELOCITY_THRESHOLD and percent_standing < 0.3: # Aborted ascent
-                    current_state = PostureState.SITTING
-                    # Reset data as this was an aborted rep, and a new sitting phase starts
-                    current_rep_data = {
-                        "start_frame": None, "end_frame": None,
-                        "sitting_start_frame": frame, # New sitting phase starts here
-                        "sitting_end_frame": None,
-                        "ascending_start_frame": None, "ascending_end_frame": None,
-                        "standing_start_frame": None, "standing_end_frame": None,
-                        "descending_start_frame": None, "descending_end_frame": None,
-                    }
-
-            elif current_state == PostureState.STANDING:
-                if velocity > abs(self.VELOCITY_THRESHOLD):
-                    current_state = PostureState.DESCENDING
-                    current_rep_data["standing_end_frame"] = frame - 1
-                    current_rep_data["descending_start_frame"] = frame
-
-            elif current_state == PostureState.DESCENDING:
-                if percent_standing < 0.2:
-                    current_state = PostureState.SITTING
-                    current_rep_data["descending_end_frame"] = frame - 1
-                    current_rep_data["end_frame"] = frame # End of repetition
-
-                    # Record completed repetition
-                    if current_rep_data["start_frame"] is not None:
-                        repetitions.append(Repetition(
-                            start_frame=current_rep_data["start_frame"],
-                            end_frame=current_rep_data["end_frame"],
-                            sitting_start_frame=current_rep_data["sitting_start_frame"],
-                            sitting_end_frame=current_rep_data["sitting_end_frame"],
-                            ascending_start_frame=current_rep_data["ascending_start_frame"],
-                            ascending_end_frame=current_rep_data["ascending_end_frame"],
-                            standing_start_frame=current_rep_data["standing_start_frame"],
-                            standing_end_frame=current_rep_data["standing_end_frame"],
-                            descending_start_frame=current_rep_data["descending_start_frame"],
-                            descending_end_frame=current_rep_data["descending_end_frame"],
-                        ))
-                    
-                    # Reset for next repetition - a new sitting phase starts now
-                    current_rep_data = {
-                        "start_frame": None, "end_frame": None,
-                        "sitting_start_frame": frame, # New sitting phase starts here
-                        "sitting_end_frame": None,
-                        "ascending_start_frame": None, "ascending_end_frame": None,
-                        "standing_start_frame": None, "standing_end_frame": None,
-                        "descending_start_frame": None, "descending_end_frame": None,
-                    }
-            
             # Update frame_phases for the current frame
-            self.frame_phases[frame] = current_state
+            self.frame_phases[frame] = segmenter.state
 
         return repetitions
 
@@ -522,13 +496,109 @@ class SitToStandAnalyzer:
 
         return hip_sway_angle
 
-    def validate_repetition(self, bodies: List[StandardBody], rep: Repetition) -> Repetition:
+    def knee_angles(self, sequence: PoseSequence, side='left') -> np.ndarray:
+        """
+        Vectorised calculate_knee_angle over every frame of a sequence
+
+        Args:
+            sequence: PoseSequence (typically one ascending window)
+            side: 'left' or 'right'
+
+        Returns:
+            FPPA angles in degrees (frames,), NaN where calculate_knee_angle returns None
+        """
+        prefix = 'l_' if side == 'left' else 'r_'
+        hip = sequence.point(prefix + 'hip').astype(np.float64)
+        knee = sequence.point(prefix + 'knee').astype(np.float64)
+        ankle = sequence.point(prefix + 'ankle').astype(np.float64)
+
+        # Check confidence
+        valid = ~((hip[:, 2] < 0.3) | (knee[:, 2] < 0.3) | (ankle[:, 2] < 0.3))
+
+        v1_x = hip[:, 0] - knee[:, 0]
+        v1_y = hip[:, 1] - knee[:, 1]
+        v2_x = ankle[:, 0] - knee[:, 0]
+        v2_y = ankle[:, 1] - knee[:, 1]
+
+        dot_product = v1_x * v2_x + v1_y * v2_y
+        mag_v1 = np.sqrt(v1_x**2 + v1_y**2)
+        mag_v2 = np.sqrt(v2_x**2 + v2_y**2)
+        valid &= (mag_v1 != 0) & (mag_v2 != 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_angle = np.clip(dot_product / (mag_v1 * mag_v2), -1.0, 1.0)
+        straight_angle = np.degrees(np.arccos(cos_angle))
+
+        # Valgus/varus classification, as in calculate_knee_angle
+        expected_knee_x = hip[:, 0] + 0.5 * (ankle[:, 0] - hip[:, 0])
+        knee_deviation = knee[:, 0] - expected_knee_x
+
+        DEVIATION_THRESHOLD = 5  # pixels
+
+        if side == 'left':
+            is_valgus = knee_deviation > DEVIATION_THRESHOLD
+            is_varus = knee_deviation < -DEVIATION_THRESHOLD
+        else:
+            is_valgus = knee_deviation < -DEVIATION_THRESHOLD
+            is_varus = knee_deviation > DEVIATION_THRESHOLD
+
+        # Varus reflects the angle; valgus and straight keep it
+        interior_angle = np.where(
+            is_varus & ~is_valgus, 180 + np.abs(180 - straight_angle), straight_angle
+        )
+        fppa_angle = 180.0 - interior_angle
+
+        return np.where(valid, fppa_angle, np.nan)
+
+    def trunk_sway_angles(self, sequence: PoseSequence) -> np.ndarray:
+        """
+        Vectorised calculate_trunk_sway over every frame of a sequence
+
+        Returns:
+            Sway angles in degrees (frames,), NaN where calculate_trunk_sway returns None
+        """
+        mid_hip = sequence.mid_hip.astype(np.float64)
+        mid_shoulder = sequence.mid_shoulder.astype(np.float64)
+
+        dx = mid_shoulder[:, 0] - mid_hip[:, 0]
+        dy = np.abs(mid_shoulder[:, 1] - mid_hip[:, 1])
+
+        # Confidence check, then filter out forward lean (trunk too compressed)
+        valid = ~((mid_hip[:, 2] < 0.3) | (mid_shoulder[:, 2] < 0.3))
+        valid &= ~(dy < 0.5 * self.max_trunk_height)
+
+        return np.where(valid, np.degrees(np.arctan2(dx, dy)), np.nan)
+
+    def hip_sway_angles(self, sequence: PoseSequence) -> np.ndarray:
+        """
+        Vectorised calculate_hip_sway over every frame of a sequence
+
+        Returns:
+            Hip sway angles in degrees (frames,), NaN where calculate_hip_sway returns None
+        """
+        mid_hip = sequence.mid_hip.astype(np.float64)
+        l_heel = sequence.point('l_heel').astype(np.float64)
+        r_heel = sequence.point('r_heel').astype(np.float64)
+
+        mid_stance_x = (l_heel[:, 0] + r_heel[:, 0]) / 2
+        mid_stance_y = (l_heel[:, 1] + r_heel[:, 1]) / 2
+
+        dx = mid_hip[:, 0] - mid_stance_x
+        dy = np.abs(mid_hip[:, 1] - mid_stance_y)
+
+        # Frames without a detection have zero confidence, so this also covers missing heels
+        valid = ~((mid_hip[:, 2] < 0.3) | (l_heel[:, 2] < 0.3) | (r_heel[:, 2] < 0.3))
+        valid &= dy != 0
+
+        return np.where(valid, np.degrees(np.arctan2(dx, dy)), np.nan)
+
+    def validate_repetition(self, bodies: Union[PoseSequence, List[StandardBody]], rep: Repetition) -> Repetition:
         """
         Validate repetition posture using per-repetition validators.
         Validation only occurs during the SITTING phase of the repetition.
 
         Args:
-            bodies: Full list of StandardBody objects
+            bodies: Full PoseSequence or list of StandardBody objects
             rep: Repetition to validate
 
         Returns:
@@ -565,10 +635,13 @@ class SitToStandAnalyzer:
 
             # Run all per-repetition validators
             report = self._validator.validate_all_per_repetition(body)
-            
-            # DEBUG PRINT
-            print(f"[DEBUG] Frame {frame_idx} (SITTING): Stance={report.stance_width.metric_value:.2f}, FootL={report.foot_rotation_left.metric_value:.2f}, FootR={report.foot_rotation_right.metric_value:.2f}")
 
+            # Arguments are only formatted when DEBUG is enabled
+            logger.debug(
+                "Frame %d (SITTING): stance=%.2f, foot_left=%.2f, foot_right=%.2f", frame_idx,
+                report.stance_width.metric_value, report.foot_rotation_left.metric_value,
+                report.foot_rotation_right.metric_value,
+            )
 
             if not report.all_valid:
                 rep.is_clinically_valid = False
@@ -595,19 +668,20 @@ class SitToStandAnalyzer:
 
         return rep
 
-    def analyze_repetition(self, bodies: List[StandardBody], rep: Repetition) -> Repetition:
+    def analyze_repetition(self, bodies: Union[PoseSequence, List[StandardBody]], rep: Repetition) -> Repetition:
         """
         Step 4: Analyze biomechanics for a single repetition, using ONLY the ascending phase.
 
         Args:
-            bodies: Full list of StandardBody objects
+            bodies: Full PoseSequence or list of StandardBody objects
             rep: Repetition to analyze
 
         Returns:
             Updated Repetition with metrics
         """
         # First validate the repetition posture (uses SITTING phase)
-        rep = self.validate_repetition(bodies, rep)
+        with self.timer.stage("validation"):
+            rep = self.validate_repetition(bodies, rep)
 
         # If the rep is not clinically valid, we don't need to calculate biomechanics
         if not rep.is_clinically_valid:
@@ -616,43 +690,52 @@ class SitToStandAnalyzer:
         # Define analysis window (Ascending phase only, as per clinical requirements)
         if rep.ascending_start_frame is None or rep.ascending_end_frame is None:
             # This case should ideally not be reached for a clinically valid rep, but as a safeguard:
-            print(f"WARNING: Rep starting at frame {rep.start_frame} is valid but has no defined ascending phase. Skipping biomechanical analysis.")
+            logger.warning("Rep starting at frame %d is valid but has no defined ascending phase. "
+                           "Skipping biomechanical analysis.", rep.start_frame)
             return rep
 
         # Ensure frame indices are valid
         start = max(0, rep.ascending_start_frame)
         end = min(len(bodies), rep.ascending_end_frame + 1)
         if start >= end:
-            print(f"WARNING: Rep starting at frame {rep.start_frame} has an invalid ascending phase window ({start}-{end}). Skipping.")
+            logger.warning("Rep starting at frame %d has an invalid ascending phase window (%d-%d). Skipping.",
+                           rep.start_frame, start, end)
             return rep
             
         rep_bodies = bodies[start:end]
 
-        fppa_left_angles = []
-        fppa_right_angles = []
-        sway_angles = []
-        hip_sway_angles = []
-
-        for body in rep_bodies:
-            # Knee angles (FPPA: 180° - interior_angle)
-            # Negative = valgus, Positive = varus, 0 = straight
-            fppa_left = self.calculate_knee_angle(body, 'left')
-            if fppa_left is not None:
-                fppa_left_angles.append(fppa_left)
-
-            fppa_right = self.calculate_knee_angle(body, 'right')
-            if fppa_right is not None:
-                fppa_right_angles.append(fppa_right)
-
-            # Trunk sway
-            sway = self.calculate_trunk_sway(body)
-            if sway is not None:
-                sway_angles.append(sway)
-
-            # Hip sway
-            hip_sway = self.calculate_hip_sway(body)
-            if hip_sway is not None:
-                hip_sway_angles.append(hip_sway)
+        if isinstance(rep_bodies, PoseSequence):
+            # Whole window at once; NaN marks frames the scalar path would skip
+            fppa_left_angles = _present(self.knee_angles(rep_bodies, 'left'))
+            fppa_right_angles = _present(self.knee_angles(rep_bodies, 'right'))
+            sway_angles = _present(self.trunk_sway_angles(rep_bodies))
+            hip_sway_angles = _present(self.hip_sway_angles(rep_bodies))
+        else:
+            fppa_left_angles = []
+            fppa_right_angles = []
+            sway_angles = []
+            hip_sway_angles = []
+
+            for body in rep_bodies:
+                # Knee angles (FPPA: 180° - interior_angle)
+                # Negative = valgus, Positive = varus, 0 = straight
+                fppa_left = self.calculate_knee_angle(body, 'left')
+                if fppa_left is not None:
+                    fppa_left_angles.append(fppa_left)
+
+                fppa_right = self.calculate_knee_angle(body, 'right')
+                if fppa_right is not None:
+                    fppa_right_angles.append(fppa_right)
+
+                # Trunk sway
+                sway = self.calculate_trunk_sway(body)
+                if sway is not None:
+                    sway_angles.append(sway)
+
+                # Hip sway
+                hip_sway = self.calculate_hip_sway(body)
+                if hip_sway is not None:
+                    hip_sway_angles.append(hip_sway)
 
         # Calculate FPPA metrics: Find PEAK VALGUS (minimum/most negative value)
         if fppa_left_angles:
@@ -693,41 +776,19 @@ class SitToStandAnalyzer:
 
         return rep
 
-    def analyze(self, bodies: List[StandardBody]) -> ClinicalMetrics:
+    def summarize(self, repetitions: List[Repetition]) -> ClinicalMetrics:
         """
-        Complete analysis pipeline
+        Aggregate analyzed repetitions into clinical metrics
 
         Args:
-            bodies: List of StandardBody objects (one per frame)
+            repetitions: Repetitions already passed through analyze_repetition
 
         Returns:
-            ClinicalMetrics with full assessment
+            ClinicalMetrics (aggregates use clinically valid reps only)
         """
-        print(f"Starting analysis of {len(bodies)} frames...")
-
-        # Step 1: Preprocessing
-        print("Step 1: Preprocessing and smoothing...")
-        smoothed_hip = self.preprocess_sequence(bodies)
-
-        # Step 2: Global calibration
-        print("Step 2: Global calibration...")
-        self.global_calibration(bodies, smoothed_hip)
-        print(f"  Standing Y: {self.global_stand_y:.1f}, Sitting Y: {self.global_sit_y:.1f}")
-        print(f"  Max trunk height: {self.max_trunk_height:.1f}")
-
-        # Step 3: Segment repetitions
-        print("Step 3: Segmenting repetitions...")
-        repetitions = self.segment_repetitions(smoothed_hip)
-        print(f"  Detected {len(repetitions)} repetitions")
-
-        # Step 4: Analyze each repetition
-        print("Step 4: Analyzing biomechanics...")
-        # Note: Rep validation now happens inside analyze_repetition
-        analyzed_repetitions = [self.analyze_repetition(bodies, rep) for rep in repetitions]
-
         # Separate clinically valid and invalid reps
-        clinically_valid_reps = [r for r in analyzed_repetitions if r.is_clinically_valid]
-        clinically_invalid_reps = [r for r in analyzed_repetitions if not r.is_clinically_valid]
+        clinically_valid_reps = [r for r in repetitions if r.is_clinically_valid]
+        clinically_invalid_reps = [r for r in repetitions if not r.is_clinically_valid]
 
         # Compute aggregate metrics (only from CLINICALLY VALID reps)
         peak_valgus_angles = []
@@ -746,7 +807,7 @@ class SitToStandAnalyzer:
             total_reps=len(repetitions),
             valid_reps=len(clinically_valid_reps),
             invalid_reps=len(clinically_invalid_reps),
-            repetitions=analyzed_repetitions,
+            repetitions=repetitions,
             mean_fppa=np.mean(peak_valgus_angles) if peak_valgus_angles else 0.0,
             max_trunk_sway_std=max(trunk_sway_stds) if trunk_sway_stds else 0.0,
             max_hip_sway_std=max(hip_sway_stds) if hip_sway_stds else 0.0,
@@ -756,31 +817,73 @@ class SitToStandAnalyzer:
             instability_count=sum(1 for r in clinically_valid_reps if r.has_instability)
         )
 
-        print("\n=== Analysis Complete ===")
-        print(f"Total Reps Detected: {metrics.total_reps}")
-        print(f"Clinically Valid Reps (contributing to metrics): {metrics.valid_reps}")
-        print(f"Clinically Invalid Reps (posture violations): {metrics.invalid_reps}")
-
-        if clinically_invalid_reps and self.enable_validators:
-            print("\nClinically Invalid Reps Details:")
-            for i, rep in enumerate(clinically_invalid_reps):
-                rep_num = repetitions.index(rep) + 1
-                print(f"  Rep {rep_num}: {', '.join(rep.validator_failures)}")
-
-        print(f"\nClinical Metrics (from clinically valid reps):")
-        print(f"  Mean FPPA (Peak Valgus Angle): {metrics.mean_fppa:.2f}°")
-        print(f"  Max Trunk Sway (SD): {metrics.max_trunk_sway_std:.2f}°")
-        print(f"  Mean Trunk Sway (SD): {metrics.mean_trunk_sway_std:.2f}°")
-        print(f"  Max Hip Sway (SD): {metrics.max_hip_sway_std:.2f}°")
-        print(f"  Mean Hip Sway (SD): {metrics.mean_hip_sway_std:.2f}°")
-        print(f"  Valgus Events (in valid reps): {metrics.valgus_count}")
-        print(f"  Instability Events (in valid reps): {metrics.instability_count}")
+        return metrics
+
+    def analyze(self, bodies: Union[PoseSequence, List[StandardBody]]) -> ClinicalMetrics:
+        """
+        Complete analysis pipeline
+
+        Args:
+            bodies: PoseSequence or list of StandardBody objects (one per frame)
+
+        Returns:
+            ClinicalMetrics with full assessment
+        """
+        logger.debug("Starting analysis of %d frames", len(bodies))
+
+        # Step 1: Preprocessing
+        with self.timer.stage("smoothing"):
+            smoothed_hip = self.preprocess_sequence(bodies)
+
+        # Step 2: Global calibration
+        with self.timer.stage("calibration"):
+            self.global_calibration(bodies, smoothed_hip)
+        logger.debug("Calibration: standing Y %.1f, sitting Y %.1f, max trunk height %.1f",
+                     self.global_stand_y, self.global_sit_y, self.max_trunk_height)
+
+        # Step 3: Segment repetitions
+        with self.timer.stage("segmentation"):
+            repetitions = self.segment_repetitions(smoothed_hip)
+        logger.debug("Detected %d repetitions", len(repetitions))
+
+        # Step 4: Analyze each repetition
+        # Note: Rep validation now happens inside analyze_repetition
+        with self.timer.stage("biomechanics"):
+            analyzed_repetitions = [self.analyze_repetition(bodies, rep) for rep in repetitions]
+
+        metrics = self.summarize(analyzed_repetitions)
+
+        if self.enable_validators:
+            for rep_num, rep in enumerate(analyzed_repetitions, 1):
+                if not rep.is_clinically_valid:
+                    logger.debug("Rep %d clinically invalid: %s", rep_num, ", ".join(rep.validator_failures))
+
+        logger.info(
+            "Analysis complete: %d reps (%d clinically valid, %d invalid), mean FPPA %.2f°, "
+            "max trunk sway %.2f°, max hip sway %.2f°",
+            metrics.total_reps, metrics.valid_reps, metrics.invalid_reps, metrics.mean_fppa,
+            metrics.max_trunk_sway_std, metrics.max_hip_sway_std,
+            extra={
+                "frames": len(bodies),
+                "total_reps": metrics.total_reps,
+                "valid_reps": metrics.valid_reps,
+                "invalid_reps": metrics.invalid_reps,
+                "mean_fppa": round(float(metrics.mean_fppa), 2),
+                "max_trunk_sway_sd": round(float(metrics.max_trunk_sway_std), 2),
+                "mean_trunk_sway_sd": round(float(metrics.mean_trunk_sway_std), 2),
+                "max_hip_sway_sd": round(float(metrics.max_hip_sway_std), 2),
+                "mean_hip_sway_sd": round(float(metrics.mean_hip_sway_std), 2),
+                "valgus_count": metrics.valgus_count,
+                "instability_count": metrics.instability_count,
+            },
+        )
 
         return metrics
 
 
 # Test with synthetic data
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
     print("=== Analyzer Test with Synthetic Data ===\n")
 
     # Create synthetic sit-to-stand sequence
@@ -823,4 +926,38 @@ if __name__ == "__main__":
     analyzer = SitToStandAnalyzer(fps=30, filter_type='moving_average')
     metrics = analyzer.analyze(bodies)
 
+    # Vectorised kernels vs the scalar per-frame path on a 10k-frame sequence
+    print("\n=== Biomechanics Kernel Benchmark (10k frames) ===")
+    import time
+    rng = np.random.default_rng(0)
+    num_frames = 10_000
+    sequence = PoseSequence.from_bodies([bodies[i % len(bodies)] for i in range(num_frames)])
+    sequence.data[:, :, :2] += rng.normal(0, 8, sequence.data[:, :, :2].shape).astype(np.float32)
+    sequence.data[:, :, 2] = rng.uniform(0.1, 1.0, sequence.data[:, :, 2].shape).astype(np.float32)
+    sequence = PoseSequence(sequence.data)
+
+    start = time.perf_counter()
+    scalar = {
+        'left': [analyzer.calculate_knee_angle(b, 'left') for b in sequence],
+        'right': [analyzer.calculate_knee_angle(b, 'right') for b in sequence],
+        'trunk': [analyzer.calculate_trunk_sway(b) for b in sequence],
+        'hip': [analyzer.calculate_hip_sway(b) for b in sequence],
+    }
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorised = {
+        'left': analyzer.knee_angles(sequence, 'left'),
+        'right': analyzer.knee_angles(sequence, 'right'),
+        'trunk': analyzer.trunk_sway_angles(sequence),
+        'hip': analyzer.hip_sway_angles(sequence),
+    }
+    vectorised_time = time.perf_counter() - start
+
+    for name, values in scalar.items():
+        expected = np.array([np.nan if v is None else v for v in values])
+        assert np.array_equal(expected, vectorised[name], equal_nan=True), name
+    print(f"  Scalar: {scalar_time * 1000:.1f} ms, vectorised: {vectorised_time * 1000:.2f} ms "
+          f"({scalar_time / vectorised_time:.0f}x), results identical")
+
     print(f"\n[OK] Test completed successfully!")
@@ -0,0 +1,158 @@
+"""
+Keypoint Archive Format
+Compact binary file holding the keypoints of one analysed clip, so clips can
+be re-analysed (e.g. with new SitToStandAnalyzer thresholds) without the
+video or pose inference.
+
+Layout (little-endian):
+
+  header     HEADER_BYTES: magic, version, dtype, frame/keypoint counts, fps,
+             original and inference dimensions, inference scale, pose model id
+  detected   frames x uint8 (1 = pose detected), padded to ALIGN_BYTES
+  keypoints  frames x len(KEYPOINT_NAMES) x 3 (x, y, confidence), float32 or float16
+
+float32 archives are memory-mapped and wrapped as a PoseSequence without
+copying; float16 halves the size (coordinates lose precision above ~1000 px)
+and is converted to float32 once on load.
+"""
+
+import os
+import struct
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .pose_sequence import KEYPOINT_NAMES, PoseSequence
+
+
+MAGIC = b"STSK"
+FORMAT_VERSION = 1
+FILE_SUFFIX = ".stsk"
+
+# magic, version, itemsize, frames, keypoints, channels, fps, width, height,
+# inference width, inference height, inference scale, model id
+_HEADER = struct.Struct("<4sHHIHHdIIIId32s")
+HEADER_BYTES = 128
+ALIGN_BYTES = 64
+
+_DTYPES = {2: np.dtype("<f2"), 4: np.dtype("<f4")}
+
+
+@dataclass
+class KeypointArchive:
+    """Contents of a keypoint archive"""
+    sequence: PoseSequence
+    fps: float
+    dimensions: Tuple[int, int]
+    model: str
+    inference_resolution: List[int]
+    inference_scale: float
+
+
+def _keypoints_offset(frames: int) -> int:
+    return HEADER_BYTES + -(-frames // ALIGN_BYTES) * ALIGN_BYTES
+
+
+def write_archive(
+    path: Path,
+    sequence: PoseSequence,
+    fps: float,
+    dimensions: Tuple[int, int],
+    model: str,
+    inference_resolution: Optional[Tuple[int, int]] = None,
+    inference_scale: float = 1.0,
+    dtype: str = "float32",
+) -> Path:
+    """
+    Write a clip's keypoints (atomically: readers never see a partial file)
+
+    Args:
+        path: Destination file
+        sequence: Keypoints from process_video
+        fps: Frames per second of the video
+        dimensions: (width, height) of the original video
+        model: Pose model id (at most 32 bytes)
+        inference_resolution: (width, height) pose inference ran at (default: dimensions)
+        inference_scale: Inference / original resolution ratio
+        dtype: 'float32' (exact, zero-copy loads) or 'float16' (half the size)
+
+    Returns:
+        path
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if dtype.itemsize not in _DTYPES or dtype.kind != "f":
+        raise ValueError(f"Unsupported keypoint dtype: {dtype}")
+    model_id = model.encode()
+    if len(model_id) > 32:
+        raise ValueError(f"Model id longer than 32 bytes: {model}")
+
+    frames = len(sequence)
+    width, height = dimensions
+    inference_width, inference_height = inference_resolution or dimensions
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, dtype.itemsize, frames, len(KEYPOINT_NAMES), 3,
+        float(fps), width, height, inference_width, inference_height, float(inference_scale), model_id,
+    )
+
+    path = Path(path)
+    tmp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            f.write(header.ljust(HEADER_BYTES, b"\0"))
+            f.write(sequence.detected.astype(np.uint8).tobytes().ljust(_keypoints_offset(frames) - HEADER_BYTES, b"\0"))
+            f.write(np.ascontiguousarray(sequence.data, dtype=dtype).tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return path
+
+
+def load_archive(path: Path) -> KeypointArchive:
+    """
+    Load a keypoint archive
+
+    float32 keypoints are memory-mapped read-only and wrapped without copying
+    (use sequence.to_bodies() for StandardBody objects).
+
+    Raises:
+        ValueError: If the file is not a keypoint archive or is truncated
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_BYTES)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"Truncated keypoint archive: {path}")
+    (magic, version, itemsize, frames, keypoints, channels, fps, width, height,
+     inference_width, inference_height, inference_scale, model_id) = _HEADER.unpack_from(header)
+    if magic != MAGIC:
+        raise ValueError(f"Not a keypoint archive: {path}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported keypoint archive version {version}: {path}")
+    if itemsize not in _DTYPES or (keypoints, channels) != (len(KEYPOINT_NAMES), 3):
+        raise ValueError(f"Unsupported keypoint layout in {path}")
+
+    dtype = _DTYPES[itemsize]
+    offset = _keypoints_offset(frames)
+    if os.path.getsize(path) < offset + frames * keypoints * channels * itemsize:
+        raise ValueError(f"Truncated keypoint archive: {path}")
+
+    if frames == 0:
+        sequence = PoseSequence(np.zeros((0, keypoints, channels), dtype=np.float32))
+    else:
+        detected = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_BYTES, shape=(frames,))
+        data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(frames, keypoints, channels))
+        if itemsize == 4:
+            sequence = PoseSequence.wrap(data, detected.view(bool))
+        else:
+            sequence = PoseSequence(data.astype(np.float32), detected=detected.astype(bool))
+
+    return KeypointArchive(
+        sequence=sequence,
+        fps=fps,
+        dimensions=(width, height),
+        model=model_id.rstrip(b"\0").decode(),
+        inference_resolution=[inference_width, inference_height],
+        inference_scale=inference_scale,
+    )
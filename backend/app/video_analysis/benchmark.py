@@ -0,0 +1,518 @@
+"""
+Video Analysis Benchmark Suite
+Measures the hot path stage by stage on synthetic (or recorded) sit-to-stand
+keypoints, so regressions show up before they reach production:
+
+  process_video        decode + (stubbed) landmarker + sequence assembly
+  preprocess_sequence  mid-hip extraction and smoothing
+  segment_repetitions  state machine over the smoothed hip track
+  analyze_repetition   per-rep biomechanics (validators off)
+  validate_repetition  per-rep posture validators
+  analyze              the whole SitToStandAnalyzer pipeline
+
+Each stage reports frames/second, peak traced memory and the number of
+memory blocks it leaves allocated. Like timeit, a stage is looped until one
+timed run lasts at least --min-time seconds (sub-millisecond stages would
+otherwise be timer noise) and the best of --repeat runs is reported; the
+runs of all stages are interleaved so a slow stretch of the host does not
+hit every run of one stage. No MediaPipe model is needed: process_video
+runs against a stub landmarker session that returns the synthetic keypoints
+for each decoded frame of a generated video.
+
+Usage:
+    python -m app.video_analysis.benchmark [--reps 5] [--noise 2] [--dropout 0.02]
+        [--fixture session.stsk] [--save-baseline FILE | --compare FILE]
+
+--compare exits with status 1 if any stage is slower (or uses more peak
+memory) than the baseline by more than --threshold.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .analyzer import SitToStandAnalyzer
+from .archive import load_archive
+from .pose_engine import MediaPipeAdapter
+from .pose_sequence import CORE_KEYPOINTS, OPTIONAL_KEYPOINTS, PoseSequence
+from .preprocessing import FramePreprocessor
+from .video_processor import process_video
+
+
+# Default slowdown (fraction) flagged by --compare
+DEFAULT_THRESHOLD = 0.2
+
+# Timed runs per stage and minimum duration of one run (the stage is looped
+# until it is reached). Many short runs spread over the benchmark catch more
+# of the host's quiet stretches than a few long ones.
+DEFAULT_REPEAT = 15
+DEFAULT_MIN_TIME = 0.05
+
+_MEDIAPIPE_INDEX = MediaPipeAdapter().keypoint_map
+
+
+# ── Synthetic keypoints ───────────────────────────────────────────────────────
+
+def synthetic_landmarks(
+    reps: int = 5,
+    rep_seconds: float = 3.0,
+    fps: float = 30,
+    noise_px: float = 2.0,
+    dropout: float = 0.0,
+    lead_seconds: float = 1.0,
+    clip_seconds: Optional[float] = None,
+    width: int = 640,
+    height: int = 480,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    MediaPipe landmarks of a frontal sit-to-stand clip
+
+    Each repetition sits (30%), rises (20%), stands (20%) and sits down (30%),
+    with a shoulder-width stance, forward-pointing feet and a little knee
+    valgus while rising, so repetitions pass the posture validators.
+
+    Args:
+        reps: Number of repetitions
+        rep_seconds: Duration of one repetition
+        fps: Frames per second
+        noise_px: Standard deviation of per-landmark pixel noise
+        dropout: Fraction of frames without a detection (all-zero rows)
+        lead_seconds: Seated time before the first repetition
+        clip_seconds: Total clip length (default: lead + reps * rep_seconds;
+            longer clips repeat the cycle, shorter ones cut it)
+        width, height: Frame size the landmarks are placed in
+        seed: Random seed
+
+    Returns:
+        Array (frames, 33, 3) of x, y, visibility in pixels
+    """
+    rng = np.random.default_rng(seed)
+    if clip_seconds is None:
+        clip_seconds = lead_seconds + reps * rep_seconds
+    frames = max(1, int(round(clip_seconds * fps)))
+
+    # Phase of the current repetition (0-1) for every frame; lead-in frames sit
+    t = np.arange(frames) / fps - lead_seconds
+    phase = np.where(t < 0, 0.0, (t / rep_seconds) % 1.0)
+
+    # Standing lift 0 (seated) -> 1 (standing)
+    lift = np.select(
+        [phase < 0.3, phase < 0.5, phase < 0.7],
+        [0.0, (phase - 0.3) / 0.2, 1.0],
+        default=1.0 - (phase - 0.7) / 0.3,
+    )
+    rising = (phase >= 0.35) & (phase < 0.5)
+
+    scale = height / 480
+    cx = width / 2
+    hip_y = (300 - 120 * lift) * scale
+    ankle_y = 440 * scale
+    knee_y = hip_y + (ankle_y - hip_y) * 0.5
+    half_width = 40 * scale
+    valgus = np.where(rising, 12 * scale, 0.0)
+
+    points = {
+        'nose': (cx, hip_y - 200 * scale),
+        'l_shoulder': (cx - half_width, hip_y - 160 * scale),
+        'r_shoulder': (cx + half_width, hip_y - 160 * scale),
+        'l_elbow': (cx - half_width - 10 * scale, hip_y - 90 * scale),
+        'r_elbow': (cx + half_width + 10 * scale, hip_y - 90 * scale),
+        'l_wrist': (cx - half_width - 5 * scale, hip_y - 30 * scale),
+        'r_wrist': (cx + half_width + 5 * scale, hip_y - 30 * scale),
+        'l_hip': (cx - 30 * scale, hip_y),
+        'r_hip': (cx + 30 * scale, hip_y),
+        'l_knee': (cx - half_width + valgus, knee_y),
+        'r_knee': (cx + half_width - valgus, knee_y),
+        'l_ankle': (cx - half_width, ankle_y),
+        'r_ankle': (cx + half_width, ankle_y),
+        'l_heel': (cx - half_width, ankle_y + 8 * scale),
+        'r_heel': (cx + half_width, ankle_y + 8 * scale),
+        'l_big_toe': (cx - half_width - 4 * scale, ankle_y + 30 * scale),
+        'r_big_toe': (cx + half_width + 4 * scale, ankle_y + 30 * scale),
+    }
+
+    landmarks = np.zeros((frames, 33, 3), dtype=np.float32)
+    for name, (x, y) in points.items():
+        idx = _MEDIAPIPE_INDEX[name]
+        landmarks[:, idx, 0] = x
+        landmarks[:, idx, 1] = y
+    landmarks[:, :, 2] = rng.uniform(0.8, 1.0, (frames, 33))
+    landmarks[:, :, :2] += rng.normal(0, noise_px, (frames, 33, 2)).astype(np.float32)
+
+    if dropout > 0:
+        landmarks[rng.random(frames) < dropout] = 0
+    return landmarks
+
+
+def sequence_to_landmarks(sequence: PoseSequence) -> np.ndarray:
+    """PoseSequence -> (frames, 33, 3) MediaPipe landmarks (unmapped landmarks stay zero)"""
+    landmarks = np.zeros((len(sequence), 33, 3), dtype=np.float32)
+    for name in CORE_KEYPOINTS + OPTIONAL_KEYPOINTS:
+        landmarks[:, _MEDIAPIPE_INDEX[name]] = sequence.point(name)
+    landmarks[~sequence.detected] = 0
+    return landmarks
+
+
+# ── Stubbed landmarker stage ──────────────────────────────────────────────────
+
+class StubLandmarkerSession:
+    """LandmarkerSession stand-in returning precomputed landmarks for each frame"""
+
+    def __init__(self, landmarks: np.ndarray, inference_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            landmarks: Array (frames, 33, 3) returned frame by frame
+            inference_size: Frames are still resized to this size, like the real session
+        """
+        self.landmarks = landmarks
+        self.preprocessor = FramePreprocessor(inference_size)
+        self.clips_processed = 0
+
+    def begin_clip(self):
+        pass
+
+    def detect(self, frame, frame_idx: int, fps: float, timer=None):
+        self.preprocessor.prepare(frame)
+        row = self.landmarks[frame_idx % len(self.landmarks)]
+        if not row[:, 2].any():
+            return None, None
+        return row[:, :2].copy(), row[:, 2].copy()
+
+    def end_clip(self):
+        self.clips_processed += 1
+
+    def close(self):
+        pass
+
+
+def write_synthetic_video(path: Path, frames: int, width: int, height: int, fps: float) -> Optional[Path]:
+    """
+    Write a Motion-JPEG clip with a moving block (something for the decoder to do)
+
+    Returns:
+        path, or None if OpenCV cannot write the file
+    """
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        return None
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:] = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+    block = max(8, height // 6)
+    try:
+        for i in range(frames):
+            canvas = frame.copy()
+            y = int((height - block) * (0.5 + 0.5 * np.sin(i / fps * 2)))
+            canvas[y:y + block, width // 2 - block // 2:width // 2 + block // 2] = 255
+            writer.write(canvas)
+    finally:
+        writer.release()
+    cap = cv2.VideoCapture(str(path))
+    ok = cap.isOpened() and int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) > 0
+    cap.release()
+    return path if ok else None
+
+
+# ── Measurement ───────────────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence pipeline log records below WARNING"""
+    logging.disable(logging.INFO)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _time_calls(run: Callable[[], object], setup: Callable[[], None], number: int) -> float:
+    """Seconds spent in number calls of run (setup is not timed)"""
+    total = 0.0
+    for _ in range(number):
+        setup()
+        start = time.perf_counter()
+        run()
+        total += time.perf_counter() - start
+    return total
+
+
+def _autorange(run: Callable[[], object], setup: Callable[[], None], min_time: float) -> int:
+    """Calls per timed run so one run lasts at least min_time (1, 2, 5, 10, 20, ... as timeit)"""
+    number = 1
+    while True:
+        for factor in (1, 2, 5):
+            if _time_calls(run, setup, number * factor) >= min_time:
+                return number * factor
+        number *= 10
+
+
+@dataclass
+class Stage:
+    """One benchmarked stage"""
+    run: Callable[[], object]
+    frames: int
+    # Untimed preparation before every call of run
+    setup: Callable[[], None] = lambda: None
+
+
+def _trace(stage: Stage) -> Tuple[int, int]:
+    """(peak traced bytes, memory blocks left allocated) of one call"""
+    # Separate traced call: tracemalloc slows allocation-heavy code down
+    stage.setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = stage.run()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, sum(max(0, stat.count_diff) for stat in after.compare_to(before, "lineno"))
+
+
+def measure_stages(stages: Dict[str, Stage], repeat: int, min_time: float = DEFAULT_MIN_TIME) -> Dict[str, Dict]:
+    """
+    Time stages and trace their memory
+
+    The timed runs are interleaved (one run of every stage per round), so a
+    stretch of host noise slows one round rather than every run of a stage.
+
+    Args:
+        stages: Stage name -> Stage
+        repeat: Timed runs per stage (the best is reported)
+        min_time: Minimum seconds of one timed run; each stage is called as
+            many times as that takes
+
+    Returns:
+        Stage name -> {"frames", "seconds" (per call), "fps", "loops", "peak_kb", "alloc_blocks"}
+    """
+    results: Dict[str, Dict] = {}
+    with _quiet():
+        # As timeit: collections triggered by other stages must not land in a timed run
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            loops = {name: _autorange(stage.run, stage.setup, min_time) for name, stage in stages.items()}
+            best = {name: float("inf") for name in stages}
+            for _ in range(repeat):
+                for name, stage in stages.items():
+                    best[name] = min(best[name], _time_calls(stage.run, stage.setup, loops[name]) / loops[name])
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        for name, stage in stages.items():
+            peak, new_blocks = _trace(stage)
+            seconds = best[name]
+            results[name] = {
+                "frames": stage.frames,
+                "seconds": round(seconds, 6),
+                "fps": round(stage.frames / seconds, 1) if seconds > 0 else None,
+                "loops": loops[name],
+                "peak_kb": round(peak / 1024, 1),
+                "alloc_blocks": new_blocks,
+            }
+    return results
+
+
+def measure(
+    run: Callable[[], object],
+    frames: int,
+    repeat: int,
+    setup: Callable[[], None] = lambda: None,
+    min_time: float = DEFAULT_MIN_TIME,
+) -> Dict:
+    """Time one stage and trace its memory (see measure_stages)"""
+    return measure_stages({"stage": Stage(run, frames, setup)}, repeat, min_time)["stage"]
+
+
+def run_benchmarks(
+    landmarks: np.ndarray,
+    fps: float,
+    repeat: int = DEFAULT_REPEAT,
+    with_video: bool = True,
+    min_time: float = DEFAULT_MIN_TIME,
+) -> Dict[str, Dict]:
+    """
+    Benchmark every stage on one clip's landmarks
+
+    Args:
+        landmarks: Array (frames, 33, 3) from synthetic_landmarks or a fixture
+        fps: Frames per second of the clip
+        repeat: Timed runs per stage
+        with_video: Include the process_video stage (needs OpenCV video writing)
+        min_time: Minimum seconds of one timed run (see measure_stages)
+
+    Returns:
+        Stage name -> measurement (see measure_stages)
+    """
+    frames = len(landmarks)
+    sequence = PoseSequence.from_mediapipe(landmarks)
+    stages: Dict[str, Stage] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if with_video:
+            height = max(64, int(np.ceil(landmarks[:, :, 1].max() / 8) * 8))
+            width = max(64, int(np.ceil(landmarks[:, :, 0].max() / 8) * 8))
+            video = write_synthetic_video(Path(tmp) / "synthetic.avi", frames, width, height, fps)
+            if video is None:
+                print("WARNING: OpenCV cannot write MJPG video here, skipping process_video")
+            else:
+                session = StubLandmarkerSession(landmarks)
+                stages["process_video"] = Stage(lambda: process_video(video, Path(tmp), session=session), frames)
+
+        analyzer = SitToStandAnalyzer(fps=fps, enable_validators=False)
+        stages["preprocess_sequence"] = Stage(lambda: analyzer.preprocess_sequence(sequence), frames)
+
+        with _quiet():
+            smoothed_hip = analyzer.preprocess_sequence(sequence)
+            analyzer.global_calibration(sequence, smoothed_hip)
+        stages["segment_repetitions"] = Stage(lambda: analyzer.segment_repetitions(smoothed_hip), frames)
+
+        with _quiet():
+            repetitions: List = analyzer.segment_repetitions(smoothed_hip)
+        stages["analyze_repetition"] = Stage(
+            lambda: [analyzer.analyze_repetition(sequence, rep) for rep in repetitions], frames,
+            setup=lambda: _reset(repetitions),
+        )
+
+        validating = SitToStandAnalyzer(fps=fps, enable_validators=True)
+        validating.frame_phases = analyzer.frame_phases
+        stages["validate_repetition"] = Stage(
+            lambda: [validating.validate_repetition(sequence, rep) for rep in repetitions], frames,
+            setup=lambda: _reset(repetitions),
+        )
+
+        stages["analyze"] = Stage(lambda: SitToStandAnalyzer(fps=fps).analyze(sequence), frames)
+
+        results = measure_stages(stages, repeat, min_time)
+    results["analyze"]["repetitions"] = len(repetitions)
+    return results
+
+
+def _reset(repetitions: Sequence):
+    """Clear per-rep validation results so every run validates from scratch"""
+    for rep in repetitions:
+        rep.is_clinically_valid = True
+        rep.validator_failures = []
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Stages that regressed against a baseline
+
+    Returns:
+        One message per stage slower (frames/second) or hungrier (peak memory)
+        than the baseline by more than threshold
+    """
+    regressions = []
+    for stage, current in results.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        if base.get("fps") and current.get("fps") and base["fps"] / current["fps"] - 1 > threshold:
+            regressions.append(
+                f"{stage}: {current['fps']:.0f} fps vs baseline {base['fps']:.0f} "
+                f"({(base['fps'] / current['fps'] - 1) * 100:.0f}% slower)"
+            )
+        if base.get("peak_kb") and current["peak_kb"] / base["peak_kb"] - 1 > threshold:
+            regressions.append(
+                f"{stage}: peak {current['peak_kb']:.0f} KB vs baseline {base['peak_kb']:.0f} KB"
+            )
+    return regressions
+
+
+def _print_table(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None):
+    print(f"\n{'stage':<22}{'fps':>12}{'ms':>10}{'peak KB':>10}{'blocks':>9}" + ("   vs baseline" if baseline else ""))
+    for stage, r in results.items():
+        line = f"{stage:<22}{r['fps'] or 0:>12,.0f}{r['seconds'] * 1000:>10.2f}{r['peak_kb']:>10.0f}{r['alloc_blocks']:>9}"
+        base = (baseline or {}).get(stage)
+        if base and base.get("fps") and r.get("fps"):
+            line += f"   {(r['fps'] / base['fps'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.video_analysis.benchmark",
+        description="Benchmark the video analysis hot path on synthetic or recorded keypoints",
+    )
+    parser.add_argument("--reps", type=int, default=5, help="Synthetic repetitions")
+    parser.add_argument("--rep-seconds", type=float, default=3.0, help="Duration of one repetition")
+    parser.add_argument("--clip-seconds", type=float, help="Clip length (default: fits the repetitions)")
+    parser.add_argument("--fps", type=float, default=30, help="Synthetic frame rate")
+    parser.add_argument("--noise", type=float, default=2.0, help="Keypoint noise (pixels SD)")
+    parser.add_argument("--dropout", type=float, default=0.02, help="Fraction of frames without detection")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixture", type=Path, help="Recorded keypoint archive (.stsk) instead of synthetic data")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per stage (the best is reported)")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME,
+                        help="Minimum seconds of one timed run (short stages are looped)")
+    parser.add_argument("--no-video", action="store_true", help="Skip the process_video stage")
+    parser.add_argument("--save-baseline", type=Path, help="Write the results as a baseline JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Flagged slowdown fraction")
+    args = parser.parse_args(argv)
+
+    if args.fixture is not None:
+        archive = load_archive(args.fixture)
+        landmarks, fps = sequence_to_landmarks(archive.sequence), archive.fps
+        source = {"fixture": str(args.fixture)}
+    else:
+        landmarks = synthetic_landmarks(
+            reps=args.reps, rep_seconds=args.rep_seconds, fps=args.fps, noise_px=args.noise,
+            dropout=args.dropout, clip_seconds=args.clip_seconds, seed=args.seed,
+        )
+        fps = args.fps
+        source = {
+            "reps": args.reps, "rep_seconds": args.rep_seconds, "clip_seconds": args.clip_seconds,
+            "fps": args.fps, "noise": args.noise, "dropout": args.dropout, "seed": args.seed,
+        }
+
+    print(f"Benchmarking {len(landmarks)} frames @ {fps:.0f}fps ({args.repeat} runs per stage)...")
+    results = run_benchmarks(
+        landmarks, fps, repeat=args.repeat, with_video=not args.no_video, min_time=args.min_time
+    )
+
+    baseline = None
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())["stages"]
+    _print_table(results, baseline)
+
+    if args.save_baseline is not None:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps({
+            "source": source,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "created_at": time.time(),
+            "stages": results,
+        }, indent=2))
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nREGRESSIONS (> {args.threshold * 100:.0f}% vs {args.compare}):")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\n[OK] No stage regressed by more than {args.threshold * 100:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Content-Addressed Analysis Cache
+Stores pose keypoints and final results of analysed clips on local disk,
+keyed by a hash of the uploaded bytes.
+
+Two entries per clip:
+- keypoints: hash + pose model + sampling + inference resolution -> a
+  keypoint archive (see archive.py; a hit skips pose inference)
+- results: keypoints key + analyzer parameters -> the results JSON (a hit
+  skips everything)
+
+Each entry is one file written atomically, so the API process and every
+worker can share the directory. Reads refresh the file's modification time
+and the least recently used files are evicted once the directory exceeds its
+size bound.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .analyzer import SitToStandAnalyzer
+from .archive import FILE_SUFFIX, KeypointArchive, load_archive, write_archive
+from .pose_sequence import PoseSequence
+from .sampling import SamplingConfig
+from .validators import PostureValidator
+
+
+# Bump when the results JSON layout changes so stale entries are never served
+RESULTS_FORMAT_VERSION = 1
+
+
+# Read size when hashing a file
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _digest(parts: Dict) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def analyzer_parameters(analyzer: Optional[SitToStandAnalyzer] = None) -> Dict:
+    """Analyzer and validator settings that affect the results"""
+    analyzer = analyzer or SitToStandAnalyzer()
+    validator = PostureValidator()
+    return {
+        "filter_type": analyzer.filter_type,
+        "enable_validators": analyzer.enable_validators,
+        "valgus_threshold": analyzer.VALGUS_THRESHOLD,
+        "sway_threshold": analyzer.SWAY_THRESHOLD,
+        "velocity_threshold": analyzer.VELOCITY_THRESHOLD,
+        "stance_ratio": [validator.STANCE_RATIO_MIN, validator.STANCE_RATIO_MAX],
+        "foot_rotation_max": validator.FOOT_ROTATION_MAX,
+        "confidence_threshold": validator.confidence_threshold,
+    }
+
+
+def cache_keys(
+    content_hash: str,
+    model_name: str,
+    sampling: Optional[SamplingConfig],
+    inference_size: Optional[Tuple[int, int]],
+    analyzer: Optional[SitToStandAnalyzer] = None,
+) -> Tuple[str, str]:
+    """
+    (keypoints key, results key) for a clip
+
+    Args:
+        content_hash: SHA-256 hex digest of the uploaded bytes
+        model_name: Pose model file name
+        sampling: Frame sampling mode (None = every frame)
+        inference_size: Inference resolution (None = native)
+        analyzer: Analyzer whose parameters apply (default: SitToStandAnalyzer defaults)
+    """
+    sampling = sampling or SamplingConfig()
+    keypoints_key = _digest({
+        "content": content_hash,
+        "model": model_name,
+        # Stride only matters in adaptive mode
+        "sampling": [sampling.mode, sampling.stride if sampling.is_adaptive else None],
+        "inference_size": list(inference_size) if inference_size else None,
+    })
+    results_key = _digest({
+        "keypoints": keypoints_key,
+        "analyzer": analyzer_parameters(analyzer),
+        "format": RESULTS_FORMAT_VERSION,
+    })
+    return keypoints_key, results_key
+
+
+class AnalysisCache:
+    """Size-bounded LRU cache of keypoints and results on local disk"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 2 * 1024 ** 3):
+        """
+        Args:
+            cache_dir: Directory holding the cache files
+            max_bytes: Total size the directory is trimmed back to after each write
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    # ── Results ──────────────────────────────────────────────────────────────
+
+    def get_results(self, key: str) -> Optional[Dict]:
+        path = self._touch(self.cache_dir / f"{key}.json")
+        if path is None:
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def put_results(self, key: str, results: Dict):
+        self._write(self.cache_dir / f"{key}.json", json.dumps(results, default=float).encode())
+
+    # ── Keypoints ────────────────────────────────────────────────────────────
+
+    def get_keypoints(self, key: str) -> Optional[KeypointArchive]:
+        """Cached keypoint archive (memory-mapped), or None"""
+        path = self._touch(self.cache_dir / f"{key}{FILE_SUFFIX}")
+        if path is None:
+            return None
+        try:
+            return load_archive(path)
+        except (OSError, ValueError):
+            return None
+
+    def put_keypoints(
+        self,
+        key: str,
+        sequence: PoseSequence,
+        fps: float,
+        dimensions: Tuple[int, int],
+        model: str,
+        inference_resolution: Optional[Tuple[int, int]] = None,
+        inference_scale: float = 1.0,
+    ):
+        """Store keypoints as a float32 keypoint archive (see archive.write_archive)"""
+        self._write(
+            self.cache_dir / f"{key}{FILE_SUFFIX}",
+            lambda path: write_archive(
+                path, sequence, fps, dimensions, model, inference_resolution, inference_scale
+            ),
+        )
+
+    # ── Storage ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _touch(path: Path) -> Optional[Path]:
+        """Mark an entry as recently used; None if it does not exist"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _write(self, path: Path, content):
+        """Write bytes, or call content(path) for writers that handle their own file"""
+        if callable(content):
+            content(path)
+        else:
+            # Write to a unique temp name, then rename: readers never see partial files
+            tmp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+            try:
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.iterdir():
+                if path.name.startswith("."):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def stats(self) -> Dict:
+        files = [p for p in self.cache_dir.iterdir() if not p.name.startswith(".")]
+        return {
+            "entries": len(files),
+            "bytes": sum(p.stat().st_size for p in files if p.exists()),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,196 @@
+"""
+Upload Ingestion
+Writes uploaded videos to a spool the analysis workers can open by path.
+
+Chunks are written asynchronously (aiofiles) as they arrive. Uploads start in
+a memory-backed (tmpfs) spool directory and move to the disk temp directory
+only if they outgrow the spool cap or the spool filesystem runs low, so most
+clips never touch the disk. Workers are separate processes reading with
+OpenCV, which needs a file path, so a tmpfs file is the closest thing to an
+in-memory buffer they can share.
+
+Each upload is hashed (SHA-256) while it is written, which keys the analysis
+cache without reading the file a second time.
+
+A background janitor removes spooled files left behind by crashed or
+abandoned jobs.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
+
+import aiofiles
+
+logger = logging.getLogger(__name__)
+
+
+# Read/write chunk size for uploads
+CHUNK_BYTES = 1024 * 1024
+
+# Free space always left on the spool filesystem
+SPOOL_RESERVE_BYTES = 16 * 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Upload exceeded the configured size limit"""
+
+
+@dataclass
+class SpooledUpload:
+    """A complete upload in the spool"""
+    path: Path
+    size: int
+    # SHA-256 hex digest of the file content
+    sha256: str
+
+
+class UploadSpool:
+    """Memory-backed spool for uploaded videos, with disk overflow"""
+
+    def __init__(
+        self,
+        disk_dir: Path,
+        spool_dir: Optional[Path] = None,
+        spool_max_bytes: int = 256 * 1024 * 1024,
+        max_upload_bytes: int = 1024 * 1024 * 1024,
+    ):
+        """
+        Args:
+            disk_dir: Disk directory for uploads that do not fit the spool
+            spool_dir: Memory-backed (tmpfs) directory; None or unusable disables spooling
+            spool_max_bytes: Largest upload kept in the spool
+            max_upload_bytes: Uploads larger than this are rejected (UploadTooLarge)
+        """
+        self.disk_dir = Path(disk_dir)
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self.spool_dir = self._usable(spool_dir)
+        self.spool_max_bytes = spool_max_bytes
+        self.max_upload_bytes = max_upload_bytes
+
+    @staticmethod
+    def _usable(directory: Optional[Path]) -> Optional[Path]:
+        if directory is None:
+            return None
+        try:
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            if not os.access(directory, os.W_OK):
+                return None
+        except OSError:
+            return None
+        return directory
+
+    @property
+    def directories(self) -> Iterable[Path]:
+        return [d for d in (self.spool_dir, self.disk_dir) if d is not None]
+
+    def _spool_budget(self) -> int:
+        """Bytes the next upload may occupy in the spool"""
+        if self.spool_dir is None:
+            return 0
+        free = shutil.disk_usage(self.spool_dir).free - SPOOL_RESERVE_BYTES
+        return max(0, min(self.spool_max_bytes, free))
+
+    async def write(self, chunks: AsyncIterator[bytes], suffix: str) -> SpooledUpload:
+        """
+        Write an upload chunk by chunk
+
+        Args:
+            chunks: Async iterator of upload bytes
+            suffix: File extension to keep (OpenCV picks the demuxer from it)
+
+        Returns:
+            SpooledUpload with the path of the complete file (spool or disk) and its hash
+
+        Raises:
+            UploadTooLarge: If the upload exceeds max_upload_bytes (the partial file is removed)
+        """
+        name = f"{uuid.uuid4()}{suffix}"
+        budget = self._spool_budget()
+        path = (self.spool_dir if budget > 0 else self.disk_dir) / name
+        written = 0
+        digest = hashlib.sha256()
+        out = await aiofiles.open(path, "wb")
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > self.max_upload_bytes:
+                    raise UploadTooLarge(
+                        f"Upload exceeds {self.max_upload_bytes // (1024 * 1024)} MB limit"
+                    )
+                if path.parent == self.spool_dir and written > budget:
+                    # Outgrew the spool: continue on disk
+                    await out.close()
+                    disk_path = self.disk_dir / name
+                    await asyncio.to_thread(shutil.move, str(path), str(disk_path))
+                    path = disk_path
+                    out = await aiofiles.open(path, "ab")
+                await out.write(chunk)
+                digest.update(chunk)
+        except BaseException:
+            await out.close()
+            path.unlink(missing_ok=True)
+            raise
+        await out.close()
+        return SpooledUpload(path=path, size=written, sha256=digest.hexdigest())
+
+    def sweep(self, max_age_seconds: float, keep: Iterable[Path] = ()) -> int:
+        """
+        Delete spooled uploads older than max_age_seconds
+
+        Args:
+            max_age_seconds: Minimum age (by modification time) of files to delete
+            keep: Paths still in use (queued or running jobs)
+
+        Returns:
+            Number of files deleted
+        """
+        keep = {Path(p) for p in keep}
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for directory in self.directories:
+            for path in directory.iterdir():
+                try:
+                    if path.is_file() and path not in keep and path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+
+async def iter_upload(file, chunk_bytes: int = CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Chunks of a FastAPI UploadFile"""
+    while True:
+        chunk = await file.read(chunk_bytes)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def run_janitor(spool: UploadSpool, max_age_seconds: float, interval_seconds: float, in_use=lambda: ()):
+    """
+    Periodically sweep stale uploads (run as a background task; cancel to stop)
+
+    Args:
+        spool: UploadSpool to sweep
+        max_age_seconds: Age after which an unused upload is deleted
+        interval_seconds: Time between sweeps
+        in_use: Callable returning paths that must be kept
+    """
+    while True:
+        try:
+            removed = await asyncio.to_thread(spool.sweep, max_age_seconds, list(in_use()))
+            if removed:
+                logger.info("Upload janitor removed %d stale file(s)", removed)
+        except Exception as e:
+            logger.warning("Upload janitor sweep failed: %s", e)
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,580 @@
+"""
+Job-based Video Analysis Pipeline
+Runs analyze_video in a bounded pool of worker processes so uploads return
+immediately and the API event loop never blocks on decoding or inference.
+
+Each worker process loads and warms one PoseLandmarker when it starts and
+reuses it for every video it handles. Workers report warm-up and progress
+back to the API process through a multiprocessing queue drained by a
+listener thread; job state lives in the API process. A worker that dies
+(a native crash, the OOM killer) breaks the whole pool: its jobs fail and
+the next submit replaces the pool with freshly warmed workers.
+
+With an AnalysisCache, re-uploads of an already analysed clip complete at
+submit time from cached results, and workers reuse cached keypoints to skip
+pose inference when only the analyzer parameters changed.
+
+Workers log through the same queued structured logging as the API process,
+tagged with the request id of the upload that created the job.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..logging_config import configure_logging, get_request_id, request_context
+from .archive import FILE_SUFFIX
+from .cache import AnalysisCache, cache_keys
+from .profiler import SamplingProfiler
+from .sampling import SamplingConfig
+from .timing import StageHistograms, StageTimer
+from .video_processor import MODEL_NAME, LandmarkerSession, analyze_video, repetition_to_dict, verify_model
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a video analysis job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class VideoAnalysisJob:
+    """State of one submitted video analysis"""
+    job_id: str
+    video_path: Path
+    # Id of the request that submitted the job (see app.logging_config)
+    request_id: Optional[str] = None
+    status: JobStatus = JobStatus.QUEUED
+    frames_processed: int = 0
+    total_frames: int = 0
+    # Per-rep metrics from streaming analysis, as each rep completes; provisional, the
+    # final repetitions in results come from the batch pass and can differ
+    provisional_reps: List[Dict] = field(default_factory=list)
+    results: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def progress(self) -> float:
+        """Fraction of frames processed (0.0-1.0)"""
+        if self.status == JobStatus.COMPLETED:
+            return 1.0
+        if self.total_frames <= 0:
+            return 0.0
+        return min(1.0, self.frames_processed / self.total_frames)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "request_id": self.request_id,
+            "status": self.status.value,
+            "progress": round(self.progress, 3),
+            "frames_processed": self.frames_processed,
+            "total_frames": self.total_frames,
+            "provisional_reps": self.provisional_reps,
+            "results": self.results,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# ── Worker process side ───────────────────────────────────────────────────────
+
+# Progress queue, landmarker and cache owned by each worker (set by the pool initializer)
+_progress_queue = None
+_session: Optional[LandmarkerSession] = None
+_session_error: Optional[str] = None
+_cache: Optional[AnalysisCache] = None
+
+# Report progress every N frames to keep queue traffic low
+PROGRESS_INTERVAL_FRAMES = 15
+
+# Interval between background model download attempts after a failed startup check
+MODEL_RETRY_SECONDS = 60
+
+
+class VideoAnalysisUnavailable(RuntimeError):
+    """The pose model could not be loaded, so no worker pool is running"""
+
+
+def _init_worker(
+    progress_queue,
+    model_path: str,
+    inference_size: Optional[Tuple[int, int]],
+    cache_dir: Optional[str] = None,
+    cache_max_bytes: int = 0,
+    log_level: str = "INFO",
+    log_format: str = "json",
+):
+    """Load and warm this worker's landmarker once, before it takes any job"""
+    global _progress_queue, _session, _session_error, _cache
+    configure_logging(log_level, log_format)
+    _progress_queue = progress_queue
+    if cache_dir is not None:
+        _cache = AnalysisCache(Path(cache_dir), cache_max_bytes)
+    try:
+        _session = LandmarkerSession(model_path, inference_size)
+        _session.warm_up()
+        _progress_queue.put((None, "warm", os.getpid(), 0))
+    except Exception as e:
+        _session_error = str(e)
+        _progress_queue.put((None, "warm_failed", os.getpid(), 0))
+        logger.error("Worker %d could not load pose model: %s", os.getpid(), e)
+
+
+def _ping() -> int:
+    """No-op task used to make the pool spawn (and warm) its workers at startup"""
+    return os.getpid()
+
+
+def _run_analysis_job(
+    job_id: str,
+    video_path: str,
+    model_dir: str,
+    sampling: Optional[SamplingConfig] = None,
+    content_hash: Optional[str] = None,
+    archive_path: Optional[str] = None,
+    archive_dtype: str = "float32",
+    profile_path: Optional[str] = None,
+    request_id: Optional[str] = None,
+) -> Optional[Dict]:
+    """Entry point executed inside a worker process"""
+    with request_context(request_id):
+        return _run_analysis(
+            job_id, video_path, model_dir, sampling, content_hash, archive_path, archive_dtype, profile_path
+        )
+
+
+def _run_analysis(
+    job_id: str,
+    video_path: str,
+    model_dir: str,
+    sampling: Optional[SamplingConfig],
+    content_hash: Optional[str],
+    archive_path: Optional[str],
+    archive_dtype: str,
+    profile_path: Optional[str],
+) -> Optional[Dict]:
+    if _session is None:
+        raise RuntimeError(f"Pose model not loaded in worker: {_session_error}")
+    _progress_queue.put((job_id, "started", 0, 0))
+
+    def report(frame_idx: int, frame_count: int):
+        if frame_idx % PROGRESS_INTERVAL_FRAMES == 0:
+            _progress_queue.put((job_id, "progress", frame_idx, frame_count))
+
+    def report_rep(rep_count, rep):
+        _progress_queue.put((job_id, "repetition", repetition_to_dict(rep_count, rep), 0))
+
+    logger.info("Analysing %s (job %s)", Path(video_path).name, job_id)
+
+    def run():
+        return analyze_video(
+            Path(video_path), Path(model_dir), progress_callback=report, session=_session,
+            sampling=sampling, repetition_callback=report_rep, cache=_cache, content_hash=content_hash,
+            archive_path=Path(archive_path) if archive_path else None, archive_dtype=archive_dtype,
+        )
+
+    if profile_path is None:
+        return run()
+
+    with SamplingProfiler() as profiler:
+        results = run()
+    profiler.write(Path(profile_path))
+    if results is not None:
+        results["diagnostics"]["profile"] = Path(profile_path).name
+        results["diagnostics"]["profile_samples"] = profiler.samples
+    return results
+
+
+# ── API process side ──────────────────────────────────────────────────────────
+
+class VideoAnalysisJobManager:
+    """Submits videos to a bounded process pool and tracks their status"""
+
+    def __init__(
+        self,
+        model_dir: Path,
+        max_workers: int = 0,
+        retention_seconds: float = 3600,
+        sampling: Optional[SamplingConfig] = None,
+        inference_size: Optional[Tuple[int, int]] = None,
+        cache: Optional[AnalysisCache] = None,
+        archive_dir: Optional[Path] = None,
+        archive_dtype: str = "float32",
+        profile_dir: Optional[Path] = None,
+        log_level: str = "INFO",
+        log_format: str = "json",
+    ):
+        """
+        Args:
+            model_dir: Directory containing the MediaPipe model
+            max_workers: Worker process count (0 = one per CPU core)
+            retention_seconds: How long finished jobs stay queryable
+            sampling: Frame sampling mode applied to every job (default: every frame)
+            inference_size: (width, height) frames are downscaled to before inference
+                (default: native resolution)
+            cache: Keypoint/results cache shared with the workers (default: no caching)
+            archive_dir: Directory each job's keypoint archive is saved to as
+                <job_id>.stsk (default: keypoints are not kept)
+            archive_dtype: Keypoint precision of the archives ('float32' or 'float16')
+            profile_dir: Directory for per-job sampling profiles requested with
+                submit(profile=True) (default: profiling disabled)
+            log_level: Logging level of the worker processes
+            log_format: Log output of the worker processes ('json' or 'text')
+        """
+        self.model_dir = model_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.retention_seconds = retention_seconds
+        self.sampling = sampling or SamplingConfig()
+        self.inference_size = inference_size
+        self.cache = cache
+        self.archive_dir = archive_dir
+        self.archive_dtype = archive_dtype
+        if archive_dir is not None:
+            archive_dir.mkdir(parents=True, exist_ok=True)
+        self.profile_dir = profile_dir
+        if profile_dir is not None:
+            profile_dir.mkdir(parents=True, exist_ok=True)
+        self.log_level = log_level
+        self.log_format = log_format
+        # Per-stage timings of finished jobs, exported on /metrics
+        self.stage_metrics = StageHistograms()
+
+        self._jobs: Dict[str, VideoAnalysisJob] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._mp_context = None
+        self._progress_queue = None
+        self._listener: Optional[threading.Thread] = None
+
+        self.model_path: Optional[str] = None
+        self.model_error: Optional[str] = None
+        self._warm_pids: Set[int] = set()
+        self._failed_pids: Set[int] = set()
+        # A worker death breaks the whole pool; it is replaced on the next submit
+        self._pool_broken = False
+        self.pool_restarts = 0
+        self.last_restart_at: Optional[float] = None
+        self._model_retry: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """
+        Verify the model, then create the warmed worker pool and progress listener (idempotent)
+
+        Called once at app startup; uploads never download the model. If the
+        check fails, a background thread retries it every MODEL_RETRY_SECONDS
+        and starts the pool once the model is there.
+        """
+        with self._lock:
+            if self._executor is not None or self._model_retry is not None:
+                return
+            if not self._verify_model():
+                self._model_retry = threading.Thread(
+                    target=self._retry_model, name="video-model-retry", daemon=True
+                )
+                self._model_retry.start()
+                return
+            self._start_pool()
+
+    def _verify_model(self) -> bool:
+        try:
+            self.model_path = verify_model(self.model_dir)
+            self.model_error = None
+            return True
+        except RuntimeError as e:
+            self.model_error = str(e)
+            logger.warning("Video analysis unavailable: %s", e)
+            return False
+
+    def _retry_model(self):
+        while not self._stopping.wait(MODEL_RETRY_SECONDS):
+            if self._verify_model():
+                with self._lock:
+                    if not self._stopping.is_set() and self._executor is None:
+                        self._start_pool()
+                logger.info("Pose model available, video analysis workers started")
+                return
+
+    def _start_pool(self):
+        """Create the worker pool and progress listener (called holding the lock)"""
+        # spawn: MediaPipe/OpenCV hold threads that do not survive fork
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._progress_queue = self._mp_context.Queue()
+        self._executor = self._create_pool()
+        self._listener = threading.Thread(
+            target=self._drain_progress, name="video-job-progress", daemon=True
+        )
+        self._listener.start()
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        """A new worker pool, with every worker spawned and warming up"""
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._mp_context,
+            initializer=_init_worker,
+            initargs=(
+                self._progress_queue, self.model_path, self.inference_size,
+                str(self.cache.cache_dir) if self.cache is not None else None,
+                self.cache.max_bytes if self.cache is not None else 0,
+                self.log_level, self.log_format,
+            ),
+        )
+        # Workers spawn lazily; one ping each brings the whole pool up now
+        for _ in range(self.max_workers):
+            executor.submit(_ping)
+        return executor
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Replace a pool broken by a worker death (a no-op if another caller already did)"""
+        with self._lock:
+            if self._executor is not broken:
+                return self._executor
+            logger.warning("Video analysis worker pool is broken (a worker died), restarting it")
+            broken.shutdown(wait=False, cancel_futures=True)
+            # The new workers report their own warm-up
+            self._warm_pids.clear()
+            self._failed_pids.clear()
+            self._executor = self._create_pool()
+            self._pool_broken = False
+            self.pool_restarts += 1
+            self.last_restart_at = time.time()
+            return self._executor
+
+    def shutdown(self):
+        self._stopping.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._progress_queue.put(None)
+        self._warm_pids.clear()
+        self._failed_pids.clear()
+
+    def submit(
+        self, video_path: Path, cleanup: bool = True, content_hash: Optional[str] = None, profile: bool = False
+    ) -> VideoAnalysisJob:
+        """
+        Queue a video for analysis
+
+        Args:
+            video_path: Path to the uploaded video file
+            cleanup: Delete the video file once the job finishes
+            content_hash: SHA-256 of the file; with a cache, a clip analysed
+                before completes immediately from its cached results
+            profile: Record a sampling profile of the analysis (ignored unless
+                the manager has a profile_dir)
+
+        Returns:
+            The new VideoAnalysisJob (status QUEUED, or COMPLETED on a cache hit)
+
+        Raises:
+            VideoAnalysisUnavailable: No worker pool is running (the model
+                could not be loaded) and the clip is not cached
+        """
+        cached = self._cached_results(video_path, content_hash)
+        self._prune()
+
+        job = VideoAnalysisJob(job_id=str(uuid.uuid4()), video_path=video_path, request_id=get_request_id())
+        with self._lock:
+            executor = self._executor
+            if cached is None and executor is None:
+                raise VideoAnalysisUnavailable(
+                    f"Video analysis unavailable: {self.model_error or 'worker pool not started'}"
+                )
+            # Registered before the worker starts, so its first progress message finds the job
+            self._jobs[job.job_id] = job
+
+        if cached is not None:
+            executor = None
+            job.started_at = time.time()
+            job.future = Future()
+            job.future.set_result(cached)
+        else:
+            archive_path = profile_path = None
+            if self.archive_dir is not None:
+                archive_path = str(self.archive_dir / f"{job.job_id}{FILE_SUFFIX}")
+            if profile and self.profile_dir is not None:
+                profile_path = str(self.profile_path(job.job_id))
+            args = (
+                _run_analysis_job, job.job_id, str(video_path), str(self.model_dir), self.sampling,
+                content_hash, archive_path, self.archive_dtype, profile_path, job.request_id,
+            )
+            try:
+                job.future, executor = self._submit_to_pool(executor, args)
+            except BaseException:
+                # A job without a future would stay QUEUED (and its file active) forever
+                with self._lock:
+                    self._jobs.pop(job.job_id, None)
+                raise
+        job.future.add_done_callback(lambda f: self._on_done(job, f, cleanup, executor))
+        return job
+
+    def _submit_to_pool(self, executor: ProcessPoolExecutor, args: Tuple) -> Tuple[Future, ProcessPoolExecutor]:
+        """Submit to the pool, restarting it once if a worker death broke it"""
+        try:
+            try:
+                return executor.submit(*args), executor
+            except BrokenProcessPool:
+                executor = self._restart_pool(executor)
+                if executor is None:
+                    raise RuntimeError("worker pool shut down")
+                return executor.submit(*args), executor
+        except RuntimeError as e:
+            # The pool was shut down (app stopping) between the check and the submit
+            if not self._stopping.is_set():
+                raise
+            raise VideoAnalysisUnavailable(f"Video analysis unavailable: {e}") from e
+
+    def profile_path(self, job_id: str) -> Optional[Path]:
+        """Where a job's sampling profile (folded stacks) is written"""
+        if self.profile_dir is None:
+            return None
+        return self.profile_dir / f"{job_id}.folded"
+
+    def _cached_results(self, video_path: Path, content_hash: Optional[str]) -> Optional[Dict]:
+        if self.cache is None or content_hash is None:
+            return None
+        timer = StageTimer()
+        with timer.stage("cache"):
+            _, results_key = cache_keys(content_hash, MODEL_NAME, self.sampling, self.inference_size)
+            results = self.cache.get_results(results_key)
+        if results is not None:
+            logger.info("Analysis cache hit: %s", video_path.name)
+            results["video_name"] = video_path.name
+            results["diagnostics"] = {"cache": "results", **timer.to_dict()}
+        return results
+
+    def get(self, job_id: str) -> Optional[VideoAnalysisJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_paths(self) -> List[Path]:
+        """Video files of jobs that have not finished yet"""
+        with self._lock:
+            return [job.video_path for job in self._jobs.values() if not job.is_finished]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "max_workers": self.max_workers,
+            "queued": sum(1 for j in jobs if j.status == JobStatus.QUEUED),
+            "running": sum(1 for j in jobs if j.status == JobStatus.RUNNING),
+        }
+
+    def pool_status(self) -> Dict:
+        """Landmarker pool size and warm-up state for the health endpoint"""
+        warm_workers = len(self._warm_pids)
+        return {
+            "pool_size": self.max_workers,
+            "sampling_mode": self.sampling.mode,
+            "inference_size": list(self.inference_size) if self.inference_size else None,
+            "started": self._executor is not None,
+            "broken": self._pool_broken,
+            "restarts": self.pool_restarts,
+            "last_restart_at": self.last_restart_at,
+            "warm_workers": warm_workers,
+            "failed_workers": len(self._failed_pids),
+            "warm": warm_workers >= self.max_workers,
+            "model_path": self.model_path,
+            "model_error": self.model_error,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    def _on_done(
+        self, job: VideoAnalysisJob, future: Future, cleanup: bool, executor: Optional[ProcessPoolExecutor]
+    ):
+        job.finished_at = time.time()
+        try:
+            results = future.result()
+            if results is None:
+                job.error = "Video analysis failed. Could not process video."
+                job.status = JobStatus.FAILED
+            else:
+                results["analysis_id"] = job.job_id
+                self.stage_metrics.observe_diagnostics(results.get("diagnostics"))
+                job.results = results
+                job.status = JobStatus.COMPLETED
+        except BrokenProcessPool:
+            job.error = "Analysis error: the worker process died (e.g. out of memory)"
+            job.status = JobStatus.FAILED
+            if executor is not None and executor is self._executor:
+                self._pool_broken = True
+        except Exception as e:
+            job.error = f"Analysis error: {str(e)}"
+            job.status = JobStatus.FAILED
+        finally:
+            if cleanup and job.video_path.exists():
+                job.video_path.unlink()
+            # Runs on the executor's callback thread, outside the request's context
+            extra = {"request_id": job.request_id, "job_id": job.job_id}
+            if job.status == JobStatus.FAILED:
+                logger.warning("Video analysis job failed: %s", job.error, extra=extra)
+            else:
+                logger.info(
+                    "Video analysis job completed in %.2fs", job.finished_at - job.created_at, extra=extra
+                )
+
+    def _drain_progress(self):
+        while True:
+            try:
+                message = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            # (job_id, kind, a, b): frame_idx/frame_count for progress, rep metrics
+            # for repetitions, worker pid for warm-up
+            job_id, kind, a, b = message
+            if kind == "warm":
+                self._warm_pids.add(a)
+                continue
+            if kind == "warm_failed":
+                self._failed_pids.add(a)
+                continue
+            job = self.get(job_id)
+            if job is None or job.is_finished:
+                continue
+            if kind == "started":
+                job.status = JobStatus.RUNNING
+                job.started_at = time.time()
+            elif kind == "repetition":
+                job.provisional_reps.append(a)
+            else:
+                job.frames_processed = a
+                job.total_frames = b
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.is_finished and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,173 @@
+"""
+Live Pre-Recording Validation
+Runs the pre-recording posture validators on a camera preview so patients can
+fix their setup before they record.
+
+Clients send either MediaPipe landmarks they computed themselves (no server
+inference) or low-resolution JPEG frames, which go through a per-connection
+landmarker in LIVE_STREAM mode. LIVE_STREAM drops frames while a detection is
+still running, so feedback keeps up with the camera instead of queueing.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from mediapipe.tasks.python.vision.core import image as mp_image
+
+from .pose_engine import PoseAdapter
+from .preprocessing import CanvasGeometry, FramePreprocessor
+from .validators import PostureValidator, PostureValidationReport, ValidationResult
+from .video_processor import init_mediapipe_pose
+
+
+# Frame ids remembered while their detection is in flight
+MAX_PENDING_FRAMES = 64
+
+_adapter = PoseAdapter.create("mediapipe")
+
+
+def _result_to_dict(result: ValidationResult) -> Dict:
+    return {
+        "is_valid": bool(result.is_valid),
+        "metric_value": round(float(result.metric_value), 3),
+        "failure_reason": result.failure_reason,
+    }
+
+
+def report_to_dict(report: PostureValidationReport) -> Dict:
+    """JSON form of a pre-recording validation report"""
+    return {
+        "all_valid": bool(report.all_valid),
+        "stance_width": _result_to_dict(report.stance_width),
+        "foot_rotation_left": _result_to_dict(report.foot_rotation_left),
+        "foot_rotation_right": _result_to_dict(report.foot_rotation_right),
+        "body_placement": _result_to_dict(report.body_placement),
+    }
+
+
+def validate_landmarks(
+    landmarks: Optional[np.ndarray],
+    frame_shape: Tuple[int, int],
+    validator: Optional[PostureValidator] = None,
+    normalized: bool = True,
+) -> Dict:
+    """
+    Run the pre-recording validators on one frame's landmarks
+
+    Args:
+        landmarks: Array (33, 3) of MediaPipe x, y, visibility, or None if no pose was found
+        frame_shape: (height, width) of the camera frame
+        validator: PostureValidator to use (default: a new one)
+        normalized: landmarks x, y are in [0, 1] (MediaPipe output) rather than pixels
+
+    Returns:
+        {"detected": bool, "report": {...}} (report only when a pose was detected)
+
+    Raises:
+        ValueError: If landmarks is not 33 rows of x, y, visibility
+    """
+    if landmarks is None:
+        return {"detected": False}
+
+    points = np.array(landmarks, dtype=np.float32)
+    if points.shape != (33, 3):
+        raise ValueError("Expected 33 landmarks of [x, y, visibility]")
+    if normalized:
+        height, width = frame_shape
+        points[:, 0] *= width
+        points[:, 1] *= height
+
+    body = _adapter.to_standard(points)
+    validator = validator or PostureValidator()
+    report = validator.validate_all_pre_recording(body, frame_shape)
+    return {"detected": True, "report": report_to_dict(report)}
+
+
+class LiveValidationSession:
+    """Per-connection LIVE_STREAM landmarker that validates each processed frame"""
+
+    def __init__(
+        self,
+        model_path: str,
+        on_report: Callable[[Dict], None],
+        inference_size: Optional[Tuple[int, int]] = None,
+    ):
+        """
+        Args:
+            model_path: Path to the MediaPipe model
+            on_report: Callable receiving each frame's report dict; runs on a
+                MediaPipe thread
+            inference_size: (width, height) frames are downscaled to before inference
+        """
+        self.on_report = on_report
+        self.validator = PostureValidator()
+        self.preprocessor = FramePreprocessor(inference_size)
+        self.frames_received = 0
+        self.frames_dropped = 0
+
+        self._lock = threading.Lock()
+        # timestamp_ms -> (frame id, frame_shape, canvas geometry) for detections in flight;
+        # the geometry is per frame because the next frame may reconfigure the preprocessor
+        self._pending: Dict[int, Tuple[int, Tuple[int, int], CanvasGeometry]] = {}
+        self._last_ms = -1
+        self.landmarker = init_mediapipe_pose(model_path, result_callback=self._on_result)
+
+    def submit_jpeg(self, data: bytes) -> Optional[int]:
+        """
+        Decode a JPEG frame and queue it for detection
+
+        Returns:
+            The frame id echoed in its report, or None if the data is not an image
+        """
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+
+        frame_rgb = self.preprocessor.prepare(frame)
+        # LIVE_STREAM runs asynchronously, so the reused canvas must not back the image
+        mediapipe_image = mp_image.Image(image_format=mp_image.ImageFormat.SRGB, data=frame_rgb.copy())
+
+        with self._lock:
+            frame_id = self.frames_received
+            self.frames_received += 1
+            # Timestamps must strictly increase for the lifetime of the landmarker
+            timestamp_ms = max(int(time.monotonic() * 1000), self._last_ms + 1)
+            self._last_ms = timestamp_ms
+            self._pending[timestamp_ms] = (frame_id, frame.shape[:2], self.preprocessor.geometry)
+            while len(self._pending) > MAX_PENDING_FRAMES:
+                # Dropped by the landmarker while it was busy
+                del self._pending[next(iter(self._pending))]
+                self.frames_dropped += 1
+
+        self.landmarker.detect_async(mediapipe_image, timestamp_ms)
+        return frame_id
+
+    def close(self):
+        self.landmarker.close()
+
+    def _on_result(self, result, output_image, timestamp_ms: int):
+        with self._lock:
+            pending = self._pending.pop(timestamp_ms, None)
+            # Anything older than this result was dropped by the landmarker
+            for stale in [ts for ts in self._pending if ts < timestamp_ms]:
+                del self._pending[stale]
+                self.frames_dropped += 1
+        if pending is None:
+            return
+        frame_id, frame_shape, geometry = pending
+
+        landmarks = None
+        if result.pose_landmarks:
+            normalized = np.array(
+                [(landmark.x, landmark.y, landmark.visibility) for landmark in result.pose_landmarks[0]],
+                dtype=np.float32,
+            )
+            landmarks = np.column_stack([geometry.to_original(normalized[:, :2]), normalized[:, 2]])
+
+        report = validate_landmarks(landmarks, frame_shape, self.validator, normalized=False)
+        report["frame_id"] = frame_id
+        report["timestamp_ms"] = timestamp_ms
+        self.on_report(report)
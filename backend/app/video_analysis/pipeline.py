@@ -0,0 +1,187 @@
+"""
+Threaded Decode / Inference Pipeline
+Overlaps video decoding with pose inference:
+
+  decoder thread --(ring of reused frame buffers)--> inference (caller's thread,
+  strictly in frame order for VIDEO-mode timestamps) --> sequence assembler thread
+
+The ring holds a fixed number of preallocated frames, so memory stays flat
+regardless of clip length, and the decoder blocks once it is that far ahead.
+"""
+
+import queue
+import threading
+from typing import Callable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .pose_sequence import PoseSequence
+from .timing import StageTimer
+
+
+# Frames decoded ahead of inference
+DEFAULT_RING_SIZE = 8
+
+# Decoder -> consumer markers
+_END = object()
+
+
+class FrameDecoder:
+    """
+    Decodes a capture on a background thread into a ring of reused frame buffers
+
+    Iterating yields (frame_idx, frame) for every wanted frame; unwanted frames
+    are only grabbed (decoded, never converted). A yielded frame is recycled
+    when the next one is requested, so consumers must not keep references.
+    """
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture,
+        wanted: Optional[Callable[[int], bool]] = None,
+        stop_at: Optional[int] = None,
+        ring_size: int = DEFAULT_RING_SIZE,
+        timer: Optional[StageTimer] = None,
+    ):
+        """
+        Args:
+            cap: Opened capture positioned at frame 0
+            wanted: Predicate selecting frames to retrieve (default: all)
+            stop_at: Stop decoding at this frame index (exclusive)
+            ring_size: Number of frame buffers decoded ahead
+            timer: StageTimer receiving the "decode" stage
+        """
+        self.cap = cap
+        self.wanted = wanted
+        self.stop_at = stop_at
+        self.timer = timer if timer is not None else StageTimer()
+        self.frames_decoded = 0
+
+        self._free: "queue.Queue[Optional[np.ndarray]]" = queue.Queue()
+        self._filled: "queue.Queue" = queue.Queue(maxsize=ring_size)
+        # Buffers are allocated lazily (frame size is known after the first read)
+        for _ in range(ring_size):
+            self._free.put(None)
+
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="video-decoder", daemon=True)
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        self._thread.start()
+        try:
+            while True:
+                item = self._filled.get()
+                if item is _END:
+                    break
+                frame_idx, frame = item
+                yield frame_idx, frame
+                self._free.put(frame)
+        finally:
+            self.close()
+
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Stop the decoder thread (safe to call more than once)"""
+        self._stop.set()
+        # Unblock a decoder waiting for a free buffer
+        self._free.put(None)
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        frame_idx = 0
+        try:
+            while not self._stop.is_set():
+                if self.stop_at is not None and frame_idx >= self.stop_at:
+                    break
+
+                if self.wanted is not None and not self.wanted(frame_idx):
+                    with self.timer.stage("decode"):
+                        grabbed = self.cap.grab()
+                    if not grabbed:
+                        break
+                    frame_idx += 1
+                    continue
+
+                buffer = self._free.get()
+                if self._stop.is_set():
+                    break
+                with self.timer.stage("decode"):
+                    ret, frame = self.cap.read(buffer) if buffer is not None else self.cap.read()
+                if not ret:
+                    break
+                self._put((frame_idx, frame))
+                frame_idx += 1
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.frames_decoded = frame_idx
+            self._put(_END)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._filled.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+class SequenceAssembler:
+    """Packs (keypoints, scores) into a PoseSequence on a worker thread, keeping frame order"""
+
+    def __init__(self, capacity: int = 0, num_landmarks: int = 33, stream=None, timer: Optional[StageTimer] = None):
+        """
+        Args:
+            capacity: Expected frame count (the buffer grows if the estimate is short)
+            num_landmarks: Landmarks per detection
+            stream: Optional StreamingSitToStandAnalyzer fed each frame as it is packed
+            timer: StageTimer receiving the "adapter" stage (packing and conversion)
+        """
+        self._rows = np.zeros((max(capacity, 1), num_landmarks, 3), dtype=np.float32)
+        self._count = 0
+        self.stream = stream
+        self.timer = timer if timer is not None else StageTimer()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="sequence-assembler", daemon=True)
+        self._thread.start()
+
+    def submit(self, keypoints: Optional[np.ndarray], scores: Optional[np.ndarray]):
+        self._queue.put((keypoints, scores))
+
+    def finish(self) -> PoseSequence:
+        """Wait for all submitted frames and return them as a PoseSequence"""
+        self._queue.put(_END)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        with self.timer.stage("adapter"):
+            return PoseSequence.from_mediapipe(self._rows[:self._count])
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if self._error is not None:
+                continue
+            keypoints, scores = item
+            try:
+                with self.timer.stage("adapter"):
+                    if self._count == len(self._rows):
+                        self._rows = np.concatenate([self._rows, np.zeros_like(self._rows)])
+                    # Frames without detection stay all-zero
+                    if keypoints is not None:
+                        row = self._rows[self._count]
+                        row[:, :2] = keypoints
+                        row[:, 2] = scores
+                    self._count += 1
+                if self.stream is not None:
+                    self.stream.push(PoseSequence.from_mediapipe(self._rows[self._count - 1:self._count]))
+            except BaseException as e:
+                self._error = e
@@ -0,0 +1,181 @@
+"""
+Array-backed Pose Sequence
+Stores a whole clip's keypoints in one contiguous float32 array of shape
+(frames, keypoints, 3) instead of one StandardBody dataclass per frame.
+
+Keypoints are addressed by the StandardBody field names. Mid-hip and
+mid-shoulder are derived for every frame at once, and PoseFrame gives a
+read-only per-frame view with the StandardBody attribute interface, so the
+analyzer and validators accept a PoseSequence wherever they take a list of
+bodies.
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .pose_engine import StandardBody, MediaPipeAdapter
+
+
+# Named keypoints taken from the pose model (StandardBody field names)
+CORE_KEYPOINTS = (
+    'nose', 'l_shoulder', 'r_shoulder', 'l_hip', 'r_hip',
+    'l_knee', 'r_knee', 'l_ankle', 'r_ankle',
+)
+OPTIONAL_KEYPOINTS = (
+    'l_elbow', 'r_elbow', 'l_wrist', 'r_wrist',
+    'l_big_toe', 'r_big_toe', 'l_heel', 'r_heel',
+)
+# Derived columns computed from the pairs below
+DERIVED_KEYPOINTS = ('mid_hip', 'mid_shoulder')
+
+KEYPOINT_NAMES = CORE_KEYPOINTS + OPTIONAL_KEYPOINTS + DERIVED_KEYPOINTS
+KEYPOINT_INDEX: Dict[str, int] = {name: i for i, name in enumerate(KEYPOINT_NAMES)}
+
+# MediaPipe landmark index for each model keypoint column
+_MEDIAPIPE_COLUMNS = np.array(
+    [MediaPipeAdapter().keypoint_map[name] for name in CORE_KEYPOINTS + OPTIONAL_KEYPOINTS]
+)
+_NUM_MODEL_KEYPOINTS = len(CORE_KEYPOINTS) + len(OPTIONAL_KEYPOINTS)
+
+
+class PoseSequence:
+    """Keypoints (x, y, confidence) for every frame of a clip"""
+
+    def __init__(self, data: np.ndarray, detected: Optional[np.ndarray] = None):
+        """
+        Args:
+            data: Array (frames, len(KEYPOINT_NAMES), 3); derived columns are recomputed
+            detected: Boolean mask (frames,) of frames with a pose detection
+                (default: frames with any non-zero confidence)
+        """
+        self.data = np.ascontiguousarray(data, dtype=np.float32)
+        if detected is None:
+            detected = self.data[:, :_NUM_MODEL_KEYPOINTS, 2].any(axis=1)
+        self.detected = np.asarray(detected, dtype=bool)
+        self._derive()
+
+    @classmethod
+    def from_mediapipe(cls, landmarks: np.ndarray) -> "PoseSequence":
+        """
+        Build from raw MediaPipe landmarks
+
+        Args:
+            landmarks: Array (frames, 33, 3) of x, y, visibility; all-zero rows mark
+                frames without a detection
+        """
+        data = np.zeros((len(landmarks), len(KEYPOINT_NAMES), 3), dtype=np.float32)
+        if len(landmarks):
+            data[:, :_NUM_MODEL_KEYPOINTS] = landmarks[:, _MEDIAPIPE_COLUMNS]
+        return cls(data, detected=landmarks[:, :, 2].any(axis=1) if len(landmarks) else None)
+
+    @classmethod
+    def wrap(cls, data: np.ndarray, detected: np.ndarray) -> "PoseSequence":
+        """
+        Use existing arrays as they are: no copy, no re-derivation
+
+        Args:
+            data: float32 array (frames, len(KEYPOINT_NAMES), 3) with the derived
+                columns already filled (e.g. a read-only memory map)
+            detected: Boolean mask (frames,) of frames with a pose detection
+        """
+        sequence = cls.__new__(cls)
+        sequence.data = data
+        sequence.detected = detected
+        return sequence
+
+    @classmethod
+    def from_bodies(cls, bodies: Sequence[StandardBody]) -> "PoseSequence":
+        """Build from StandardBody objects (missing optional keypoints become zeros)"""
+        data = np.zeros((len(bodies), len(KEYPOINT_NAMES), 3), dtype=np.float32)
+        detected = np.zeros(len(bodies), dtype=bool)
+        for i, body in enumerate(bodies):
+            for j, name in enumerate(CORE_KEYPOINTS + OPTIONAL_KEYPOINTS):
+                point = getattr(body, name)
+                if point is not None:
+                    data[i, j] = point
+            detected[i] = any(getattr(body, name) is not None for name in OPTIONAL_KEYPOINTS)
+        return cls(data, detected=detected)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union["PoseFrame", "PoseSequence"]:
+        if isinstance(index, slice):
+            # Shares the underlying buffer
+            return PoseSequence.wrap(self.data[index], self.detected[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PoseSequence index out of range")
+        return PoseFrame(self, index)
+
+    def __iter__(self) -> Iterator["PoseFrame"]:
+        for i in range(len(self)):
+            yield PoseFrame(self, i)
+
+    def point(self, name: str) -> np.ndarray:
+        """(frames, 3) view of one named keypoint"""
+        return self.data[:, KEYPOINT_INDEX[name]]
+
+    @property
+    def mid_hip(self) -> np.ndarray:
+        return self.point('mid_hip')
+
+    @property
+    def mid_shoulder(self) -> np.ndarray:
+        return self.point('mid_shoulder')
+
+    def to_bodies(self) -> List[StandardBody]:
+        """Materialise StandardBody objects (for code that needs real dataclasses)"""
+        return [frame.to_standard() for frame in self]
+
+    def _derive(self):
+        for derived, left, right in (
+            ('mid_hip', 'l_hip', 'r_hip'),
+            ('mid_shoulder', 'l_shoulder', 'r_shoulder'),
+        ):
+            a = self.data[:, KEYPOINT_INDEX[left]]
+            b = self.data[:, KEYPOINT_INDEX[right]]
+            out = self.data[:, KEYPOINT_INDEX[derived]]
+            out[:, :2] = (a[:, :2] + b[:, :2]) / 2
+            out[:, 2] = np.minimum(a[:, 2], b[:, 2])
+
+
+class PoseFrame:
+    """Read-only StandardBody-compatible view of one frame of a PoseSequence"""
+
+    __slots__ = ('_sequence', '_index')
+
+    def __init__(self, sequence: PoseSequence, index: int):
+        self._sequence = sequence
+        self._index = index
+
+    def _point(self, name: str) -> Tuple[float, float, float]:
+        x, y, c = self._sequence.data[self._index, KEYPOINT_INDEX[name]].tolist()
+        return (x, y, c)
+
+    def _optional_point(self, name: str) -> Optional[Tuple[float, float, float]]:
+        # Frames without a detection have no optional keypoints, like the empty StandardBody
+        if not self._sequence.detected[self._index]:
+            return None
+        return self._point(name)
+
+    def to_standard(self) -> StandardBody:
+        fields = {name: self._point(name) for name in CORE_KEYPOINTS}
+        fields.update({name: self._optional_point(name) for name in OPTIONAL_KEYPOINTS})
+        return StandardBody(**fields)
+
+
+def _core_property(name):
+    return property(lambda self: self._point(name))
+
+
+def _optional_property(name):
+    return property(lambda self: self._optional_point(name))
+
+
+for _name in CORE_KEYPOINTS + DERIVED_KEYPOINTS:
+    setattr(PoseFrame, _name, _core_property(_name))
+for _name in OPTIONAL_KEYPOINTS:
+    setattr(PoseFrame, _name, _optional_property(_name))
@@ -0,0 +1,128 @@
+"""
+Frame Preprocessing for Pose Inference
+Downscales decoded frames to the inference resolution before MediaPipe sees
+them, and maps the returned landmarks back to original pixel coordinates so
+StandardBody and the validators' pixel thresholds are unaffected.
+"""
+
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class CanvasGeometry(NamedTuple):
+    """Where a frame sits on the inference canvas (a snapshot, safe to keep across frames)"""
+    canvas_w: int
+    canvas_h: int
+    pad_x: int
+    pad_y: int
+    # Exact per-axis factors after rounding the scaled size
+    scale_x: float
+    scale_y: float
+
+    def to_original(self, normalized: np.ndarray) -> np.ndarray:
+        """
+        Map landmarks normalised to the canvas back to source pixel coordinates
+
+        Args:
+            normalized: Array (K, 2) of x, y in [0, 1] relative to the canvas
+        """
+        pixels = np.empty_like(normalized)
+        pixels[:, 0] = (normalized[:, 0] * self.canvas_w - self.pad_x) / self.scale_x
+        pixels[:, 1] = (normalized[:, 1] * self.canvas_h - self.pad_y) / self.scale_y
+        return pixels
+
+
+class FramePreprocessor:
+    """
+    Letterboxes BGR frames into a reused RGB canvas of the inference size
+
+    The canvas follows the clip orientation (a 1280x720 target becomes 720x1280
+    for portrait video) and frames are never upscaled. Buffers are allocated
+    once per clip geometry and reused for every frame.
+    """
+
+    def __init__(self, inference_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            inference_size: (width, height) of the inference canvas for landscape
+                video, or None to run at native resolution
+        """
+        self.inference_size = inference_size
+
+        self.scale = 1.0
+        self.pad_x = 0
+        self.pad_y = 0
+        # Exact per-axis factors after rounding the scaled size
+        self._scale_x = self._scale_y = 1.0
+        self._source_shape = None
+        self._resized: Optional[np.ndarray] = None
+        self._canvas: Optional[np.ndarray] = None
+        self._roi: Optional[np.ndarray] = None
+
+    @property
+    def canvas_size(self) -> Optional[Tuple[int, int]]:
+        """(width, height) of the frames handed to MediaPipe"""
+        if self._canvas is None:
+            return None
+        return self._canvas.shape[1], self._canvas.shape[0]
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Convert a BGR frame into the RGB inference canvas
+
+        Returns:
+            The shared canvas array (overwritten by the next call)
+        """
+        if frame.shape != self._source_shape:
+            self._configure(frame.shape)
+
+        if self._resized is not None:
+            cv2.resize(frame, (self._resized.shape[1], self._resized.shape[0]),
+                       dst=self._resized, interpolation=cv2.INTER_LINEAR)
+            cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._roi)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._roi)
+        return self._canvas
+
+    @property
+    def geometry(self) -> CanvasGeometry:
+        """Geometry of the current clip; keep it when results arrive after the next prepare()"""
+        canvas_w, canvas_h = self.canvas_size
+        return CanvasGeometry(canvas_w, canvas_h, self.pad_x, self.pad_y, self._scale_x, self._scale_y)
+
+    def to_original(self, normalized: np.ndarray) -> np.ndarray:
+        """Map landmarks normalised to the canvas back to source pixel coordinates (see CanvasGeometry)"""
+        return self.geometry.to_original(normalized)
+
+    def _configure(self, shape):
+        h, w = shape[:2]
+        self._source_shape = shape
+
+        target = self.inference_size
+        if target is not None and h > w:
+            target = (min(target), max(target))
+
+        if target is None or (w <= target[0] and h <= target[1]):
+            # Native resolution: only the RGB buffer is reused
+            self.scale = self._scale_x = self._scale_y = 1.0
+            self.pad_x = self.pad_y = 0
+            self._resized = None
+            self._canvas = np.empty((h, w, 3), dtype=np.uint8)
+            self._roi = self._canvas
+            return
+
+        target_w, target_h = target
+        self.scale = min(target_w / w, target_h / h)
+        scaled_w = max(1, int(round(w * self.scale)))
+        scaled_h = max(1, int(round(h * self.scale)))
+        self.pad_x = (target_w - scaled_w) // 2
+        self.pad_y = (target_h - scaled_h) // 2
+        self._scale_x = scaled_w / w
+        self._scale_y = scaled_h / h
+
+        self._resized = np.empty((scaled_h, scaled_w, 3), dtype=np.uint8)
+        self._canvas = np.zeros((target_h, target_w, 3), dtype=np.uint8)
+        self._roi = self._canvas[self.pad_y:self.pad_y + scaled_h, self.pad_x:self.pad_x + scaled_w]
+
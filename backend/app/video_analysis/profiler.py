@@ -0,0 +1,76 @@
+"""
+Sampling Profiler
+Opt-in, dependency-free sampling profiler for a single analysis.
+
+A background thread samples the Python stack of every other thread in the
+process at a fixed interval and counts identical stacks. The output is the
+"folded" (collapsed stack) format, one `thread;frame;frame;... count` line per
+distinct stack, which flamegraph.pl, speedscope and inferno read directly.
+Native code (OpenCV, MediaPipe) shows up as the Python line that called it.
+"""
+
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+
+# Sampling interval (seconds)
+DEFAULT_INTERVAL = 0.005
+
+
+class SamplingProfiler:
+    """Samples all threads' stacks until stopped; use as a context manager"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        """
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Collapsed stacks, heaviest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def write(self, path: Path) -> Path:
+        path = Path(path)
+        path.write_text(self.folded())
+        return path
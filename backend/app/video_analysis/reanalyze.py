@@ -0,0 +1,263 @@
+"""
+Batch Re-analysis of Keypoint Archives
+Re-scores stored sessions (keypoint archives, see archive.py) with one or more
+analyzer parameter sets, without decoding video or running pose inference.
+
+Archives are spread over a process pool in chunks. Each worker loads an
+archive once and analyses it with every parameter set. The summary is two
+CSV tables with one column per metric:
+
+  sessions.csv  one row per (session, parameter set): ClinicalMetrics aggregates
+  reps.csv      one row per (session, parameter set, repetition)
+
+The session column is the archive name without its suffix (the analysis job
+id); sts_assessments.keypoint_archive links it to the patient.
+
+Usage:
+    python -m app.video_analysis.reanalyze KEYPOINT_DIR [--params params.json]
+        [--out DIR] [--workers N]
+
+params.json is a list of parameter sets, e.g.
+    [{"name": "baseline"},
+     {"name": "strict", "valgus_threshold": 170, "stance_ratio_min": 0.9}]
+Unset fields keep the SitToStandAnalyzer / PostureValidator defaults.
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..logging_config import configure_logging
+from .analyzer import SitToStandAnalyzer
+from .archive import FILE_SUFFIX, load_archive
+from .validators import PostureValidator
+
+
+# Archives per pool task (amortises inter-process overhead on small files)
+DEFAULT_CHUNK_SIZE = 32
+
+SESSION_COLUMNS = [
+    "session", "params", "frames", "fps", "total_reps", "valid_reps", "invalid_reps",
+    "mean_fppa", "max_trunk_sway_sd", "max_hip_sway_sd", "mean_trunk_sway_sd", "mean_hip_sway_sd",
+    "valgus_count", "instability_count", "error",
+]
+REP_COLUMNS = [
+    "session", "params", "rep", "start_frame", "end_frame", "valid",
+    "peak_valgus_angle", "peak_valgus_angle_left", "peak_valgus_angle_right",
+    "trunk_sway_sd", "hip_sway_sd", "has_valgus", "has_instability", "validation_failures",
+]
+
+
+@dataclass
+class AnalyzerParameters:
+    """One analyzer/validator configuration to re-score sessions with (None = class default)"""
+    name: str = "default"
+    filter_type: Optional[str] = None
+    enable_validators: Optional[bool] = None
+    valgus_threshold: Optional[float] = None
+    sway_threshold: Optional[float] = None
+    velocity_threshold: Optional[float] = None
+    stance_ratio_min: Optional[float] = None
+    stance_ratio_max: Optional[float] = None
+    foot_rotation_max: Optional[float] = None
+    confidence_threshold: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, values: Dict) -> "AnalyzerParameters":
+        known = {f.name for f in fields(cls)}
+        unknown = set(values) - known
+        if unknown:
+            raise ValueError(f"Unknown analyzer parameters: {', '.join(sorted(unknown))}")
+        return cls(**values)
+
+    def build_analyzer(self, fps: float) -> SitToStandAnalyzer:
+        """SitToStandAnalyzer with the set fields overridden; the others keep the class defaults"""
+        validator = PostureValidator(**_set(confidence_threshold=self.confidence_threshold))
+        _override(validator, STANCE_RATIO_MIN=self.stance_ratio_min, STANCE_RATIO_MAX=self.stance_ratio_max,
+                  FOOT_ROTATION_MAX=self.foot_rotation_max)
+
+        analyzer = SitToStandAnalyzer(
+            fps=fps, validator=validator,
+            **_set(filter_type=self.filter_type, enable_validators=self.enable_validators),
+        )
+        _override(analyzer, VALGUS_THRESHOLD=self.valgus_threshold, SWAY_THRESHOLD=self.sway_threshold,
+                  VELOCITY_THRESHOLD=self.velocity_threshold)
+        return analyzer
+
+
+def _set(**values) -> Dict:
+    """The values that are not None"""
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def _override(target, **values):
+    for attribute, value in _set(**values).items():
+        setattr(target, attribute, value)
+
+
+def load_parameter_sets(path: Optional[Path]) -> List[AnalyzerParameters]:
+    """Parameter sets from a JSON file (a list of objects, or one object); default set if None"""
+    if path is None:
+        return [AnalyzerParameters()]
+    values = json.loads(Path(path).read_text())
+    if isinstance(values, dict):
+        values = [values]
+    parameter_sets = [AnalyzerParameters.from_dict(v) for v in values]
+    names = [p.name for p in parameter_sets]
+    if len(set(names)) != len(names):
+        raise ValueError("Parameter set names must be unique")
+    return parameter_sets
+
+
+def _round(value: Optional[float], digits: int = 3) -> Optional[float]:
+    return round(float(value), digits) if value is not None else None
+
+
+def reanalyze_archive(path: Path, parameter_sets: Sequence[AnalyzerParameters]) -> Tuple[List[list], List[list]]:
+    """
+    Analyse one archive with every parameter set
+
+    Returns:
+        (session rows, rep rows) ordered as SESSION_COLUMNS / REP_COLUMNS
+    """
+    session = Path(path).stem
+    session_rows, rep_rows = [], []
+    try:
+        archive = load_archive(path)
+    except (OSError, ValueError) as e:
+        for params in parameter_sets:
+            session_rows.append([session, params.name] + [None] * (len(SESSION_COLUMNS) - 3) + [str(e)])
+        return session_rows, rep_rows
+
+    for params in parameter_sets:
+        try:
+            metrics = params.build_analyzer(archive.fps).analyze(archive.sequence)
+        except Exception as e:
+            session_rows.append(
+                [session, params.name, len(archive.sequence), archive.fps]
+                + [None] * (len(SESSION_COLUMNS) - 5) + [f"{type(e).__name__}: {e}"]
+            )
+            continue
+
+        session_rows.append([
+            session, params.name, len(archive.sequence), archive.fps,
+            metrics.total_reps, metrics.valid_reps, metrics.invalid_reps,
+            _round(metrics.mean_fppa), _round(metrics.max_trunk_sway_std), _round(metrics.max_hip_sway_std),
+            _round(metrics.mean_trunk_sway_std), _round(metrics.mean_hip_sway_std),
+            metrics.valgus_count, metrics.instability_count, None,
+        ])
+        for rep_number, rep in enumerate(metrics.repetitions, 1):
+            rep_rows.append([
+                session, params.name, rep_number, rep.start_frame, rep.end_frame,
+                bool(rep.is_clinically_valid),
+                _round(rep.peak_valgus_angle), _round(rep.peak_valgus_angle_left),
+                _round(rep.peak_valgus_angle_right),
+                _round(rep.trunk_sway_std), _round(rep.hip_sway_std),
+                bool(rep.has_valgus), bool(rep.has_instability),
+                "; ".join(rep.validator_failures),
+            ])
+    return session_rows, rep_rows
+
+
+def _reanalyze_chunk(paths: List[str], parameter_sets: List[Dict]) -> Tuple[List[list], List[list]]:
+    """Pool task: re-analyse a chunk of archives"""
+    parameter_sets = [AnalyzerParameters(**p) for p in parameter_sets]
+    session_rows, rep_rows = [], []
+    for path in paths:
+        sessions, reps = reanalyze_archive(Path(path), parameter_sets)
+        session_rows.extend(sessions)
+        rep_rows.extend(reps)
+    return session_rows, rep_rows
+
+
+def _write_table(path: Path, columns: List[str], rows: List[list]):
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def reanalyze_directory(
+    archive_dir: Path,
+    out_dir: Path,
+    parameter_sets: Sequence[AnalyzerParameters],
+    max_workers: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict:
+    """
+    Re-analyse every keypoint archive in a directory and write the summary tables
+
+    Args:
+        archive_dir: Directory of *.stsk keypoint archives
+        out_dir: Directory sessions.csv and reps.csv are written to
+        parameter_sets: Analyzer parameter sets to score every session with
+        max_workers: Worker process count (0 = one per CPU core)
+        chunk_size: Archives per pool task
+
+    Returns:
+        Run statistics (sessions, analyses, failures, seconds)
+    """
+    paths = sorted(str(p) for p in Path(archive_dir).glob(f"*{FILE_SUFFIX}"))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    parameter_dicts = [asdict(p) for p in parameter_sets]
+
+    start = time.perf_counter()
+    session_rows, rep_rows = [], []
+    if chunks:
+        # spawn: matches the analysis workers (OpenCV threads do not survive fork)
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers or os.cpu_count() or 1, len(chunks)),
+            mp_context=multiprocessing.get_context("spawn"),
+            # Per-session analyzer logs would drown the summary; failures land in the CSV
+            initializer=configure_logging, initargs=("ERROR", "text"),
+        ) as executor:
+            for sessions, reps in executor.map(_reanalyze_chunk, chunks, [parameter_dicts] * len(chunks)):
+                session_rows.extend(sessions)
+                rep_rows.extend(reps)
+    elapsed = time.perf_counter() - start
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _write_table(out_dir / "sessions.csv", SESSION_COLUMNS, session_rows)
+    _write_table(out_dir / "reps.csv", REP_COLUMNS, rep_rows)
+
+    return {
+        "sessions": len(paths),
+        "analyses": len(session_rows),
+        "failures": sum(1 for row in session_rows if row[-1] is not None),
+        "repetitions": len(rep_rows),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.video_analysis.reanalyze",
+        description="Re-score stored keypoint archives with new analyzer parameters",
+    )
+    parser.add_argument("archive_dir", type=Path, help="Directory of *.stsk keypoint archives")
+    parser.add_argument("--params", type=Path, help="JSON list of analyzer parameter sets")
+    parser.add_argument("--out", type=Path, default=Path("reanalysis"), help="Output directory (default: ./reanalysis)")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per CPU core)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Archives per pool task")
+    args = parser.parse_args(argv)
+
+    parameter_sets = load_parameter_sets(args.params)
+    print(f"Re-analysing {args.archive_dir} with {len(parameter_sets)} parameter set(s)...")
+    stats = reanalyze_directory(args.archive_dir, args.out, parameter_sets, args.workers, args.chunk_size)
+
+    rate = stats["sessions"] / stats["seconds"] * 60 if stats["seconds"] else 0
+    print(f"Analysed {stats['sessions']} sessions ({stats['analyses']} analyses, "
+          f"{stats['failures']} failed) in {stats['seconds']:.2f}s ({rate:.0f} sessions/min)")
+    print(f"Wrote {args.out / 'sessions.csv'} and {args.out / 'reps.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Keypoint Smoothing
+One Euro and moving-average filters, both as per-sample filter objects and as
+array filters over whole (frames, channels) signals.
+
+The array filters reproduce the per-sample filters bit for bit. The One Euro
+recurrence keeps its state in plain floats per channel (or, for wide signals,
+steps every channel at once per frame) with the derivative smoothing factor
+computed once, and the moving average sums each window in the same order
+np.mean does (a running cumulative sum would be cheaper but rounds differently).
+"""
+
+import numpy as np
+
+from .pose_sequence import PoseSequence
+
+
+class OneEuroFilter:
+    """
+    One Euro Filter for smooth keypoint tracking
+    Reference: https://gery.casiez.net/1euro/
+    """
+
+    def __init__(self, freq=30, mincutoff=1.0, beta=0.007, dcutoff=1.0):
+        """
+        Args:
+            freq: Sampling frequency (Hz)
+            mincutoff: Minimum cutoff frequency
+            beta: Cutoff slope
+            dcutoff: Cutoff frequency for derivative
+        """
+        self.freq = freq
+        self.mincutoff = mincutoff
+        self.beta = beta
+        self.dcutoff = dcutoff
+        self.x_prev = None
+        self.dx_prev = 0.0
+        # The derivative cutoff is fixed, so its smoothing factor is too
+        self._alpha_d = self._smoothing_factor(dcutoff)
+
+    def __call__(self, x):
+        """Apply filter to new value"""
+        if self.x_prev is None:
+            self.x_prev = x
+            return x
+
+        # Estimate derivative
+        dx = (x - self.x_prev) * self.freq
+        edx = self._alpha_d * dx + (1 - self._alpha_d) * self.dx_prev
+
+        # Calculate cutoff
+        cutoff = self.mincutoff + self.beta * abs(edx)
+
+        # Filter the signal
+        alpha = self._smoothing_factor(cutoff)
+        result = alpha * x + (1 - alpha) * self.x_prev
+
+        # Update state
+        self.x_prev = result
+        self.dx_prev = edx
+
+        return result
+
+    def _smoothing_factor(self, cutoff):
+        """Calculate smoothing factor"""
+        tau = 1.0 / (2 * np.pi * cutoff)
+        te = 1.0 / self.freq
+        return 1.0 / (1.0 + tau / te)
+
+
+class MovingAverageFilter:
+    """Simple moving average filter for keypoint smoothing"""
+
+    def __init__(self, window_size=5):
+        self.window_size = window_size
+        self.buffer = []
+
+    def __call__(self, x):
+        """Apply moving average to new value"""
+        self.buffer.append(x)
+        if len(self.buffer) > self.window_size:
+            self.buffer.pop(0)
+        return np.mean(self.buffer)
+
+
+# Below this many channels one_euro_filter runs each channel as a plain float loop
+_SCALAR_CHANNELS = 64
+
+
+def _one_euro_scalar(values, freq, te, mincutoff, beta, alpha_d):
+    """One Euro recurrence over one channel of Python floats (same operations as OneEuroFilter)"""
+    out = [values[0]]
+    x_prev = values[0]
+    dx_prev = 0.0
+    for x in values[1:]:
+        dx = (x - x_prev) * freq
+        edx = alpha_d * dx + (1 - alpha_d) * dx_prev
+        cutoff = mincutoff + beta * abs(edx)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        alpha = 1.0 / (1.0 + tau / te)
+        x_prev = alpha * x + (1 - alpha) * x_prev
+        dx_prev = edx
+        out.append(x_prev)
+    return out
+
+
+def one_euro_filter(signal: np.ndarray, freq=30, mincutoff=1.0, beta=0.007, dcutoff=1.0) -> np.ndarray:
+    """
+    One Euro filter every channel of a signal at once
+
+    Args:
+        signal: Array (frames,) or (frames, channels)
+        freq, mincutoff, beta, dcutoff: As for OneEuroFilter
+
+    Returns:
+        Filtered float64 array of the same shape, identical to running one
+        OneEuroFilter per channel
+    """
+    x = np.asarray(signal, dtype=np.float64)
+    out = np.empty_like(x)
+    if len(x) == 0:
+        return out
+
+    te = 1.0 / freq
+    alpha_d = OneEuroFilter(freq, mincutoff, beta, dcutoff)._alpha_d
+
+    if x.ndim == 1 or x.shape[1] <= _SCALAR_CHANNELS:
+        # Few channels: per-frame array overhead outweighs the arithmetic
+        columns = x.reshape(len(x), -1).T
+        filtered = [_one_euro_scalar(c.tolist(), freq, te, mincutoff, beta, alpha_d) for c in columns]
+        return np.array(filtered, dtype=np.float64).T.reshape(x.shape)
+
+    out[0] = x[0]
+    x_prev = out[0]
+    dx_prev = np.zeros_like(x[0])
+    for i in range(1, len(x)):
+        dx = (x[i] - x_prev) * freq
+        edx = alpha_d * dx + (1 - alpha_d) * dx_prev
+        cutoff = mincutoff + beta * np.abs(edx)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        alpha = 1.0 / (1.0 + tau / te)
+        out[i] = alpha * x[i] + (1 - alpha) * x_prev
+        x_prev = out[i]
+        dx_prev = edx
+
+    return out
+
+
+def moving_average_filter(signal: np.ndarray, window_size=5) -> np.ndarray:
+    """
+    Trailing moving average of every channel of a signal at once
+
+    The first window_size - 1 frames average over the frames seen so far,
+    as MovingAverageFilter does.
+
+    Args:
+        signal: Array (frames,) or (frames, channels)
+        window_size: Samples per window
+
+    Returns:
+        Filtered float64 array of the same shape
+    """
+    x = np.asarray(signal, dtype=np.float64)
+    n = len(x)
+    if n == 0:
+        return np.empty_like(x)
+
+    # Oldest sample first, matching the summation order of np.mean on the buffer;
+    # leading zero padding leaves the partial-window sums unchanged
+    padded = np.concatenate([np.zeros((window_size - 1,) + x.shape[1:]), x])
+    total = np.zeros_like(x)
+    for k in range(window_size):
+        total += padded[k:k + n]
+
+    count = np.minimum(np.arange(1, n + 1), window_size).astype(np.float64)
+    return total / count.reshape((n,) + (1,) * (x.ndim - 1))
+
+
+def smooth(signal: np.ndarray, fps=30, filter_type='one_euro') -> np.ndarray:
+    """
+    Smooth a (frames, channels) signal with the analyzer's filters
+
+    Args:
+        signal: Array (frames,) or (frames, channels)
+        fps: Frames per second (One Euro sampling frequency)
+        filter_type: 'one_euro' or 'moving_average'
+    """
+    if filter_type == 'one_euro':
+        return one_euro_filter(signal, freq=fps)
+    return moving_average_filter(signal, window_size=5)
+
+
+def smooth_keypoints(sequence: PoseSequence, fps=30, filter_type='one_euro') -> PoseSequence:
+    """
+    Smooth the x, y track of every keypoint in a sequence
+
+    Confidences are kept as they are and mid-hip/mid-shoulder are re-derived
+    from the smoothed points.
+    """
+    frames, keypoints, _ = sequence.data.shape
+    data = sequence.data.copy()
+    xy = sequence.data[:, :, :2].reshape(frames, keypoints * 2)
+    data[:, :, :2] = smooth(xy, fps, filter_type).reshape(frames, keypoints, 2)
+    return PoseSequence(data, detected=sequence.detected)
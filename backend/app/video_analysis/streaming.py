@@ -0,0 +1,242 @@
+"""
+Streaming Sit-to-Stand Analysis
+Consumes pose frames as they come off the pose stage and emits each
+repetition, fully analyzed, as soon as the patient is seated again.
+
+Differences from the batch SitToStandAnalyzer:
+- Standing/sitting heights are running 5th/95th percentiles of the smoothed
+  hip height (P² estimator), and the maximum trunk height is a running
+  maximum, so the first repetition can segment slightly differently than a
+  batch pass over the whole clip.
+- Only the frames of the repetition in progress are kept. In the job
+  pipeline it runs alongside the full PoseSequence, which the batch
+  SitToStandAnalyzer still analyses for the final results, so it does not
+  lower peak memory; its repetitions are provisional and can differ from
+  the final ones.
+"""
+
+from collections import deque
+from dataclasses import fields, replace
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from .analyzer import SitToStandAnalyzer, RepetitionSegmenter, Repetition, ClinicalMetrics
+from .pose_sequence import PoseSequence, KEYPOINT_INDEX
+from .smoothing import OneEuroFilter, MovingAverageFilter
+
+
+# Repetition fields holding frame indices (shifted between clip and window coordinates)
+_FRAME_FIELDS = tuple(f.name for f in fields(Repetition) if f.name.endswith('_frame'))
+
+_MID_HIP = KEYPOINT_INDEX['mid_hip']
+_MID_SHOULDER = KEYPOINT_INDEX['mid_shoulder']
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate in constant memory
+    Reference: Jain & Chlamtac (1985), the P² algorithm
+    """
+
+    def __init__(self, p: float):
+        """
+        Args:
+            p: Quantile to track (0-1)
+        """
+        self.p = p
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float):
+        self.count += 1
+        q = self._heights
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        # Cell containing x (extending the extremes if needed)
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        n = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    @property
+    def value(self) -> Optional[float]:
+        """Current estimate (exact while five or fewer samples have been seen)"""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return float(np.percentile(self._heights, self.p * 100))
+        return self._heights[2]
+
+
+class StreamingSitToStandAnalyzer:
+    """Incremental sit-to-stand analysis, one repetition at a time"""
+
+    def __init__(
+        self,
+        fps=30,
+        filter_type='one_euro',
+        enable_validators=True,
+        max_window_frames: Optional[int] = None,
+        on_repetition: Optional[Callable[[int, Repetition], None]] = None,
+    ):
+        """
+        Args:
+            fps: Frames per second of video
+            filter_type: 'one_euro' or 'moving_average'
+            enable_validators: Enable per-repetition posture validation
+            max_window_frames: Most frames kept for the repetition in progress
+                (default: 60 seconds); a longer sitting phase is trimmed from the front
+            on_repetition: Optional callable(rep_number, repetition) run as each
+                repetition completes (rep_number starts at 1)
+        """
+        self.analyzer = SitToStandAnalyzer(fps=fps, filter_type=filter_type, enable_validators=enable_validators)
+        self.segmenter = RepetitionSegmenter(self.analyzer.VELOCITY_THRESHOLD)
+        self.max_window_frames = max_window_frames or int(60 * fps)
+        self.on_repetition = on_repetition
+
+        if filter_type == 'one_euro':
+            self._filter_x = OneEuroFilter(freq=fps)
+            self._filter_y = OneEuroFilter(freq=fps)
+        else:  # moving_average
+            self._filter_x = MovingAverageFilter(window_size=5)
+            self._filter_y = MovingAverageFilter(window_size=5)
+
+        # Running calibration
+        self._stand_y = P2Quantile(0.05)  # Standing: lower Y-coordinate (higher in image)
+        self._sit_y = P2Quantile(0.95)    # Sitting: higher Y-coordinate (lower in image)
+        self._max_trunk_height: Optional[float] = None
+
+        self.frames_seen = 0
+        self.repetitions: List[Repetition] = []
+        self._last_hip = (0.0, 0.0)
+        self._prev_y: Optional[float] = None
+
+        # Frames of the repetition in progress; _window_start is the first one's clip index
+        self._rows: deque = deque()
+        self._detected: deque = deque()
+        self._phases: deque = deque()
+        self._window_start = 0
+
+    @property
+    def max_trunk_height(self) -> float:
+        return self._max_trunk_height if self._max_trunk_height is not None else 200  # Default fallback
+
+    def push(self, frames: PoseSequence) -> List[Repetition]:
+        """
+        Feed the next frames of the clip
+
+        Args:
+            frames: PoseSequence of one or more consecutive frames
+
+        Returns:
+            Repetitions completed (and analyzed) within these frames
+        """
+        completed = []
+        for i in range(len(frames)):
+            rep = self._step(frames.data[i], bool(frames.detected[i]))
+            if rep is not None:
+                completed.append(rep)
+        return completed
+
+    def finish(self) -> ClinicalMetrics:
+        """Aggregate metrics over every completed repetition (an unfinished one is dropped)"""
+        return self.analyzer.summarize(self.repetitions)
+
+    def _step(self, row: np.ndarray, detected: bool) -> Optional[Repetition]:
+        frame = self.frames_seen
+        self.frames_seen += 1
+
+        # Mid-hip, holding the last confident position
+        mid_hip = row[_MID_HIP]
+        if mid_hip[2] > 0.3:
+            self._last_hip = (float(mid_hip[0]), float(mid_hip[1]))
+        self._filter_x(self._last_hip[0])
+        hip_y = float(self._filter_y(self._last_hip[1]))
+        velocity = hip_y - self._prev_y if self._prev_y is not None else 0
+        self._prev_y = hip_y
+
+        self._stand_y.add(hip_y)
+        self._sit_y.add(hip_y)
+
+        mid_shoulder = row[_MID_SHOULDER]
+        if mid_hip[2] > 0.3 and mid_shoulder[2] > 0.3:
+            trunk_height = abs(float(mid_shoulder[1]) - float(mid_hip[1]))
+            if self._max_trunk_height is None or trunk_height > self._max_trunk_height:
+                self._max_trunk_height = trunk_height
+
+        rep = self.segmenter.step(frame, hip_y, velocity, self._stand_y.value, self._sit_y.value)
+
+        self._rows.append(row.copy())
+        self._detected.append(detected)
+        self._phases.append(self.segmenter.state)
+
+        if rep is not None:
+            rep = self._analyze(rep)
+            self.repetitions.append(rep)
+            if self.on_repetition is not None:
+                self.on_repetition(len(self.repetitions), rep)
+
+        # Keep only the repetition in progress (bounded by max_window_frames)
+        keep_from = max(self.segmenter.sitting_start_frame, frame + 1 - self.max_window_frames)
+        while self._window_start < keep_from:
+            self._rows.popleft()
+            self._detected.popleft()
+            self._phases.popleft()
+            self._window_start += 1
+
+        return rep
+
+    def _analyze(self, rep: Repetition) -> Repetition:
+        """Run the batch per-repetition analysis on the buffered window"""
+        offset = self._window_start
+        window = PoseSequence(np.stack(self._rows), detected=np.fromiter(self._detected, dtype=bool))
+
+        # Window-relative copy of the repetition (a trimmed sitting phase starts at the window)
+        local = replace(rep, **{
+            name: max(getattr(rep, name) - offset, 0)
+            for name in _FRAME_FIELDS if getattr(rep, name) is not None
+        })
+
+        self.analyzer.frame_phases = list(self._phases)
+        self.analyzer.max_trunk_height = self.max_trunk_height
+        local = self.analyzer.analyze_repetition(window, local)
+
+        # Back to clip frame indices
+        return replace(local, **{name: getattr(rep, name) for name in _FRAME_FIELDS})
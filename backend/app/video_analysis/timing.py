@@ -0,0 +1,115 @@
+"""
+Per-Stage Timing
+StageTimer accumulates wall time per named pipeline stage (decode, colour
+convert, inference, adapter, smoothing, calibration, segmentation, validation,
+biomechanics) for one analysis; the totals go into the results under
+"diagnostics".
+
+StageHistograms aggregates those totals over all analyses in the API process
+and renders them in the Prometheus text exposition format for /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+class StageTimer:
+    """
+    Wall time per stage, safe to use from several threads
+
+    Stages nest: time spent in an inner stage is counted for the inner stage
+    only (self time), so e.g. validation run inside biomechanics is not
+    counted twice. Stages on different threads (the decoder runs alongside
+    inference) overlap, so their sum can exceed the wall time.
+    """
+
+    def __init__(self):
+        self._seconds: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        # Each open stage collects the time of its children to subtract
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add(name, elapsed - children)
+
+    def add(self, name: str, seconds: float, calls: int = 1):
+        with self._lock:
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+            self._calls[name] = self._calls.get(name, 0) + calls
+
+    def to_dict(self) -> Dict:
+        """{"wall_seconds": float, "stages": {name: {"seconds": float, "calls": int}}}"""
+        with self._lock:
+            stages = {
+                name: {"seconds": round(seconds, 4), "calls": self._calls[name]}
+                for name, seconds in self._seconds.items()
+            }
+        return {"wall_seconds": round(time.perf_counter() - self._started, 4), "stages": stages}
+
+
+# Histogram bucket upper bounds (seconds)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class StageHistograms:
+    """Prometheus-style histograms of per-analysis stage totals"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # metric name -> label value -> (bucket counts, sum, count)
+        self._series: Dict[str, Dict[str, List]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, label: str, seconds: float):
+        with self._lock:
+            series = self._series.setdefault(metric, {})
+            counts, total, count = series.get(label) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            series[label] = [counts, total + seconds, count + 1]
+
+    def observe_diagnostics(self, diagnostics: Optional[Dict]):
+        """Record the StageTimer.to_dict() output of one analysis"""
+        if not diagnostics or "stages" not in diagnostics:
+            return
+        for stage, timing in diagnostics["stages"].items():
+            self.observe("sts_video_stage_seconds", stage, timing["seconds"])
+        self.observe("sts_video_analysis_seconds", diagnostics.get("cache") or "off", diagnostics["wall_seconds"])
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        help_text = {
+            "sts_video_stage_seconds": ("stage", "Time spent per pipeline stage in one video analysis"),
+            "sts_video_analysis_seconds": ("cache", "Wall time of one video analysis by cache outcome"),
+        }
+        lines = []
+        with self._lock:
+            for metric, series in sorted(self._series.items()):
+                label_name, description = help_text.get(metric, ("label", metric))
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} histogram")
+                for label, (counts, total, count) in sorted(series.items()):
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{bound}"}} {bucket_count}')
+                    lines.append(f'{metric}_bucket{{{label_name}="{label}",le="+Inf"}} {count}')
+                    lines.append(f'{metric}_sum{{{label_name}="{label}"}} {total:.6f}')
+                    lines.append(f'{metric}_count{{{label_name}="{label}"}} {count}')
+        return "\n".join(lines) + "\n"
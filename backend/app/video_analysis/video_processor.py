@@ -3,48 +3,97 @@ Video Processor for Sit-to-Stand Analysis (MediaPipe Version)
 Handles video processing with MediaPipe Pose Landmarker
 """
 
+import logging
+
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict
+from typing import Callable, List, Tuple, Optional, Dict
+import shutil
 import time
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 from mediapipe.tasks.python.vision.core import image as mp_image
 import urllib.request
 
-from .pose_engine import StandardBody, PoseAdapter
-from .analyzer import SitToStandAnalyzer
+from .analyzer import SitToStandAnalyzer, Repetition
+from .archive import write_archive
+from .cache import AnalysisCache, cache_keys, hash_file
+from .preprocessing import FramePreprocessor
+from .pipeline import FrameDecoder, SequenceAssembler
+from .pose_sequence import PoseSequence
+from .streaming import StreamingSitToStandAnalyzer
+from .timing import StageTimer
+from .sampling import (
+    SamplingConfig, interpolate_keypoints,
+    plan_fine_windows, window_frame_mask,
+)
+
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "pose_landmarker_heavy.task"
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_heavy/float16/latest/pose_landmarker_heavy.task"
+
+# Socket timeout of the model download (connect and each read)
+MODEL_DOWNLOAD_TIMEOUT_SECONDS = 30
 
 
-def download_model_if_needed(model_dir: Path) -> str:
+def download_model_if_needed(model_dir: Path, timeout: float = MODEL_DOWNLOAD_TIMEOUT_SECONDS) -> str:
     """Download MediaPipe Pose Landmarker Heavy model if not present
 
     Args:
         model_dir: Directory to store the model
+        timeout: Socket timeout of the download (seconds)
 
     Returns:
         Path to model file
     """
-    model_name = "pose_landmarker_heavy.task"
-    model_url = "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_heavy/float16/latest/pose_landmarker_heavy.task"
-
     model_dir.mkdir(parents=True, exist_ok=True)
-    model_path = model_dir / model_name
+    model_path = model_dir / MODEL_NAME
 
     if not model_path.exists():
-        print(f"Downloading {model_name}...")
-        urllib.request.urlretrieve(model_url, model_path)
-        print(f"Model downloaded to {model_path}")
+        logger.info("Downloading %s...", MODEL_NAME)
+        # Download to a temp name so an interrupted transfer never looks like a model
+        partial_path = model_path.with_suffix(".part")
+        with urllib.request.urlopen(MODEL_URL, timeout=timeout) as response, open(partial_path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        partial_path.replace(model_path)
+        logger.info("Model downloaded to %s", model_path)
 
     return str(model_path)
 
 
-def init_mediapipe_pose(model_path: str):
+def verify_model(model_dir: Path) -> str:
+    """Make sure the pose model is present and readable (run once at startup)
+
+    Args:
+        model_dir: Directory to store the model
+
+    Returns:
+        Path to model file
+
+    Raises:
+        RuntimeError: If the model cannot be downloaded or is empty
+    """
+    try:
+        model_path = download_model_if_needed(model_dir)
+    except Exception as e:
+        raise RuntimeError(f"Could not download {MODEL_NAME}: {e}") from e
+
+    if Path(model_path).stat().st_size == 0:
+        raise RuntimeError(f"Model file is empty: {model_path}")
+    return model_path
+
+
+def init_mediapipe_pose(model_path: str, result_callback: Optional[Callable] = None):
     """Initialize MediaPipe Pose Landmarker (Heavy)
 
     Args:
         model_path: Path to the model file
+        result_callback: When given, the landmarker runs in LIVE_STREAM mode and
+            delivers results to callable(result, image, timestamp_ms) instead of
+            VIDEO mode
 
     Returns:
         MediaPipe PoseLandmarker instance
@@ -52,79 +101,184 @@ def init_mediapipe_pose(model_path: str):
     base_options = python.BaseOptions(model_asset_path=model_path)
     options = vision.PoseLandmarkerOptions(
         base_options=base_options,
-        running_mode=vision.RunningMode.VIDEO,
+        running_mode=vision.RunningMode.VIDEO if result_callback is None else vision.RunningMode.LIVE_STREAM,
         num_poses=1,
         min_pose_detection_confidence=0.5,
         min_pose_presence_confidence=0.5,
-        min_tracking_confidence=0.5
+        min_tracking_confidence=0.5,
+        result_callback=result_callback,
     )
 
     landmarker = vision.PoseLandmarker.create_from_options(options)
     return landmarker
 
 
-def process_mediapipe_frame(landmarker, frame, timestamp_ms):
+def process_mediapipe_frame(
+    landmarker, frame, timestamp_ms, preprocessor: Optional[FramePreprocessor] = None,
+    timer: Optional[StageTimer] = None,
+):
     """Process a frame with MediaPipe Pose Landmarker
 
     Args:
         landmarker: MediaPipe PoseLandmarker instance
         frame: Input frame (BGR format)
         timestamp_ms: Frame timestamp in milliseconds
+        preprocessor: Optional FramePreprocessor that downscales the frame into a
+            reused RGB buffer; landmarks are mapped back to original pixels
+        timer: Optional StageTimer receiving the colour_convert, inference and adapter stages
 
     Returns:
         Tuple of (keypoints, scores) or (None, None) if no detection
     """
-    # Convert BGR to RGB
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if preprocessor is None:
+        preprocessor = FramePreprocessor()
+    if timer is None:
+        timer = StageTimer()
+
+    # Convert BGR to RGB (downscaled to the inference size)
+    with timer.stage("colour_convert"):
+        frame_rgb = preprocessor.prepare(frame)
 
-    # Create MediaPipe Image
-    mediapipe_image = mp_image.Image(image_format=mp_image.ImageFormat.SRGB, data=frame_rgb)
+    with timer.stage("inference"):
+        # Create MediaPipe Image
+        mediapipe_image = mp_image.Image(image_format=mp_image.ImageFormat.SRGB, data=frame_rgb)
 
-    # Process the frame
-    results = landmarker.detect_for_video(mediapipe_image, timestamp_ms)
+        # Process the frame
+        results = landmarker.detect_for_video(mediapipe_image, timestamp_ms)
 
     if not results.pose_landmarks or len(results.pose_landmarks) == 0:
         return None, None
 
-    # Extract keypoints and visibility scores from first detected pose
-    h, w, _ = frame.shape
-    keypoints = []
-    scores = []
+    with timer.stage("adapter"):
+        # Extract keypoints and visibility scores from first detected pose
+        landmarks = np.array(
+            [(landmark.x, landmark.y, landmark.visibility) for landmark in results.pose_landmarks[0]],
+            dtype=np.float32,
+        )
 
-    for landmark in results.pose_landmarks[0]:
-        # Convert normalized coordinates to pixel coordinates
-        x = landmark.x * w
-        y = landmark.y * h
-        visibility = landmark.visibility
+        # Convert normalized coordinates to original pixel coordinates
+        keypoints = preprocessor.to_original(landmarks[:, :2])
+        scores = landmarks[:, 2].copy()
 
-        keypoints.append([x, y])
-        scores.append(visibility)
+    return keypoints, scores
 
-    keypoints = np.array(keypoints, dtype=np.float32)
-    scores = np.array(scores, dtype=np.float32)
 
-    return keypoints, scores
+class LandmarkerSession:
+    """Long-lived VIDEO-mode landmarker reused across clips
 
+    MediaPipe requires strictly increasing timestamps for the lifetime of a
+    VIDEO-mode landmarker, so every clip is shifted onto a fresh timestamp
+    range (begin_clip) instead of restarting at 0, with a gap in between so
+    temporal landmark smoothing does not bridge two clips.
+    """
 
-def process_video(video_path: Path, model_dir: Path) -> Optional[Tuple[List[StandardBody], float, Tuple[int, int]]]:
+    # Gap inserted between clips (ms)
+    CLIP_GAP_MS = 10_000
+
+    def __init__(self, model_path: str, inference_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            model_path: Path to the model file
+            inference_size: (width, height) frames are downscaled to before
+                inference, or None for native resolution
+        """
+        self.model_path = model_path
+        self.landmarker = init_mediapipe_pose(model_path)
+        self.preprocessor = FramePreprocessor(inference_size)
+        self.clips_processed = 0
+        self._base_ms = 0
+        self._last_ms = -1
+
+    def warm_up(self):
+        """Run one blank frame through the graph so the first real clip skips initialisation"""
+        self.begin_clip()
+        blank = np.zeros((256, 256, 3), dtype=np.uint8)
+        process_mediapipe_frame(self.landmarker, blank, self._next_timestamp(0))
+
+    def begin_clip(self):
+        """Reset per-clip timestamp state before processing a new video"""
+        self._base_ms = self._last_ms + 1 + self.CLIP_GAP_MS
+
+    def detect(self, frame, frame_idx: int, fps: float, timer: Optional[StageTimer] = None):
+        """Process one frame of the current clip; see process_mediapipe_frame"""
+        # Clip-relative timestamp in milliseconds for MediaPipe
+        local_ms = int((frame_idx / fps) * 1000) if fps > 0 else frame_idx * 33
+        return process_mediapipe_frame(
+            self.landmarker, frame, self._next_timestamp(local_ms), self.preprocessor, timer
+        )
+
+    def end_clip(self):
+        self.clips_processed += 1
+
+    def close(self):
+        self.landmarker.close()
+
+    def _next_timestamp(self, local_ms: int) -> int:
+        timestamp_ms = max(self._base_ms + local_ms, self._last_ms + 1)
+        self._last_ms = timestamp_ms
+        return timestamp_ms
+
+
+def process_video(
+    video_path: Path,
+    model_dir: Path,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    session: Optional[LandmarkerSession] = None,
+    sampling: Optional[SamplingConfig] = None,
+    inference_size: Optional[Tuple[int, int]] = None,
+    repetition_callback: Optional[Callable[[int, Repetition], None]] = None,
+    timer: Optional[StageTimer] = None,
+) -> Optional[Tuple[PoseSequence, float, Tuple[int, int]]]:
     """Process video using MediaPipe Pose Landmarker (Heavy)
 
     Args:
         video_path: Path to the video file
         model_dir: Directory containing the MediaPipe model
+        progress_callback: Optional callable(frame_idx, frame_count) invoked after each frame
+        session: Pre-initialised LandmarkerSession to reuse; when omitted a
+            landmarker is loaded for this video and closed afterwards
+        sampling: Frame sampling mode (default: inference on every frame);
+            see sampling.py for the adaptive mode
+        inference_size: (width, height) to downscale frames to when no session
+            is passed (default: native resolution)
+        repetition_callback: Optional callable(rep_number, repetition) invoked as
+            each repetition completes during extraction (provisional streaming
+            analysis; full sampling only, since adaptive mode does not see
+            frames in order)
+        timer: Optional StageTimer receiving the decode, colour_convert,
+            inference and adapter stages
 
     Returns:
-        Tuple of (bodies, fps, dimensions) or None if processing fails
+        Tuple of (PoseSequence, fps, dimensions) or None if processing fails
     """
-    print(f"Loading MediaPipe Pose Landmarker (Heavy)...")
-    model_path = download_model_if_needed(model_dir)
-    landmarker = init_mediapipe_pose(model_path)
-
-    print(f"Opening video: {video_path}")
+    if timer is None:
+        timer = StageTimer()
+    owns_session = session is None
+    if owns_session:
+        logger.info("Loading MediaPipe Pose Landmarker (Heavy)...")
+        session = LandmarkerSession(download_model_if_needed(model_dir), inference_size)
+
+    try:
+        if sampling is not None and sampling.is_adaptive:
+            return _extract_poses_adaptive(video_path, session, progress_callback, sampling, timer)
+        return _extract_poses(video_path, session, progress_callback, repetition_callback, timer)
+    finally:
+        if owns_session:
+            session.close()
+
+
+def _extract_poses(
+    video_path: Path,
+    session: LandmarkerSession,
+    progress_callback: Optional[Callable[[int, int], None]],
+    repetition_callback: Optional[Callable[[int, Repetition], None]] = None,
+    timer: Optional[StageTimer] = None,
+) -> Optional[Tuple[PoseSequence, float, Tuple[int, int]]]:
+    logger.debug("Opening video: %s", video_path)
     cap = cv2.VideoCapture(str(video_path))
 
     if not cap.isOpened():
-        print(f"ERROR: Could not open video: {video_path}")
+        logger.error("Could not open video: %s", video_path)
         return None
 
     fps = cap.get(cv2.CAP_PROP_FPS)
@@ -132,86 +286,319 @@ def process_video(video_path: Path, model_dir: Path) -> Optional[Tuple[List[Stan
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    print(f"Video: {width}x{height} @ {fps:.1f}fps, {frame_count} frames")
+    logger.info("Video: %dx%d @ %.1ffps, %d frames", width, height, fps, frame_count)
+    start_time = time.time()
 
-    bodies = []
-    adapter = PoseAdapter.create("mediapipe")
+    # Decoding runs ahead on its own thread; inference stays here, in frame order
+    decoder = FrameDecoder(cap, timer=timer)
+    stream = None
+    if repetition_callback is not None:
+        stream = StreamingSitToStandAnalyzer(fps=fps if fps > 0 else 30, on_repetition=repetition_callback)
+    assembler = SequenceAssembler(capacity=frame_count, stream=stream, timer=timer)
+
+    session.begin_clip()
+    try:
+        for frame_idx, frame in decoder:
+            # Process frame with MediaPipe
+            keypoints, scores = session.detect(frame, frame_idx, fps, timer)
+            assembler.submit(keypoints, scores)
+
+            if progress_callback is not None:
+                progress_callback(frame_idx + 1, frame_count)
+    finally:
+        decoder.close()
+        cap.release()
+        bodies = assembler.finish()
+    session.end_clip()
 
-    print("Processing frames...")
-    start_time = time.time()
+    elapsed_time = time.time() - start_time
+    logger.info("Processed %d frames in %.2fs (%.2f fps)", len(bodies), elapsed_time, len(bodies) / elapsed_time)
 
-    frame_idx = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Calculate timestamp in milliseconds for MediaPipe
-        timestamp_ms = int((frame_idx / fps) * 1000) if fps > 0 else frame_idx * 33
-
-        # Process frame with MediaPipe
-        keypoints, scores = process_mediapipe_frame(landmarker, frame, timestamp_ms)
-
-        if keypoints is not None:
-            body = adapter.to_standard(keypoints, scores)
-        else:
-            # Create empty body for frames without detection
-            body = StandardBody(
-                nose=(0, 0, 0),
-                l_shoulder=(0, 0, 0),
-                r_shoulder=(0, 0, 0),
-                l_hip=(0, 0, 0),
-                r_hip=(0, 0, 0),
-                l_knee=(0, 0, 0),
-                r_knee=(0, 0, 0),
-                l_ankle=(0, 0, 0),
-                r_ankle=(0, 0, 0)
-            )
+    # Handle case where fps is 0
+    if fps == 0:
+        logger.warning("Video FPS is 0, defaulting to 30. Analysis may be inaccurate.")
+        fps = 30
+
+    return bodies, fps, (width, height)
 
-        bodies.append(body)
-        frame_idx += 1
 
-    cap.release()
-    landmarker.close()
+def _extract_poses_adaptive(
+    video_path: Path,
+    session: LandmarkerSession,
+    progress_callback: Optional[Callable[[int, int], None]],
+    sampling: SamplingConfig,
+    timer: Optional[StageTimer] = None,
+) -> Optional[Tuple[PoseSequence, float, Tuple[int, int]]]:
+    """Coarse pass every `stride` frames, then full rate inside ascending windows"""
+    logger.debug("Opening video: %s", video_path)
+    cap = cv2.VideoCapture(str(video_path))
+
+    if not cap.isOpened():
+        logger.error("Could not open video: %s", video_path)
+        return None
 
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    logger.info("Video: %dx%d @ %.1ffps, %d frames (adaptive sampling, stride %d)",
+                width, height, fps, frame_count, sampling.stride)
+    start_time = time.time()
+
+    # Progress covers both passes over the file
+    progress_total = 2 * frame_count
+
+    # Pass 1: coarse inference, skipped frames are only grabbed (no colour conversion)
+    rows = {}
+    decoder = FrameDecoder(cap, wanted=lambda idx: idx % sampling.stride == 0, timer=timer)
+    session.begin_clip()
+    try:
+        for frame_idx, frame in decoder:
+            rows[frame_idx] = _keypoint_row(session.detect(frame, frame_idx, fps, timer))
+
+            if progress_callback is not None:
+                progress_callback(frame_idx + 1, progress_total)
+    finally:
+        decoder.close()
+        cap.release()
+
+    num_frames = decoder.frames_decoded
+    if num_frames == 0:
+        session.end_clip()
+        logger.error("No frames decoded from video: %s", video_path)
+        return None
+
+    effective_fps = fps if fps > 0 else 30
+    with timer.stage("adapter"):
+        sampled = np.zeros(num_frames, dtype=bool)
+        samples = np.zeros((num_frames,) + _EMPTY_ROW.shape, dtype=np.float32)
+        for frame_idx, row in rows.items():
+            sampled[frame_idx] = True
+            samples[frame_idx] = row
+        keypoints = interpolate_keypoints(samples, sampled)
+
+    with timer.stage("sampling_plan"):
+        windows = plan_fine_windows(PoseSequence.from_mediapipe(keypoints), effective_fps, sampling)
+        fine = window_frame_mask(num_frames, windows)
+
+    # Pass 2: full-rate inference inside ascending windows, each window starts a fresh clip
+    if windows:
+        cap = cv2.VideoCapture(str(video_path))
+        decoder = FrameDecoder(cap, wanted=lambda idx: fine[idx], stop_at=windows[-1][1], timer=timer)
+        window_starts = {start for start, _ in windows}
+        try:
+            for frame_idx, frame in decoder:
+                if frame_idx in window_starts:
+                    session.begin_clip()
+                keypoints[frame_idx] = _keypoint_row(session.detect(frame, frame_idx, fps, timer))
+
+                if progress_callback is not None:
+                    progress_callback(num_frames + frame_idx + 1, progress_total)
+        finally:
+            decoder.close()
+            cap.release()
+
+    session.end_clip()
+    if progress_callback is not None:
+        progress_callback(progress_total, progress_total)
+
+    with timer.stage("adapter"):
+        bodies = PoseSequence.from_mediapipe(keypoints)
+
+    inferred = int(sampled.sum() + fine.sum())
     elapsed_time = time.time() - start_time
-    print(f"Processed {len(bodies)} frames in {elapsed_time:.2f}s ({len(bodies)/elapsed_time:.2f} fps)")
+    logger.info("Processed %d frames in %.2fs (inferred %d/%d frames, %d ascending windows)",
+                num_frames, elapsed_time, inferred, num_frames, len(windows))
 
     # Handle case where fps is 0
     if fps == 0:
-        print("WARNING: Video FPS is 0, defaulting to 30. Analysis may be inaccurate.")
+        logger.warning("Video FPS is 0, defaulting to 30. Analysis may be inaccurate.")
         fps = 30
 
     return bodies, fps, (width, height)
 
 
-def analyze_video(video_path: Path, model_dir: Path) -> Optional[Dict]:
+# Keypoint row for frames without a detection (33 MediaPipe landmarks, x/y/confidence)
+_EMPTY_ROW = np.zeros((33, 3), dtype=np.float32)
+
+
+def _keypoint_row(detection) -> np.ndarray:
+    """(keypoints, scores) from process_mediapipe_frame -> (33, 3) row"""
+    keypoints, scores = detection
+    if keypoints is None:
+        return _EMPTY_ROW
+    return np.column_stack([keypoints, scores]).astype(np.float32)
+
+
+def repetition_to_dict(rep_count: int, rep: Repetition) -> Dict:
+    """Per-repetition entry of the analysis results"""
+    rep_data = {
+        "rep_count": rep_count,
+        "metrics": {
+            "validity": "valid" if rep.is_clinically_valid else "invalid",
+            "trunk_sway_sd": round(rep.trunk_sway_std, 2) if rep.trunk_sway_std is not None else None,
+            "hip_sway_sd": round(rep.hip_sway_std, 2) if rep.hip_sway_std is not None else None,
+            "fppa_peak_valgus_angle": round(rep.peak_valgus_angle, 2) if rep.peak_valgus_angle is not None else None
+        }
+    }
+
+    if not rep.is_clinically_valid:
+        rep_data["validation_failures"] = rep.validator_failures
+
+    return rep_data
+
+
+def analyze_video(
+    video_path: Path,
+    model_dir: Path,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    session: Optional[LandmarkerSession] = None,
+    sampling: Optional[SamplingConfig] = None,
+    inference_size: Optional[Tuple[int, int]] = None,
+    repetition_callback: Optional[Callable[[int, Repetition], None]] = None,
+    cache: Optional[AnalysisCache] = None,
+    content_hash: Optional[str] = None,
+    archive_path: Optional[Path] = None,
+    archive_dtype: str = "float32",
+    timer: Optional[StageTimer] = None,
+) -> Optional[Dict]:
     """
     Complete video analysis pipeline
 
     Args:
         video_path: Path to the video file
         model_dir: Directory containing the MediaPipe model
+        progress_callback: Optional callable(frame_idx, frame_count) for pose extraction progress
+        session: Optional pre-initialised LandmarkerSession (see process_video)
+        sampling: Optional frame sampling mode (see process_video)
+        inference_size: Optional inference resolution when no session is passed
+        repetition_callback: Optional provisional per-repetition callback (see process_video)
+        cache: Optional AnalysisCache; cached results are returned as they are,
+            cached keypoints skip pose inference and only rerun the analyzer
+        content_hash: SHA-256 of the video file (computed here if a cache is
+            given without one)
+        archive_path: Optional file the clip's keypoints are saved to as a
+            keypoint archive (see archive.py), named in the results
+        archive_dtype: Keypoint precision of the archive ('float32' or 'float16')
+        timer: Optional StageTimer for the per-stage timings (default: a new one)
 
     Returns:
-        Dictionary containing analysis results, or None if processing fails
+        Dictionary containing analysis results, with per-stage timings under
+        "diagnostics", or None if processing fails
     """
+    if timer is None:
+        timer = StageTimer()
+    if session is not None:
+        inference_size = session.preprocessor.inference_size
+
+    keypoints_key = results_key = None
+    if cache is not None:
+        with timer.stage("cache"):
+            keypoints_key, results_key = cache_keys(
+                content_hash or hash_file(video_path), MODEL_NAME, sampling, inference_size
+            )
+            results = cache.get_results(results_key)
+        if results is not None:
+            logger.info("Analysis cache hit: %s", video_path.name)
+            results["video_name"] = video_path.name
+            results["diagnostics"] = {"cache": "results", **timer.to_dict()}
+            return results
+        with timer.stage("cache"):
+            cached = cache.get_keypoints(keypoints_key)
+        if cached is not None:
+            logger.info("Keypoint cache hit: %s, skipping pose inference", video_path.name)
+            results = analyze_sequence(
+                cached.sequence, cached.fps, video_path.name, sampling,
+                cached.inference_resolution, cached.inference_scale, timer,
+            )
+            with timer.stage("storage"):
+                if archive_path is not None:
+                    write_archive(
+                        archive_path, cached.sequence, cached.fps, cached.dimensions, MODEL_NAME,
+                        cached.inference_resolution, cached.inference_scale, dtype=archive_dtype,
+                    )
+                    results["keypoint_archive"] = archive_path.name
+                cache.put_results(results_key, results)
+            results["diagnostics"] = {"cache": "keypoints", **timer.to_dict()}
+            return results
+
+    owns_session = session is None
+    if owns_session:
+        logger.info("Loading MediaPipe Pose Landmarker (Heavy)...")
+        with timer.stage("model_load"):
+            session = LandmarkerSession(download_model_if_needed(model_dir), inference_size)
+
     # Step 1: Process video to extract pose data
-    result = process_video(video_path, model_dir)
+    try:
+        result = process_video(
+            video_path, model_dir, progress_callback=progress_callback, session=session,
+            sampling=sampling, repetition_callback=repetition_callback, timer=timer,
+        )
+    finally:
+        if owns_session:
+            session.close()
     if result is None:
         return None
 
     bodies, fps, dimensions = result
+    inference_resolution = list(session.preprocessor.canvas_size or dimensions)
+    inference_scale = round(session.preprocessor.scale, 4)
 
+    results = analyze_sequence(
+        bodies, fps, video_path.name, sampling, inference_resolution, inference_scale, timer
+    )
+    with timer.stage("storage"):
+        if archive_path is not None:
+            write_archive(
+                archive_path, bodies, fps, dimensions, MODEL_NAME,
+                inference_resolution, inference_scale, dtype=archive_dtype,
+            )
+            results["keypoint_archive"] = archive_path.name
+        if cache is not None:
+            cache.put_keypoints(
+                keypoints_key, bodies, fps, dimensions, MODEL_NAME, inference_resolution, inference_scale
+            )
+            cache.put_results(results_key, results)
+    results["diagnostics"] = {"cache": "miss" if cache is not None else None, **timer.to_dict()}
+    return results
+
+
+def analyze_sequence(
+    bodies: PoseSequence,
+    fps: float,
+    video_name: str,
+    sampling: Optional[SamplingConfig],
+    inference_resolution: List[int],
+    inference_scale: float,
+    timer: Optional[StageTimer] = None,
+) -> Dict:
+    """
+    Sit-to-stand analysis of extracted keypoints, formatted as analysis results
+
+    Args:
+        bodies: Keypoints from process_video (or the keypoint cache)
+        fps: Frames per second of the video
+        video_name: File name reported in the results
+        sampling: Frame sampling mode the keypoints were extracted with
+        inference_resolution: [width, height] pose inference ran at
+        inference_scale: Inference / original resolution ratio
+        timer: Optional StageTimer receiving the analysis stages
+
+    Returns:
+        Dictionary containing analysis results
+    """
     # Step 2: Run sit-to-stand analysis
-    print("\nRunning sit-to-stand analysis...")
-    analyzer = SitToStandAnalyzer(fps=fps, filter_type='one_euro', enable_validators=True)
+    analyzer = SitToStandAnalyzer(fps=fps, filter_type='one_euro', enable_validators=True, timer=timer)
     metrics = analyzer.analyze(bodies)
 
     # Step 3: Format results
     results = {
-        "video_name": video_path.name,
+        "video_name": video_name,
         "pose_model": "MediaPipe Pose Landmarker (Heavy)",
+        "sampling_mode": "adaptive" if sampling is not None and sampling.is_adaptive else "full",
+        "inference_resolution": inference_resolution,
+        "inference_scale": inference_scale,
         "aggregate_metrics": {
             "total_reps": metrics.total_reps,
             "valid_reps": metrics.valid_reps,
@@ -227,19 +614,6 @@ def analyze_video(video_path: Path, model_dir: Path) -> Optional[Dict]:
 
     # Add per-repetition metrics
     for i, rep in enumerate(metrics.repetitions, 1):
-        rep_data = {
-            "rep_count": i,
-            "metrics": {
-                "validity": "valid" if rep.is_clinically_valid else "invalid",
-                "trunk_sway_sd": round(rep.trunk_sway_std, 2) if rep.trunk_sway_std is not None else None,
-                "hip_sway_sd": round(rep.hip_sway_std, 2) if rep.hip_sway_std is not None else None,
-                "fppa_peak_valgus_angle": round(rep.peak_valgus_angle, 2) if rep.peak_valgus_angle is not None else None
-            }
-        }
-
-        if not rep.is_clinically_valid:
-            rep_data["validation_failures"] = rep.validator_failures
-
-        results["per_rep_metrics"].append(rep_data)
+        results["per_rep_metrics"].append(repetition_to_dict(i, rep))
 
     return results
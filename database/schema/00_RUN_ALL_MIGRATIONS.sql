@@ -12,6 +12,8 @@
 -- 3. questionnaire_responses   - KOOS/WOMAC questionnaire (10-minute assessment)
 -- 4. sts_assessments          - 30-second Sit-to-Stand test results
 -- 5. exercises                - Exercise database (33 exercises)
+-- 6. llm_response_cache       - Cached LLM recommendation outputs
+-- 7. sts_assessments          - keypoint_archive column (video analysis link)
 --
 -- =====================================================================
 
@@ -24,6 +26,8 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 \i 03_create_questionnaire_responses_table.sql
 \i 04_create_sts_assessments_table.sql
 \i 05_create_exercises_table.sql
+\i 06_create_llm_response_cache_table.sql
+\i 07_add_sts_keypoint_archive.sql
 
 -- =====================================================================
 -- NEXT STEPS:
@@ -0,0 +1,26 @@
+-- =====================================================================
+-- Table: llm_response_cache
+-- Description: Cached DeepSeek recommendation outputs keyed by a hash of
+-- the patient profile, language, system prompts and model
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    response TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    last_used_at TIMESTAMPTZ NOT NULL
+);
+
+-- Indexes
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at ON llm_response_cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used_at ON llm_response_cache(last_used_at);
+
+-- Comments
+COMMENT ON TABLE llm_response_cache IS 'Deterministic (temperature 0) LLM recommendation outputs, TTL and size bounded';
+COMMENT ON COLUMN llm_response_cache.kind IS 'final (full DeepSeek response) or llm1 (LLM #1 output only)';
+COMMENT ON COLUMN llm_response_cache.response IS 'Cached output as JSON';
+COMMENT ON COLUMN llm_response_cache.last_used_at IS 'Least recently used entries are evicted first';
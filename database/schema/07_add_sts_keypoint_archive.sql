@@ -0,0 +1,9 @@
+-- =====================================================================
+-- Table: sts_assessments
+-- Description: Link video-based STS assessments to their keypoint archive
+-- =====================================================================
+
+ALTER TABLE sts_assessments ADD COLUMN IF NOT EXISTS keypoint_archive VARCHAR(64);
+
+-- Comments
+COMMENT ON COLUMN sts_assessments.keypoint_archive IS 'Keypoint archive (<job_id>.stsk) of the video analysis the results came from; NULL for manual entry';
@@ -91,6 +91,8 @@ export default function STSAssessmentPage() {
         knee_alignment: kneeAlignment,
         trunk_sway: hasTrunkSway ? 'present' : 'absent',
         hip_sway: hasHipSway ? 'present' : 'absent',
+        // Links the stored keypoints to this assessment for later re-analysis
+        keypoint_archive: analysisResult.keypoint_archive ?? null,
       });
 
       navigate('/results');
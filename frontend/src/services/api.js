@@ -60,7 +60,10 @@ export const getDeepSeekRecommendations = (username, language = 'en') => {
 
 // ── Video Analysis ──────────────────────────────────────────────────────────
 
-export function uploadVideo(videoBlob, onProgress) {
+// Poll interval while a video analysis job is queued or running
+const JOB_POLL_INTERVAL_MS = 1000;
+
+function submitVideoJob(videoBlob, onProgress) {
   return new Promise((resolve, reject) => {
     const xhr = new XMLHttpRequest();
 
@@ -71,7 +74,7 @@ export function uploadVideo(videoBlob, onProgress) {
       }
     };
 
-    // Success handler
+    // Success handler - server answers 202 with { job_id, status }
     xhr.onload = () => {
       if (xhr.status >= 200 && xhr.status < 300) {
         try {
@@ -100,10 +103,28 @@ export function uploadVideo(videoBlob, onProgress) {
     const fd = new FormData();
     fd.append('file', videoBlob, `recording${ext}`);
 
-    // POST to /video-analysis/analyze-sts-video endpoint
-    xhr.open('POST', '/api/video-analysis/analyze-sts-video');
+    // POST to /video-analysis/jobs endpoint
+    xhr.open('POST', '/api/video-analysis/jobs');
     xhr.send(fd);
   });
 }
 
+export const getVideoAnalysisJob = (jobId) =>
+  api.get(`/video-analysis/jobs/${jobId}`);
+
+/**
+ * Upload a recording and wait for its analysis job to finish.
+ * onProgress reports the upload fraction; resolves with the analysis results.
+ */
+export async function uploadVideo(videoBlob, onProgress) {
+  const { job_id: jobId } = await submitVideoJob(videoBlob, onProgress);
+
+  for (;;) {
+    await new Promise((r) => setTimeout(r, JOB_POLL_INTERVAL_MS));
+    const { data: job } = await getVideoAnalysisJob(jobId);
+    if (job.status === 'completed') return job.results;
+    if (job.status === 'failed') throw new Error(job.error || 'Video analysis failed');
+  }
+}
+
 export default api;